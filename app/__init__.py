@@ -1,16 +1,26 @@
 from flask import Flask
 from api.routes import social_pulse
 from config.settings import settings
+from services.watchlist import watchlist_refresher
 
-def create_app():
+def create_app(start_background: bool = True):
+    """
+    Builds the Flask app. Pass start_background=False in a process that is
+    about to fork workers (see wsgi.py); they start the background threads
+    themselves.
+    """
     app = Flask(__name__)
     
     # Register blueprints
     app.register_blueprint(social_pulse, url_prefix='/api')
+
+    if settings.WATCHLIST_ENABLED:
+        watchlist_refresher.load_configured()
+        if start_background:
+            watchlist_refresher.start()
     
     return app
 
-app = create_app()
-
 if __name__ == '__main__':
-    app.run(debug=True) 
\ No newline at end of file
+    # Development server; serve wsgi:app with a production server instead
+    create_app().run(debug=True) 
\ No newline at end of file
@@ -1,15 +1,90 @@
-from flask import Blueprint, request, jsonify
-from services.social_pulse_analyzer import SocialPulseAnalyzer
-from utils.validators import validate_request
-from utils.response_formatter import format_analysis_response
+from flask import Blueprint, Response, g, jsonify, make_response, request, stream_with_context
+from services.social_pulse_analyzer import get_analyzer
+from services.result_store import result_store, token_key
+from services.watchlist import watchlist_refresher
+from services.nlp_pool import NLPPoolBusy
+from services.latency_budget import AnalysisBudget
+from services.trending import trending_engine
+from services.leaderboard import leaderboard, parse_leaderboard_query
+from services.timeseries import parse_timeseries_query, timeseries_store
+from services.subscriptions import subscriptions
+from services.request_profiler import PROFILE_MODES, profile_call
+from config.settings import settings
+from utils.validators import validate_request, validate_subscription
+from utils.response_formatter import (
+    format_analysis_response, iter_ready_sections, project_response, requested_sections, required_fields
+)
+from functools import wraps
 from http import HTTPStatus
+from typing import Dict, Optional
+import hmac
+import json
+
+STREAM_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream'
+}
 
 social_pulse = Blueprint('social_pulse', __name__)
 
+def profiled(view):
+    """
+    Runs the view under the request profiler when ?profile= or the X-Profile
+    header asks for it (1 or sample for the sampling profiler, cprofile for
+    a deterministic trace) and the X-Profile-Token header matches
+    PROFILE_TOKEN. The report is added to the JSON response as "profile",
+    with the milliseconds spent in each analysis stage under "stage_ms".
+    Requests that do not ask (or ask with 0 or false) are passed straight
+    through.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        mode = request.args.get('profile') or request.headers.get('X-Profile')
+        if not mode or mode in ('0', 'false'):
+            return view(*args, **kwargs)
+
+        mode = 'sample' if mode in ('1', 'true') else mode
+        if mode not in PROFILE_MODES:
+            return jsonify({
+                'status': 'error',
+                'message': f"profile must be one of: 1, {', '.join(PROFILE_MODES)}"
+            }), HTTPStatus.BAD_REQUEST
+        token = request.headers.get('X-Profile-Token', '')
+        if not settings.PROFILE_TOKEN or not hmac.compare_digest(token, settings.PROFILE_TOKEN):
+            return jsonify({
+                'status': 'error',
+                'message': 'Profiling is not enabled for this client'
+            }), HTTPStatus.FORBIDDEN
+
+        g.profiling = True
+        data = request.get_json(silent=True)
+        label = token_key(data) if isinstance(data, dict) else request.path
+        result, report = profile_call(lambda: view(*args, **kwargs), mode, label)
+        response = make_response(result)
+        if response.is_streamed or not response.is_json:
+            # Streamed sections are computed after the view returns, outside the profile
+            response.headers['X-Profile'] = 'unsupported-for-streaming'
+            return response
+        payload = response.get_json()
+        if g.get('stage_timings') is not None:
+            report['stage_ms'] = stage_report(g.stage_timings)
+        payload['profile'] = report
+        return jsonify(payload), response.status_code
+    return wrapper
+
 @social_pulse.route('/analyze', methods=['POST'])
+@profiled
 def analyze_token_social():
     try:
         data = request.get_json()
+
+        # Field projection can also be requested as ?fields=overview,community_insights
+        if isinstance(data, dict) and 'fields' not in data and request.args.get('fields'):
+            data['fields'] = request.args.get('fields').split(',')
+
+        # So can the quality tier and latency budget
+        if isinstance(data, dict):
+            merge_budget_args(data)
         
         # Validate request payload
         validation_result = validate_request(data)
@@ -19,12 +94,32 @@ def analyze_token_social():
                 'message': validation_result['message']
             }), HTTPStatus.BAD_REQUEST
 
-        analyzer = SocialPulseAnalyzer()
+        key = token_key(data)
+        budget = AnalysisBudget.from_request(data)
+        watchlist_refresher.record_request(data)
+
+        # Watched tokens are kept fresh in the background, so this is usually a cache read
+        # A profiled request measures the analysis, not a cache read
+        stored = None if g.get('profiling') else result_store.get(key, max_age=settings.RESULT_TTL)
+
+        fields = data.get('fields')
+
+        stream_mode = get_stream_mode(data)
+        if stream_mode:
+            return stream_analysis(data, key, stream_mode, stored.response if stored else None, budget)
+
+        if stored is not None:
+            return jsonify(with_quality({
+                'status': 'success',
+                'data': project_response(stored.response, fields)
+            }, budget)), HTTPStatus.OK
+
+        analyzer = get_analyzer()
         
         if 'contract_address' in data:
-            result = analyzer.analyze_by_contract(data['contract_address'])
+            result = analyzer.analyze_by_contract(data['contract_address'], budget)
         elif 'social_handles' in data:
-            result = analyzer.analyze_by_socials(data['social_handles'])
+            result = analyzer.analyze_by_socials(data['social_handles'], budget)
         else:
             return jsonify({
                 'status': 'error',
@@ -32,15 +127,283 @@ def analyze_token_social():
             }), HTTPStatus.BAD_REQUEST
 
         print("format_analysis_response")
-        response = format_analysis_response(result)
+        response = format_analysis_response(result, fields)
+        g.stage_timings = result.stage_timings
+        # Only complete, undegraded responses can answer later requests
+        if not fields and not budget.degradations:
+            result_store.put(key, response)
         
-        return jsonify({
+        return jsonify(with_quality({
             'status': 'success',
             'data': response
-        }), HTTPStatus.OK
+        }, budget, result.stage_timings)), HTTPStatus.OK
+
+    except NLPPoolBusy as e:
+        # Backpressure from the NLP worker pool, the client should retry later
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), HTTPStatus.SERVICE_UNAVAILABLE
 
     except Exception as e:
         return jsonify({
             'status': 'error',
             'message': str(e)
-        }), HTTPStatus.INTERNAL_SERVER_ERROR 
\ No newline at end of file
+        }), HTTPStatus.INTERNAL_SERVER_ERROR
+
+def merge_budget_args(data):
+    if 'quality_tier' not in data and request.args.get('quality_tier'):
+        data['quality_tier'] = request.args.get('quality_tier')
+    if 'latency_budget_ms' not in data and request.args.get('latency_budget_ms'):
+        try:
+            data['latency_budget_ms'] = float(request.args.get('latency_budget_ms'))
+        except ValueError:
+            # Left as a string so validation reports it
+            data['latency_budget_ms'] = request.args.get('latency_budget_ms')
+
+def with_quality(payload, budget: AnalysisBudget, stage_timings: Optional[Dict[str, float]] = None):
+    """
+    Adds the tier, elapsed time and applied degradations when the request
+    asked for a budget or tier, and the milliseconds spent in each stage of
+    a fresh analysis.
+    """
+    if budget.requested:
+        payload['quality'] = budget.report()
+        if stage_timings is not None:
+            payload['quality']['stage_ms'] = stage_report(stage_timings)
+    return payload
+
+def stage_report(stage_timings: Dict[str, float]) -> Dict[str, float]:
+    return {name: round(seconds * 1000, 1) for name, seconds in stage_timings.items()}
+
+def get_stream_mode(data) -> str:
+    """
+    Streaming is opt-in through the "stream" body field, the ?stream= query
+    parameter or an Accept header asking for NDJSON or server-sent events.
+    """
+    mode = data.get('stream') or request.args.get('stream')
+    if mode in STREAM_MIMETYPES:
+        return mode
+    accept = request.headers.get('Accept', '')
+    for mode, mimetype in STREAM_MIMETYPES.items():
+        if mimetype in accept:
+            return mode
+    return ''
+
+def encode_stream_event(mode: str, event: str, payload) -> str:
+    body = json.dumps(payload, default=str)
+    if mode == 'sse':
+        return f"event: {event}\ndata: {body}\n\n"
+    return body + "\n"
+
+def stream_analysis(data, key: str, mode: str, cached_response=None, budget: AnalysisBudget = None) -> Response:
+    """
+    Emits every response section as its own NDJSON line / SSE event as soon as
+    the stages it depends on are done, so profile counts and engagement reach
+    the client without waiting for sentiment and spam detection.
+    """
+    fields = data.get('fields')
+    budget = budget or AnalysisBudget()
+
+    def generate():
+        try:
+            if cached_response is not None:
+                sections = project_response(cached_response, fields).items()
+            else:
+                analyzer = get_analyzer()
+                analysis = analyzer.analyze_request(data, budget)
+                wanted = requested_sections(fields)
+                stages = analysis.iter_compute(required_fields(wanted))
+                sections = iter_ready_sections(analysis, stages, wanted)
+
+            response = {}
+            for section, formatted in sections:
+                response[section] = formatted
+                yield encode_stream_event(mode, section, {'section': section, 'data': formatted})
+
+            if cached_response is None and not fields and not budget.degradations:
+                result_store.put(key, response)
+            if budget.requested:
+                quality = with_quality({}, budget, None if cached_response is not None else analysis.stage_timings)
+                yield encode_stream_event(mode, 'quality', quality)
+            yield encode_stream_event(mode, 'done', {'status': 'success'})
+        except Exception as e:
+            yield encode_stream_event(mode, 'error', {'status': 'error', 'message': str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=STREAM_MIMETYPES[mode],
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@social_pulse.route('/trending', methods=['GET'])
+def trending_topics():
+    """Top phrases across all analyzed tokens, or for one with ?token=<contract address or platform:handle list>."""
+    key = request.args.get('token') or None
+    try:
+        k = min(int(request.args.get('k', 20)), settings.TRENDING_GLOBAL_CAPACITY)
+    except ValueError:
+        return jsonify({
+            'status': 'error',
+            'message': 'k must be an integer'
+        }), HTTPStatus.BAD_REQUEST
+
+    data = trending_engine.status()
+    data.update({
+        'token': key,
+        'topics': [{'phrase': phrase, 'score': score} for phrase, score in trending_engine.top(key, k)]
+    })
+    return jsonify({
+        'status': 'success',
+        'data': data
+    }), HTTPStatus.OK
+
+@social_pulse.route('/leaderboard', methods=['GET'])
+def token_leaderboard():
+    """
+    Analyzed tokens ranked by ?metric= (sentiment by default, see
+    LEADERBOARD_METRICS) with ?order=, ?offset=, ?limit= and the filters
+    ?risk_level=low,medium, ?platform=, ?max_age= and ?min_/max_<metric>=.
+    """
+    try:
+        query = parse_leaderboard_query(request.args)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), HTTPStatus.BAD_REQUEST
+
+    return jsonify({
+        'status': 'success',
+        'data': leaderboard.query(query)
+    }), HTTPStatus.OK
+
+@social_pulse.route('/pulse/<path:token>/timeseries', methods=['GET'])
+def token_timeseries(token):
+    """
+    Metrics of a token (as keyed by the result store) over time, with
+    ?metrics=, ?start=, ?end=, ?points= and ?resolution=auto|raw|hour|day.
+    """
+    try:
+        query = parse_timeseries_query(request.args)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), HTTPStatus.BAD_REQUEST
+
+    data = timeseries_store.query(token, query)
+    if data is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'No analyses recorded for this token'
+        }), HTTPStatus.NOT_FOUND
+    return jsonify({
+        'status': 'success',
+        'data': data
+    }), HTTPStatus.OK
+
+@social_pulse.route('/subscriptions', methods=['POST'])
+def create_subscription():
+    """
+    Subscribes to pulse changes of {"tokens": [analysis requests]} when
+    their "risk_level_change" and/or "sentiment_delta" conditions match,
+    delivered to "webhook_url" or, without one, as server-sent events.
+    """
+    data = request.get_json(silent=True)
+    validation_result = validate_subscription(data)
+    if not validation_result['valid']:
+        return jsonify({
+            'status': 'error',
+            'message': validation_result['message']
+        }), HTTPStatus.BAD_REQUEST
+
+    try:
+        subscription = subscriptions.create(data)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), HTTPStatus.TOO_MANY_REQUESTS
+
+    data = subscription.status()
+    if not subscription.webhook_url:
+        data['events_url'] = f"{request.script_root}/api/subscriptions/{subscription.id}/events"
+    if not settings.WATCHLIST_ENABLED:
+        data['warning'] = 'WATCHLIST_ENABLED is false, so only changes seen by on-demand analyses are pushed'
+    return jsonify({
+        'status': 'success',
+        'data': data
+    }), HTTPStatus.CREATED
+
+@social_pulse.route('/subscriptions/<subscription_id>', methods=['GET', 'DELETE'])
+def subscription_detail(subscription_id):
+    subscription = subscriptions.get(subscription_id)
+    if subscription is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Unknown subscription'
+        }), HTTPStatus.NOT_FOUND
+
+    if request.method == 'DELETE':
+        subscriptions.remove(subscription_id)
+    return jsonify({
+        'status': 'success',
+        'data': subscription.status()
+    }), HTTPStatus.OK
+
+@social_pulse.route('/subscriptions/<subscription_id>/events', methods=['GET'])
+def subscription_events(subscription_id):
+    """
+    Server-sent events of a subscription without a webhook. Every event
+    carries its sequence number as id, so a reconnecting client sending
+    Last-Event-ID (or ?after=) gets the queued events it missed.
+    """
+    subscription = subscriptions.get(subscription_id)
+    if subscription is None or subscription.webhook_url:
+        return jsonify({
+            'status': 'error',
+            'message': 'Unknown subscription, or one delivered by webhook'
+        }), HTTPStatus.NOT_FOUND
+    try:
+        after = int(request.headers.get('Last-Event-ID') or request.args.get('after', 0))
+    except ValueError:
+        return jsonify({
+            'status': 'error',
+            'message': 'Last-Event-ID and after must be integers'
+        }), HTTPStatus.BAD_REQUEST
+
+    def generate():
+        last = after
+        while True:
+            events = subscriptions.wait_for_events(subscription, last, settings.SUBSCRIPTION_KEEPALIVE)
+            if events is None:
+                yield encode_stream_event('sse', 'closed', {'status': 'closed'})
+                return
+            if not events:
+                # Keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            for sequence, body in events:
+                yield f"id: {sequence}\nevent: pulse_change\ndata: {body}\n\n"
+            last = events[-1][0]
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=STREAM_MIMETYPES['sse'],
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@social_pulse.route('/subscriptions/metrics', methods=['GET'])
+def subscription_metrics():
+    return jsonify({
+        'status': 'success',
+        'data': subscriptions.status()
+    }), HTTPStatus.OK
+
+@social_pulse.route('/watchlist/metrics', methods=['GET'])
+def watchlist_metrics():
+    return jsonify({
+        'status': 'success',
+        'data': watchlist_refresher.status()
+    }), HTTPStatus.OK
\ No newline at end of file
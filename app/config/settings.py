@@ -16,6 +16,11 @@ class Settings:
     REDDIT_CLIENT_ID = os.getenv("REDDIT_CLIENT_ID")
     REDDIT_CLIENT_SECRET = os.getenv("REDDIT_CLIENT_SECRET")
     REDDIT_USER_AGENT = "SocioPulse/1.0"
+    REDDIT_PAGE_SIZE = int(os.getenv("REDDIT_PAGE_SIZE", 100))
+    REDDIT_MAX_POSTS = int(os.getenv("REDDIT_MAX_POSTS", 1000))
+    REDDIT_REQUEST_BUDGET = int(os.getenv("REDDIT_REQUEST_BUDGET", 15))
+    REDDIT_COMMENT_MODE = os.getenv("REDDIT_COMMENT_MODE", "none")  # none, recent or top
+    REDDIT_TOP_COMMENTS = int(os.getenv("REDDIT_TOP_COMMENTS", 3))
 
     # Discord API
     DISCORD_BOT_TOKEN = os.getenv("DISCORD_BOT_TOKEN")
@@ -24,4 +29,127 @@ class Settings:
     TELEGRAM_API_ID = os.getenv("TELEGRAM_API_ID")
     TELEGRAM_API_HASH = os.getenv("TELEGRAM_API_HASH")
     TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+    TELEGRAM_SESSION = os.getenv("TELEGRAM_SESSION", "sociopulse_bot")
+
+    # Async collectors (Discord/Telegram) running on the background event loop
+    COLLECTOR_HISTORY_LIMIT = int(os.getenv("COLLECTOR_HISTORY_LIMIT", 100))
+    COLLECTOR_MAX_CONCURRENT_READS = int(os.getenv("COLLECTOR_MAX_CONCURRENT_READS", 5))
+    COLLECTOR_TIMEOUT = float(os.getenv("COLLECTOR_TIMEOUT", 30))
+
+    # Result store and watchlist refresher
+    RESULT_TTL = float(os.getenv("RESULT_TTL", 300))
+    RESULT_STORE_MAX_SIZE = int(os.getenv("RESULT_STORE_MAX_SIZE", 10000))
+    WATCHLIST_ENABLED = os.getenv("WATCHLIST_ENABLED", "false").lower() == "true"
+    WATCHLIST = os.getenv("WATCHLIST", "")
+    WATCHLIST_FILE = os.getenv("WATCHLIST_FILE")
+    # Behind a prefork server only the worker holding this lock runs the refresher; empty runs it in every worker
+    WATCHLIST_LOCK_FILE = os.getenv("WATCHLIST_LOCK_FILE", "watchlist.lock")
+    WATCHLIST_MAX_SIZE = int(os.getenv("WATCHLIST_MAX_SIZE", 500))
+    WATCHLIST_MAX_CONCURRENCY = int(os.getenv("WATCHLIST_MAX_CONCURRENCY", 4))
+    WATCHLIST_MIN_INTERVAL = float(os.getenv("WATCHLIST_MIN_INTERVAL", 60))
+    WATCHLIST_MAX_INTERVAL = float(os.getenv("WATCHLIST_MAX_INTERVAL", 1800))
+    WATCHLIST_JITTER = float(os.getenv("WATCHLIST_JITTER", 0.2))
+    WATCHLIST_CHANGE_THRESHOLD = float(os.getenv("WATCHLIST_CHANGE_THRESHOLD", 0.5))
+    WATCHLIST_LEARN_THRESHOLD = int(os.getenv("WATCHLIST_LEARN_THRESHOLD", 5))
+    WATCHLIST_LEARN_WINDOW = float(os.getenv("WATCHLIST_LEARN_WINDOW", 3600))
+
+    # Thread pool running independent analysis stages concurrently
+    STAGE_WORKERS = int(os.getenv("STAGE_WORKERS", 8))
+
+    # NLP process pool (0 runs NLP in the web process)
+    NLP_WORKERS = int(os.getenv("NLP_WORKERS", 0))
+    NLP_WORKER_THREADS = int(os.getenv("NLP_WORKER_THREADS", 1))
+    NLP_WORKER_MAX_TASKS = int(os.getenv("NLP_WORKER_MAX_TASKS", 500))
+    NLP_POOL_MAX_PENDING = int(os.getenv("NLP_POOL_MAX_PENDING", 0))  # 0 means twice the worker count
+    NLP_POOL_QUEUE_TIMEOUT = float(os.getenv("NLP_POOL_QUEUE_TIMEOUT", 5))
+    NLP_POOL_TASK_TIMEOUT = float(os.getenv("NLP_POOL_TASK_TIMEOUT", 60))
+
+    # Batches at least this large use the vectorized lexicon scorer for polarity_scores
+    FAST_SENTIMENT_MIN_BATCH = int(os.getenv("FAST_SENTIMENT_MIN_BATCH", 200))
+
+    # Latency budgets and quality tiers (see AnalysisBudget)
+    LATENCY_FAST_TIER_MS = float(os.getenv("LATENCY_FAST_TIER_MS", 1000))  # budgets below this get the fast tier
+    LATENCY_BALANCED_TIER_MS = float(os.getenv("LATENCY_BALANCED_TIER_MS", 5000))
+    LATENCY_COLLECTION_SHARE = float(os.getenv("LATENCY_COLLECTION_SHARE", 0.6))
+    FAST_TIER_MAX_ACTIVITIES = int(os.getenv("FAST_TIER_MAX_ACTIVITIES", 50))
+    BALANCED_TIER_MAX_ACTIVITIES = int(os.getenv("BALANCED_TIER_MAX_ACTIVITIES", 200))
+    SAMPLED_TRANSFORMER_TEXTS = int(os.getenv("SAMPLED_TRANSFORMER_TEXTS", 32))
+
+    # Transformer inference: long texts are scored in overlapping token windows
+    SENTIMENT_BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", 16))
+    SENTIMENT_CHUNK_TOKENS = int(os.getenv("SENTIMENT_CHUNK_TOKENS", 0))  # 0 uses the model's limit
+    SENTIMENT_CHUNK_OVERLAP = int(os.getenv("SENTIMENT_CHUNK_OVERLAP", 64))
+    SENTIMENT_MAX_CHUNKS = int(os.getenv("SENTIMENT_MAX_CHUNKS", 4))
+
+    # Sentiment model backend (see load_sentiment_pipeline)
+    SENTIMENT_MODEL = os.getenv("SENTIMENT_MODEL", "")  # hub id, empty for the pipeline default
+    SENTIMENT_MODEL_DIR = os.getenv("SENTIMENT_MODEL_DIR", "")  # local directory, loaded offline
+    SENTIMENT_MODEL_BACKEND = os.getenv("SENTIMENT_MODEL_BACKEND", "fp32")  # fp32 or int8
+    SENTIMENT_THREADS = int(os.getenv("SENTIMENT_THREADS", 0))  # intra-op threads outside the pool, 0 keeps torch's default
+
+    # Trending topics from time-decayed phrase counts (see TrendingEngine)
+    TRENDING_SOURCE = os.getenv("TRENDING_SOURCE", "sketch")  # sketch, or yake to run YAKE over every request's texts
+    TRENDING_YAKE_RERANK = os.getenv("TRENDING_YAKE_RERANK", "false").lower() == "true"
+    TRENDING_RERANK_CANDIDATES = int(os.getenv("TRENDING_RERANK_CANDIDATES", 30))
+    TRENDING_MAX_NGRAM = int(os.getenv("TRENDING_MAX_NGRAM", 2))
+    TRENDING_HALF_LIFE = float(os.getenv("TRENDING_HALF_LIFE", 6 * 3600))
+    TRENDING_CAPACITY = int(os.getenv("TRENDING_CAPACITY", 200))  # monitored phrases per token
+    TRENDING_GLOBAL_CAPACITY = int(os.getenv("TRENDING_GLOBAL_CAPACITY", 2000))
+    TRENDING_SKETCH_WIDTH = int(os.getenv("TRENDING_SKETCH_WIDTH", 1024))
+    TRENDING_SKETCH_DEPTH = int(os.getenv("TRENDING_SKETCH_DEPTH", 4))
+    TRENDING_MAX_TOKENS = int(os.getenv("TRENDING_MAX_TOKENS", 1000))
+    TRENDING_SEEN_LIMIT = int(os.getenv("TRENDING_SEEN_LIMIT", 5000))  # remembered activities per token
+
+    # Cross-token coordinated-shill index (see ShillIndex)
+    SHILL_INDEX_FILE = os.getenv("SHILL_INDEX_FILE", "")  # empty keeps the index in memory only
+    SHILL_NUM_PERM = int(os.getenv("SHILL_NUM_PERM", 64))
+    SHILL_BANDS = int(os.getenv("SHILL_BANDS", 16))  # LSH bands, SHILL_NUM_PERM / SHILL_BANDS rows each
+    SHILL_SIMILARITY = float(os.getenv("SHILL_SIMILARITY", 0.7))  # estimated Jaccard for a near-duplicate
+    SHILL_MIN_TEXT_TOKENS = int(os.getenv("SHILL_MIN_TEXT_TOKENS", 8))  # shorter texts are too generic to index
+    SHILL_MIN_OTHER_TOKENS = int(os.getenv("SHILL_MIN_OTHER_TOKENS", 3))
+    SHILL_RISK_MIN_TEXTS = int(os.getenv("SHILL_RISK_MIN_TEXTS", 3))
+    SHILL_MAX_AGE = float(os.getenv("SHILL_MAX_AGE", 14 * 86400))
+    SHILL_MAX_ENTRIES = int(os.getenv("SHILL_MAX_ENTRIES", 200000))
+    SHILL_SAVE_INTERVAL = float(os.getenv("SHILL_SAVE_INTERVAL", 300))
+
+    # Binary snapshots of collected platform data (see services/snapshot.py)
+    SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "")  # empty disables writing a snapshot per collection
+
+    # On-demand request profiling (?profile=1 with the X-Profile-Token header)
+    PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")  # empty disables profiling
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")  # empty returns the collapsed stacks in the response instead
+    PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", 5))
+    PROFILE_TOP_FUNCTIONS = int(os.getenv("PROFILE_TOP_FUNCTIONS", 40))
+
+    # Serving through wsgi.py: load the model and lexicons once before a prefork server forks (see services/preload.py)
+    PRELOAD = os.getenv("PRELOAD", "true").lower() == "true"  # false when the server imports the app in every worker
+
+    # Cross-token leaderboard of the latest analysis per token (see LeaderboardIndex)
+    LEADERBOARD_FILE = os.getenv("LEADERBOARD_FILE", "")  # empty keeps the leaderboard in memory only
+    LEADERBOARD_MAX_TOKENS = int(os.getenv("LEADERBOARD_MAX_TOKENS", 100000))  # least recently analyzed dropped first
+    LEADERBOARD_MAX_LIMIT = int(os.getenv("LEADERBOARD_MAX_LIMIT", 500))  # tokens per page
+    LEADERBOARD_SAVE_INTERVAL = float(os.getenv("LEADERBOARD_SAVE_INTERVAL", 60))
+
+    # Per-token metrics over time with hourly and daily rollups (see TimeseriesStore)
+    TIMESERIES_DIR = os.getenv("TIMESERIES_DIR", "")  # empty keeps the time series in memory only
+    TIMESERIES_RAW_POINTS = int(os.getenv("TIMESERIES_RAW_POINTS", 512))  # newest analyses kept as they are per token
+    TIMESERIES_HOURLY_BUCKETS = int(os.getenv("TIMESERIES_HOURLY_BUCKETS", 30 * 24))
+    TIMESERIES_DAILY_BUCKETS = int(os.getenv("TIMESERIES_DAILY_BUCKETS", 730))
+    TIMESERIES_RAW_RETENTION = float(os.getenv("TIMESERIES_RAW_RETENTION", 2 * 86400))  # raw segment files on disk
+    TIMESERIES_MAX_TOKENS = int(os.getenv("TIMESERIES_MAX_TOKENS", 5000))  # least recently analyzed dropped first
+    TIMESERIES_MAX_POINTS = int(os.getenv("TIMESERIES_MAX_POINTS", 1000))  # points per query
+    TIMESERIES_FLUSH_INTERVAL = float(os.getenv("TIMESERIES_FLUSH_INTERVAL", 60))
+
+    # Push subscriptions to pulse changes, by webhook or server-sent events (see SubscriptionManager)
+    SUBSCRIPTION_MAX_SUBSCRIPTIONS = int(os.getenv("SUBSCRIPTION_MAX_SUBSCRIPTIONS", 1000))
+    SUBSCRIPTION_MAX_TOKENS = int(os.getenv("SUBSCRIPTION_MAX_TOKENS", 50))  # tokens per subscription
+    SUBSCRIPTION_QUEUE_SIZE = int(os.getenv("SUBSCRIPTION_QUEUE_SIZE", 100))  # events kept per SSE subscription
+    SUBSCRIPTION_KEEPALIVE = float(os.getenv("SUBSCRIPTION_KEEPALIVE", 15))  # seconds between SSE keepalive comments
+    SUBSCRIPTION_WEBHOOK_HOSTS = os.getenv("SUBSCRIPTION_WEBHOOK_HOSTS", "localhost,127.0.0.1,::1")  # * allows any host
+    SUBSCRIPTION_WEBHOOK_TIMEOUT = float(os.getenv("SUBSCRIPTION_WEBHOOK_TIMEOUT", 5))
+    SUBSCRIPTION_WEBHOOK_CONCURRENCY = int(os.getenv("SUBSCRIPTION_WEBHOOK_CONCURRENCY", 4))
+    SUBSCRIPTION_BATCH_SIZE = int(os.getenv("SUBSCRIPTION_BATCH_SIZE", 50))  # events per webhook POST
+    SUBSCRIPTION_BATCH_WINDOW = float(os.getenv("SUBSCRIPTION_BATCH_WINDOW", 1))  # seconds an event waits for others
+    SUBSCRIPTION_MAX_RETRIES = int(os.getenv("SUBSCRIPTION_MAX_RETRIES", 5))
+    SUBSCRIPTION_RETRY_BACKOFF = float(os.getenv("SUBSCRIPTION_RETRY_BACKOFF", 1))  # doubles with every retry
 settings = Settings() 
\ No newline at end of file
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, Optional
+
+class BackgroundEventLoop:
+    """
+    Runs an asyncio event loop on a dedicated daemon thread so that async
+    collectors (Discord, Telegram) can keep their sessions open between
+    requests while being driven from synchronous Flask handlers.
+    """
+
+    def __init__(self, name: str = 'collector-loop'):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        self.start()
+        return self._loop
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        with self._lock:
+            if self.is_running():
+                return
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def _run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            self._loop = loop
+            self._thread = threading.Thread(target=_run, name=self.name, daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def reset_after_fork(self) -> None:
+        """Forgets a loop inherited through fork(); its thread only exists in the parent."""
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, coro: Coroutine) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """
+        Blocks the calling thread until the coroutine finishes on the
+        background loop. The coroutine is cancelled if the timeout expires.
+        """
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except Exception:
+            future.cancel()
+            raise
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            if not self.is_running():
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+
+_background_loop = BackgroundEventLoop()
+
+def get_background_loop() -> BackgroundEventLoop:
+    return _background_loop
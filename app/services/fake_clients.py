@@ -0,0 +1,279 @@
+"""
+In-memory stand-ins for the Discord and Telegram clients used by the async
+collectors, the PRAW client of the Reddit collector and the web pages the
+Twitter collector and the social finder fetch. They implement only the
+calls the collectors make, so the collectors can be exercised offline:
+
+    analyzer = DiscordAnalyzer(client_factory=lambda: FakeDiscordClient(guilds))
+    reddit_analyzer.reddit = FakeRedditClient(subreddits)
+"""
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+import discord
+from services.metrics_calculator import ACTIVITY_DATE_FORMAT
+
+@dataclass
+class FakeMessage:
+    content: str
+    created_at: datetime
+    author: str = 'user'
+    reactions: List[Any] = field(default_factory=list)
+    views: int = 0
+    forwards: int = 0
+
+    @property
+    def text(self) -> str:
+        return self.content
+
+    @property
+    def date(self) -> datetime:
+        return self.created_at
+
+def make_messages(texts: List[str], start: Optional[datetime] = None,
+                  spacing: timedelta = timedelta(hours=6)) -> List[FakeMessage]:
+    """Builds messages newest first, `spacing` apart, starting at `start` (defaults to now)."""
+    start = start or datetime.now(timezone.utc)
+    return [
+        FakeMessage(
+            content=text,
+            created_at=start - spacing * i,
+            author=f'user{i % 3}',
+            reactions=[SimpleNamespace(count=i % 4)],
+            views=100 + i,
+            forwards=i % 2
+        )
+        for i, text in enumerate(texts)
+    ]
+
+class FakeTextChannel:
+    type = discord.ChannelType.text
+
+    def __init__(self, name: str, messages: List[FakeMessage], latency: float = 0.0):
+        self.name = name
+        self.messages = messages
+        self.latency = latency
+        self.active_reads = 0
+        self.max_active_reads = 0
+
+    async def history(self, limit: int = 100, after: Optional[datetime] = None):
+        self.active_reads += 1
+        self.max_active_reads = max(self.max_active_reads, self.active_reads)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            count = 0
+            for message in self.messages:
+                if count >= limit:
+                    break
+                if after is not None and message.created_at <= after:
+                    continue
+                count += 1
+                yield message
+        finally:
+            self.active_reads -= 1
+
+    def __str__(self) -> str:
+        return self.name
+
+class FakeGuild:
+    def __init__(self, guild_id: int, member_count: int, channels: List[Any],
+                 created_at: Optional[datetime] = None):
+        self.id = guild_id
+        self.approximate_member_count = member_count
+        self.approximate_presence_count = member_count // 10
+        self.member_count = None
+        self.created_at = created_at or datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.channels = channels
+
+    async def fetch_channels(self) -> List[Any]:
+        return list(self.channels)
+
+class FakeDiscordClient:
+    def __init__(self, guilds: Dict[int, FakeGuild]):
+        self.guilds = guilds
+        self.login_count = 0
+        self.closed = False
+
+    async def login(self, token: Optional[str]) -> None:
+        self.login_count += 1
+
+    async def fetch_guild(self, guild_id: int, *, with_counts: bool = True) -> FakeGuild:
+        return self.guilds[guild_id]
+
+    async def close(self) -> None:
+        self.closed = True
+
+class FakeTelegramChannel:
+    def __init__(self, username: str, participants_count: int, messages: List[FakeMessage],
+                 created_at: Optional[datetime] = None):
+        self.username = username
+        self.participants_count = participants_count
+        self.messages = messages
+        self.date = created_at or datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+class FakeTelegramClient:
+    def __init__(self, channels: Dict[str, FakeTelegramChannel], latency: float = 0.0):
+        self.channels = channels
+        self.latency = latency
+        self.start_count = 0
+        self.participant_fetches = 0
+        self._connected = False
+
+    async def start(self, bot_token: Optional[str] = None) -> 'FakeTelegramClient':
+        self.start_count += 1
+        self._connected = True
+        return self
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    async def disconnect(self) -> None:
+        self._connected = False
+
+    async def get_entity(self, name: str) -> FakeTelegramChannel:
+        return self.channels[name]
+
+    async def iter_messages(self, channel: FakeTelegramChannel, limit: int = 100):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for message in channel.messages[:limit]:
+            yield message
+
+    async def get_participants(self, channel: FakeTelegramChannel, limit: Optional[int] = None):
+        self.participant_fetches += 1
+        return [None] * channel.participants_count
+
+    async def __call__(self, request: Any) -> Any:
+        # Only GetFullChannelRequest is issued by the collector
+        channel = request.channel
+        return SimpleNamespace(full_chat=SimpleNamespace(participants_count=channel.participants_count))
+
+@dataclass
+class FakeSubreddit:
+    subscribers: int
+    posts: List[Dict[str, Any]]
+    comments: List[Dict[str, Any]] = field(default_factory=list)
+    active_users: int = 0
+    created_utc: float = 1704067200.0
+
+def make_subreddit(texts: List[str], subscribers: int, start: Optional[datetime] = None,
+                   spacing: timedelta = timedelta(hours=6), comments_per_post: int = 0) -> FakeSubreddit:
+    """Builds posts (and comments on them) from `texts` newest first, the way make_messages does."""
+    start = start or datetime.now(timezone.utc)
+    posts, comments = [], []
+    for i, text in enumerate(texts):
+        created = (start - spacing * i).timestamp()
+        name = f't3_{i:06x}'
+        posts.append({
+            'name': name,
+            'title': text[:80],
+            'selftext': text,
+            'score': i * 7 % 300,
+            'num_comments': comments_per_post,
+            'created_utc': created
+        })
+        comments.extend({
+            'name': f't1_{i:06x}{j:02x}',
+            'body': texts[(i + j + 1) % len(texts)],
+            'score': j,
+            'link_id': name,
+            'created_utc': created + j + 1
+        } for j in range(comments_per_post))
+    comments.sort(key=lambda comment: comment['created_utc'], reverse=True)
+    return FakeSubreddit(subscribers=subscribers, posts=posts, comments=comments, active_users=subscribers // 50)
+
+class FakeRedditClient:
+    """Answers the raw paths RedditAnalyzer requests from `subreddits`, waiting `latency` seconds per request."""
+
+    def __init__(self, subreddits: Dict[str, FakeSubreddit], latency: float = 0.0):
+        self.subreddits = subreddits
+        self.latency = latency
+        self.requests = 0
+
+    def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        params = params or {}
+        parts = path.strip('/').split('/')
+        if parts[0] == 'comments':
+            post_name = f't3_{parts[1]}'
+            subreddit = next(sub for sub in self.subreddits.values() if any(p['name'] == post_name for p in sub.posts))
+            replies = [comment for comment in subreddit.comments if comment['link_id'] == post_name]
+            return [
+                self._listing([post for post in subreddit.posts if post['name'] == post_name], {}),
+                self._listing(replies[:int(params.get('limit', 100))], {}, kind='t1')
+            ]
+
+        subreddit = self.subreddits[parts[1]]
+        if parts[2] == 'about':
+            return {'data': {
+                'subscribers': subreddit.subscribers,
+                'active_user_count': subreddit.active_users,
+                'created_utc': subreddit.created_utc
+            }}
+        if parts[2] == 'new':
+            return self._listing(subreddit.posts, params)
+        return self._listing(subreddit.comments, params, kind='t1')
+
+    @staticmethod
+    def _listing(items: List[Dict[str, Any]], params: Dict[str, Any], kind: str = 't3') -> Dict[str, Any]:
+        start = 0
+        if params.get('after'):
+            start = next(i for i, item in enumerate(items) if item['name'] == params['after']) + 1
+        page = items[start:start + int(params.get('limit', 100))]
+        more = start + len(page) < len(items)
+        return {'data': {
+            'children': [{'kind': kind, 'data': item} for item in page],
+            'after': page[-1]['name'] if page and more else None
+        }}
+
+def twitter_timeline_page(tweets: List[FakeMessage], followers: int) -> str:
+    """A syndication timeline page in the shape TwitterAnalyzer parses."""
+    data = {'props': {'pageProps': {
+        'user': {'normal_followers_count': followers, 'friends_count': followers // 100,
+                 'statuses_count': len(tweets) * 20, 'verified': False},
+        'timeline': {'entries': [
+            {'type': 'tweet', 'content': {'tweet': {
+                'text': tweet.content,
+                'created_at': tweet.created_at.strftime(ACTIVITY_DATE_FORMAT),
+                'favorite_count': tweet.views % 500,
+                'retweet_count': tweet.forwards,
+                'reply_count': len(tweet.reactions),
+                'quote_count': 0
+            }}}
+            for tweet in tweets
+        ]}
+    }}}
+    return f'<html><body><script id="__NEXT_DATA__" type="application/json">{json.dumps(data)}</script></body></html>'
+
+def pump_fun_page(socials: Dict[str, str]) -> str:
+    """A coin page carrying the escaped social links SocialFinder looks for, e.g. {'twitter': 'https://x.com/coin'}."""
+    fields = ''.join(f'\\"{name}\\":\\"{url}\\",' for name, url in socials.items())
+    return f'<html><script>self.__next_f.push([1,"{{{fields}\\"name\\":\\"coin\\"}}"])</script></html>'
+
+class FakeWeb:
+    """
+    Stand-in for requests.get: serves `pages` by URL (404 for URLs it has
+    no key for) after `latency` seconds. Install it with
+    mock.patch('requests.get', FakeWeb(pages)).
+    """
+
+    def __init__(self, pages: Dict[str, str], latency: float = 0.0):
+        self.pages = pages
+        self.latency = latency
+        self.requests = 0
+
+    def __call__(self, url: str, *args: Any, **kwargs: Any) -> SimpleNamespace:
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        try:
+            return SimpleNamespace(status_code=200, text=self.pages[url], url=url)
+        except KeyError:
+            return SimpleNamespace(status_code=404, text='', url=url)
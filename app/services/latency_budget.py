@@ -0,0 +1,141 @@
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from config.settings import settings
+from services.metrics_calculator import activity_timestamp
+
+QUALITY_TIERS = ('fast', 'balanced', 'full')
+
+# NLPProcessor.analyze_texts_sentiment mode used by each tier
+TIER_SENTIMENT_MODES = {
+    'fast': 'lexicon',
+    'balanced': 'sampled',
+    'full': 'full',
+}
+
+# Optional work each tier leaves out; any of it is also skipped once the deadline has passed
+TIER_SKIPPED_STAGES = {
+    'fast': ('keyword_extraction', 'spam_detection'),
+    'balanced': (),
+    'full': (),
+}
+
+OPTIONAL_STAGES = ('keyword_extraction', 'spam_detection')
+
+def seconds_left(deadline: Optional[float], default: Optional[float] = None) -> Optional[float]:
+    """Seconds until `deadline` (a time.time() value), capped at `default`; None when neither is set."""
+    if deadline is None:
+        return default
+    left = max(0.0, deadline - time.time())
+    return left if default is None else min(left, default)
+
+@dataclass
+class AnalysisBudget:
+    """
+    Quality tier and optional latency budget of one analysis request.
+
+    The tier picks the sentiment path, how many activities per platform are
+    analyzed and which optional stages run. With a latency budget the tier
+    defaults to the cheapest one that usually fits it, collectors get
+    LATENCY_COLLECTION_SHARE of the budget as their deadline and every stage
+    sees the overall deadline. Whatever was left out is recorded in
+    `degradations` and reported back to the caller.
+    """
+    tier: str = 'full'
+    latency_budget_ms: Optional[float] = None
+    requested: bool = False
+    started: float = field(default_factory=time.time)
+    degradations: List[str] = field(default_factory=list)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @classmethod
+    def from_request(cls, request_data: Dict[str, Any]) -> 'AnalysisBudget':
+        budget_ms = request_data.get('latency_budget_ms')
+        tier = request_data.get('quality_tier')
+        if tier is None and budget_ms is not None:
+            if budget_ms < settings.LATENCY_FAST_TIER_MS:
+                tier = 'fast'
+            elif budget_ms < settings.LATENCY_BALANCED_TIER_MS:
+                tier = 'balanced'
+        return cls(
+            tier=tier or 'full',
+            latency_budget_ms=budget_ms,
+            requested=budget_ms is not None or tier is not None
+        )
+
+    @property
+    def deadline(self) -> Optional[float]:
+        if self.latency_budget_ms is None:
+            return None
+        return self.started + self.latency_budget_ms / 1000
+
+    @property
+    def collection_deadline(self) -> Optional[float]:
+        if self.latency_budget_ms is None:
+            return None
+        return self.started + self.latency_budget_ms / 1000 * settings.LATENCY_COLLECTION_SHARE
+
+    @property
+    def expired(self) -> bool:
+        deadline = self.deadline
+        return deadline is not None and time.time() >= deadline
+
+    @property
+    def sentiment_mode(self) -> str:
+        return TIER_SENTIMENT_MODES[self.tier]
+
+    @property
+    def max_activities(self) -> Optional[int]:
+        if self.tier == 'fast':
+            return settings.FAST_TIER_MAX_ACTIVITIES
+        if self.tier == 'balanced':
+            return settings.BALANCED_TIER_MAX_ACTIVITIES
+        return None
+
+    def skips(self, stage: str) -> bool:
+        """Whether optional `stage` should be left out, recording the degradation if so."""
+        if stage in TIER_SKIPPED_STAGES[self.tier]:
+            self.degrade(f"{stage}:skipped_for_{self.tier}_tier")
+            return True
+        if stage in OPTIONAL_STAGES and self.expired:
+            self.degrade(f"{stage}:skipped_after_deadline")
+            return True
+        return False
+
+    def degrade(self, degradation: str):
+        with self._lock:
+            if degradation not in self.degradations:
+                self.degradations.append(degradation)
+
+    def cap_activities(self, platform_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Keeps the newest max_activities entries of each platform's
+        recent_activity, in the order the collector listed them. Collectors
+        do not always list newest first (Discord concatenates its channels),
+        so entries are picked by time; entries without one are dropped first.
+        """
+        limit = self.max_activities
+        if limit is None:
+            return platform_data
+        capped = {}
+        for platform, data in platform_data.items():
+            activity = data.get('recent_activity', [])
+            if len(activity) > limit:
+                self.degrade(f"{platform}:activities_capped_at_{limit}")
+                times = [activity_timestamp(entry) for entry in activity]
+                newest = sorted(range(len(activity)), key=lambda i: -math.inf if times[i] is None else times[i])[-limit:]
+                data = dict(data, recent_activity=[activity[i] for i in sorted(newest)])
+            capped[platform] = data
+        return capped
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            degradations = list(self.degradations)
+        return {
+            'tier': self.tier,
+            'latency_budget_ms': self.latency_budget_ms,
+            'elapsed_ms': round((time.time() - self.started) * 1000, 1),
+            'degradations': degradations
+        }
@@ -0,0 +1,419 @@
+import fcntl
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+import numpy as np
+from config.settings import settings
+from services.result_store import StoredResult, result_store
+
+# Ranked metric -> path of its value in a formatted analysis response
+LEADERBOARD_METRICS = {
+    'sentiment': ('overview', 'sentiment_score', 'value'),
+    'health': ('overview', 'community_health_score'),
+    'engagement': ('engagement_metrics', 'total_engagement_rate'),
+    'engagement_growth': ('engagement_metrics', 'activity_growth'),
+    'followers': ('community_insights', 'total_followers'),
+    'active_members': ('community_insights', 'active_members'),
+    'community_growth': ('community_insights', 'growth_rate'),
+    # Risk level bucket * 100 + identified risks, see risk_score
+    'risk': ('risk_assessment',),
+}
+METRIC_NAMES = tuple(LEADERBOARD_METRICS)
+# Metrics where lower ranks first unless the query says otherwise
+ASCENDING_METRICS = {'risk'}
+RISK_LEVELS = ('low', 'medium', 'high')
+PLATFORMS = ('twitter', 'reddit', 'discord', 'telegram')
+# 2: keys and metric names are unicode arrays, so the file loads without pickle
+LEADERBOARD_FORMAT_VERSION = 2
+
+def _number(value: Any) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        return math.nan
+    return float(value)
+
+def risk_level_code(response: Dict[str, Any]) -> int:
+    """Index of the response's risk level in RISK_LEVELS ("High Risk: ..." is high), -1 when unknown."""
+    level = str(response.get('risk_assessment', {}).get('risk_level', '')).split(' ')[0].lower()
+    return RISK_LEVELS.index(level) if level in RISK_LEVELS else -1
+
+def risk_score(response: Dict[str, Any]) -> float:
+    code = risk_level_code(response)
+    if code < 0:
+        return math.nan
+    return code * 100.0 + min(len(response['risk_assessment'].get('identified_risks') or []), 99)
+
+def metric_values(response: Dict[str, Any]) -> np.ndarray:
+    """The response's value for every metric in METRIC_NAMES order, NaN where missing."""
+    values = np.full(len(METRIC_NAMES), np.nan)
+    for column, (name, path) in enumerate(LEADERBOARD_METRICS.items()):
+        if name == 'risk':
+            values[column] = risk_score(response)
+            continue
+        value: Any = response
+        for part in path:
+            value = value.get(part) if isinstance(value, dict) else None
+        values[column] = _number(value)
+    return values
+
+def platform_mask(response: Dict[str, Any]) -> int:
+    breakdown = response.get('engagement_metrics', {}).get('platform_breakdown') or {}
+    return sum(1 << bit for bit, platform in enumerate(PLATFORMS) if platform in breakdown)
+
+@dataclass
+class LeaderboardQuery:
+    metric: str = 'sentiment'
+    ascending: bool = False
+    offset: int = 0
+    limit: int = 20
+    risk_levels: Optional[List[int]] = None
+    platform: Optional[str] = None
+    # Metric name -> (minimum, maximum), either may be None
+    ranges: Dict[str, Tuple[Optional[float], Optional[float]]] = field(default_factory=dict)
+    max_age: Optional[float] = None
+
+    @property
+    def filtered(self) -> bool:
+        return bool(self.risk_levels is not None or self.platform or self.ranges or self.max_age is not None)
+
+def parse_leaderboard_query(args) -> LeaderboardQuery:
+    """
+    Builds a query from request arguments: metric, order (asc/desc),
+    offset, limit, risk_level (comma separated), platform, max_age
+    (seconds) and min_<metric>/max_<metric>. Raises ValueError with a
+    message for the client on anything invalid.
+    """
+    metric = args.get('metric', 'sentiment')
+    if metric not in LEADERBOARD_METRICS:
+        raise ValueError(f"metric must be one of: {', '.join(METRIC_NAMES)}")
+    order = args.get('order') or ('asc' if metric in ASCENDING_METRICS else 'desc')
+    if order not in ('asc', 'desc'):
+        raise ValueError("order must be asc or desc")
+    query = LeaderboardQuery(metric=metric, ascending=order == 'asc')
+
+    try:
+        query.offset = int(args.get('offset', 0))
+        query.limit = int(args.get('limit', 20))
+        if args.get('max_age'):
+            query.max_age = float(args['max_age'])
+        for name in METRIC_NAMES:
+            low, high = args.get(f'min_{name}'), args.get(f'max_{name}')
+            if low is not None or high is not None:
+                query.ranges[name] = (float(low) if low is not None else None, float(high) if high is not None else None)
+    except ValueError:
+        raise ValueError("offset, limit, max_age and min_/max_ bounds must be numbers")
+    if query.offset < 0 or not 1 <= query.limit <= settings.LEADERBOARD_MAX_LIMIT:
+        raise ValueError(f"offset must be >= 0 and limit between 1 and {settings.LEADERBOARD_MAX_LIMIT}")
+
+    if args.get('risk_level'):
+        levels = args['risk_level'].lower().split(',')
+        unknown = set(levels) - set(RISK_LEVELS)
+        if unknown:
+            raise ValueError(f"risk_level must be among: {', '.join(RISK_LEVELS)}")
+        query.risk_levels = [RISK_LEVELS.index(level) for level in levels]
+    if args.get('platform'):
+        if args['platform'] not in PLATFORMS:
+            raise ValueError(f"platform must be one of: {', '.join(PLATFORMS)}")
+        query.platform = args['platform']
+    return query
+
+class LeaderboardIndex:
+    """
+    Materialized ranking of the latest analysis of every token.
+
+    Each token owns a row of columnar arrays (one value per metric, risk
+    level, platforms, analysis time). Every metric also keeps its rows
+    sorted by value (NaN left out), maintained incrementally: a token
+    whose value changes is shifted in place to its new position, so an
+    update costs two binary searches and a short memmove per metric, and an
+    unfiltered top-k is a slice. Filters build a mask over the columns once
+    and pick the matching rows out of the sorted order, both vectorized.
+
+    It is fed by a result store listener, so every finished analysis
+    (request or watchlist refresh) updates it. At most LEADERBOARD_MAX_TOKENS
+    tokens are kept, the least recently analyzed are dropped first. With
+    LEADERBOARD_FILE set it is loaded on first use and saved in the
+    background at most every LEADERBOARD_SAVE_INTERVAL seconds.
+
+    The index lives in the memory of one process, so behind a prefork
+    server each worker ranks the tokens it analyzed. Saves merge with the
+    file, keeping the newest analysis of each token, so the tokens of every
+    worker sharing LEADERBOARD_FILE are there at the next startup.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = settings.LEADERBOARD_FILE if path is None else path
+        self._keys: List[Optional[str]] = []
+        self._row_of: Dict[str, int] = {}
+        self._free: List[int] = []
+        # Removed since the last save, so merging with the file does not bring them back
+        self._removed: Set[str] = set()
+        self._values = np.zeros((0, len(METRIC_NAMES)), dtype=np.float64)
+        self._risk_levels = np.zeros(0, dtype=np.int8)
+        self._platforms = np.zeros(0, dtype=np.uint8)
+        self._computed_at = np.zeros(0, dtype=np.float64)
+        # Per metric: values ascending and the row holding each
+        self._sorted_values = [np.zeros(0, dtype=np.float64) for _ in METRIC_NAMES]
+        self._sorted_rows = [np.zeros(0, dtype=np.int64) for _ in METRIC_NAMES]
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._last_saved = time.time()
+        self._saving = False
+
+    def on_result(self, key: str, stored: StoredResult, previous: Optional[StoredResult]):
+        self.update(key, stored.response, stored.computed_at)
+
+    def update(self, key: str, response: Dict[str, Any], computed_at: Optional[float] = None):
+        values = metric_values(response)
+        with self._lock:
+            self._ensure_loaded()
+            row = self._row_of.get(key)
+            if row is None:
+                if len(self._row_of) >= settings.LEADERBOARD_MAX_TOKENS:
+                    self._remove(self._oldest_row())
+                row = self._allocate(key)
+                old = np.full(len(METRIC_NAMES), np.nan)
+            else:
+                old = self._values[row].copy()
+            self._values[row] = values
+            self._risk_levels[row] = risk_level_code(response)
+            self._platforms[row] = platform_mask(response)
+            self._computed_at[row] = computed_at or time.time()
+            for metric in range(len(METRIC_NAMES)):
+                self._reposition(metric, row, old[metric], values[metric])
+            save_due = bool(self.path) and not self._saving and time.time() - self._last_saved > settings.LEADERBOARD_SAVE_INTERVAL
+            if save_due:
+                self._saving = True
+
+        if save_due:
+            threading.Thread(target=self.save, name='leaderboard-save', daemon=True).start()
+
+    def remove(self, key: str):
+        with self._lock:
+            self._ensure_loaded()
+            row = self._row_of.get(key)
+            if row is not None:
+                self._remove(row)
+                self._removed.add(key)
+
+    def query(self, query: LeaderboardQuery) -> Dict[str, Any]:
+        metric = METRIC_NAMES.index(query.metric)
+        with self._lock:
+            self._ensure_loaded()
+            order = self._sorted_rows[metric]
+            if not query.ascending:
+                order = order[::-1]
+            if query.filtered:
+                order = order[self._filter_mask(query)[order]]
+            page = order[query.offset:query.offset + query.limit]
+            tokens = [self._entry(int(row)) for row in page]
+            total = len(order)
+
+        for rank, token in enumerate(tokens, start=query.offset + 1):
+            token['rank'] = rank
+        end = query.offset + len(tokens)
+        return {
+            'metric': query.metric,
+            'order': 'asc' if query.ascending else 'desc',
+            'total': total,
+            'offset': query.offset,
+            'limit': query.limit,
+            'next_offset': end if end < total else None,
+            'tokens': tokens,
+        }
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._row_of)
+
+    def _filter_mask(self, query: LeaderboardQuery) -> np.ndarray:
+        rows = len(self._keys)
+        mask = np.ones(rows, dtype=bool)
+        if query.risk_levels is not None:
+            # Indexed by level code; the unknown level (-1) reads the last slot, which stays False
+            allowed = np.zeros(len(RISK_LEVELS) + 1, dtype=bool)
+            allowed[query.risk_levels] = True
+            mask &= allowed[self._risk_levels[:rows]]
+        if query.platform:
+            mask &= (self._platforms[:rows] & (1 << PLATFORMS.index(query.platform))) != 0
+        if query.max_age is not None:
+            mask &= self._computed_at[:rows] >= time.time() - query.max_age
+        for name, (low, high) in query.ranges.items():
+            column = self._values[:rows, METRIC_NAMES.index(name)]
+            # NaN compares False, so tokens without the metric fail any bound on it
+            if low is not None:
+                mask &= column >= low
+            if high is not None:
+                mask &= column <= high
+        return mask
+
+    def _entry(self, row: int) -> Dict[str, Any]:
+        level = int(self._risk_levels[row])
+        return {
+            'token': self._keys[row],
+            'metrics': {
+                name: None if math.isnan(value) else value
+                for name, value in zip(METRIC_NAMES, self._values[row].tolist())
+            },
+            'risk_level': RISK_LEVELS[level] if level >= 0 else None,
+            'platforms': [platform for bit, platform in enumerate(PLATFORMS) if int(self._platforms[row]) >> bit & 1],
+            'computed_at': float(self._computed_at[row]),
+        }
+
+    def _reposition(self, metric: int, row: int, old: float, new: float):
+        values, rows = self._sorted_values[metric], self._sorted_rows[metric]
+        had, has = not math.isnan(old), not math.isnan(new)
+        if had:
+            position = self._position(metric, row, old)
+        if had and has:
+            # Shift the entries between the old and the new position by one, in place
+            target = int(np.searchsorted(values, new, 'right'))
+            if target > position:
+                target -= 1
+                values[position:target] = values[position + 1:target + 1]
+                rows[position:target] = rows[position + 1:target + 1]
+            elif target < position:
+                values[target + 1:position + 1] = values[target:position]
+                rows[target + 1:position + 1] = rows[target:position]
+            values[target], rows[target] = new, row
+        elif had:
+            self._sorted_values[metric] = np.delete(values, position)
+            self._sorted_rows[metric] = np.delete(rows, position)
+        elif has:
+            target = int(np.searchsorted(values, new, 'right'))
+            self._sorted_values[metric] = np.insert(values, target, new)
+            self._sorted_rows[metric] = np.insert(rows, target, row)
+
+    def _position(self, metric: int, row: int, value: float) -> int:
+        values = self._sorted_values[metric]
+        start = int(np.searchsorted(values, value, 'left'))
+        end = int(np.searchsorted(values, value, 'right'))
+        return start + int(np.flatnonzero(self._sorted_rows[metric][start:end] == row)[0])
+
+    def _allocate(self, key: str) -> int:
+        if self._free:
+            row = self._free.pop()
+            self._keys[row] = key
+        else:
+            row = len(self._keys)
+            self._keys.append(key)
+            if row >= len(self._values):
+                capacity = max(2 * len(self._values), 1024)
+                self._values = np.resize(self._values, (capacity, len(METRIC_NAMES)))
+                self._risk_levels = np.resize(self._risk_levels, capacity)
+                self._platforms = np.resize(self._platforms, capacity)
+                self._computed_at = np.resize(self._computed_at, capacity)
+        self._row_of[key] = row
+        return row
+
+    def _remove(self, row: int):
+        for metric, value in enumerate(self._values[row]):
+            self._reposition(metric, row, value, math.nan)
+        del self._row_of[self._keys[row]]
+        self._keys[row] = None
+        self._values[row] = np.nan
+        self._risk_levels[row] = -1
+        self._platforms[row] = 0
+        # Free rows are in no sorted order, so filters never see them; this keeps them out of eviction
+        self._computed_at[row] = np.inf
+        self._free.append(row)
+
+    def _oldest_row(self) -> int:
+        return int(np.argmin(self._computed_at[:len(self._keys)]))
+
+    def save(self):
+        """
+        Writes the live rows to `path` atomically, merged with the rows other
+        processes saved there: the newest analysis of each token is kept.
+        """
+        try:
+            with self._lock:
+                rows = np.array(list(self._row_of.values()), dtype=np.int64)
+                columns = {
+                    'keys': np.array([self._keys[row] for row in rows.tolist()], dtype=str),
+                    'values': self._values[rows],
+                    'risk_levels': self._risk_levels[rows],
+                    'platforms': self._platforms[rows],
+                    'computed_at': self._computed_at[rows],
+                }
+                removed, self._removed = self._removed, set()
+            # Held from reading the file to replacing it, so concurrent savers do not drop each other's rows
+            with open(f"{self.path}.lock", 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    on_disk = self._read_file()
+                except Exception as e:
+                    print(f"Error reading leaderboard, overwriting it: {e}")
+                    on_disk = None
+                if on_disk is not None:
+                    kept = np.array([key not in removed for key in on_disk['keys'].tolist()], dtype=bool)
+                    # Ours last, so they win ties below
+                    columns = {name: np.concatenate([on_disk[name][kept], column]) for name, column in columns.items()}
+                # Newest row of each key, oldest first so a smaller LEADERBOARD_MAX_TOKENS drops those on load
+                newest = {}
+                for row in np.argsort(columns['computed_at'], kind='stable').tolist():
+                    newest[columns['keys'][row]] = row
+                rows = np.array(list(newest.values()), dtype=np.int64)
+                rows = rows[np.argsort(columns['computed_at'][rows], kind='stable')][-settings.LEADERBOARD_MAX_TOKENS:]
+
+                # Per process, so prefork workers sharing the path do not write the same temporary file
+                temporary = f"{self.path}.{os.getpid()}.tmp"
+                with open(temporary, 'wb') as f:
+                    np.savez(
+                        f,
+                        version=np.array(LEADERBOARD_FORMAT_VERSION),
+                        metrics=np.array(METRIC_NAMES),
+                        **{name: column[rows] for name, column in columns.items()}
+                    )
+                os.replace(temporary, self.path)
+        except Exception as e:
+            print(f"Error saving leaderboard: {e}")
+        finally:
+            with self._lock:
+                self._last_saved = time.time()
+                self._saving = False
+
+    def _read_file(self) -> Optional[Dict[str, np.ndarray]]:
+        """The rows saved at `path`, None when there is no usable file."""
+        if not os.path.exists(self.path):
+            return None
+        with np.load(self.path) as saved:
+            if int(saved['version']) != LEADERBOARD_FORMAT_VERSION or tuple(saved['metrics']) != METRIC_NAMES:
+                print("Leaderboard file was written with other metrics, ignoring it")
+                return None
+            return {name: saved[name] for name in ('keys', 'values', 'risk_levels', 'platforms', 'computed_at')}
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path:
+            return
+        try:
+            saved = self._read_file()
+        except Exception as e:
+            print(f"Error loading leaderboard: {e}")
+            return
+        if saved is None:
+            return
+
+        keys = [str(key) for key in saved['keys']][-settings.LEADERBOARD_MAX_TOKENS:]
+        count = len(keys)
+        values = saved['values'][-count:] if count else saved['values'][:0]
+        risk_levels, platforms = saved['risk_levels'][-count:], saved['platforms'][-count:]
+        computed_at = saved['computed_at'][-count:]
+        self._keys = keys
+        self._row_of = {key: row for row, key in enumerate(keys)}
+        self._values, self._risk_levels = values.astype(np.float64), risk_levels.astype(np.int8)
+        self._platforms, self._computed_at = platforms.astype(np.uint8), computed_at.astype(np.float64)
+        for metric in range(len(METRIC_NAMES)):
+            column = self._values[:, metric]
+            rows = np.flatnonzero(~np.isnan(column))
+            rows = rows[np.argsort(column[rows], kind='stable')]
+            self._sorted_values[metric], self._sorted_rows[metric] = column[rows], rows
+
+leaderboard = LeaderboardIndex()
+result_store.add_listener(leaderboard.on_result)
@@ -1,9 +1,35 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 import numpy as np
 
+# Timestamp format of the syndication timeline; the Discord/Telegram collectors emit the same
+ACTIVITY_DATE_FORMAT = '%a %b %d %H:%M:%S %z %Y'
+
+def activity_timestamp(activity: Dict[str, Any]) -> Optional[float]:
+    """Epoch seconds of a collected activity, None when it has no parseable time."""
+    if activity.get('created_utc') is not None:
+        return float(activity['created_utc'])
+    activity_time = activity.get('created_at') or activity.get('date')
+    if activity_time:
+        try:
+            return datetime.strptime(activity_time, ACTIVITY_DATE_FORMAT).timestamp()
+        except ValueError as e:
+            print(f"Error parsing date: {e}")  # Handle parsing errors
+    return None
+
 class MetricsCalculator:
-    def calculate_engagement(self, platform_data: Dict[str, Any]) -> Dict[str, float]:
+    def parse_timestamps(self, platform_data: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        """Epoch seconds of every recent activity, per platform; unparseable entries are skipped."""
+        timestamps = {}
+
+        for platform, data in platform_data.items():
+            parsed = [activity_timestamp(activity) for activity in data.get('recent_activity', [])]
+            timestamps[platform] = np.array([ts for ts in parsed if ts is not None], dtype=np.float64)
+
+        return timestamps
+
+    def calculate_engagement(self, platform_data: Dict[str, Any],
+                             timestamps: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, float]:
         total_engagement = 0
         platform_breakdown = {}
         
@@ -13,7 +39,9 @@ class MetricsCalculator:
             total_engagement += platform_engagement['total']
 
         week_ago = (datetime.utcnow() - timedelta(days=7)).timestamp()
-        activity_growth = self._calculate_activity_growth(platform_data, week_ago)
+        if timestamps is None:
+            timestamps = self.parse_timestamps(platform_data)
+        activity_growth = self._calculate_activity_growth(timestamps, week_ago)
 
         return {
             'total_engagement_rate': total_engagement,
@@ -46,6 +74,10 @@ class MetricsCalculator:
             return self._calculate_twitter_engagement(data)
         elif platform == 'reddit':
             return self._calculate_reddit_engagement(data)
+        elif platform == 'discord':
+            return self._calculate_discord_engagement(data)
+        elif platform == 'telegram':
+            return self._calculate_telegram_engagement(data)
         # Add other platforms as needed
         return {'total': 0.0}
 
@@ -64,24 +96,47 @@ class MetricsCalculator:
         
         return engagement_metrics
 
-    def _calculate_activity_growth(self, platform_data: Dict[str, Any], week_ago: float) -> float:
+    def _calculate_reddit_engagement(self, data: Dict[str, Any]) -> Dict[str, float]:
+        engagement_metrics = {'total': 0.0, 'score': 0, 'comments': 0}
+
+        for post in data['recent_activity']:
+            engagement_metrics['score'] += post['score']
+            engagement_metrics['comments'] += post['num_comments']
+
+        engagement_metrics['total'] = engagement_metrics['score'] + engagement_metrics['comments']
+
+        return engagement_metrics
+
+    def _calculate_discord_engagement(self, data: Dict[str, Any]) -> Dict[str, float]:
+        engagement_metrics = {'total': 0.0, 'messages': 0, 'reactions': 0}
+
+        for message in data['recent_activity']:
+            engagement_metrics['messages'] += 1
+            engagement_metrics['reactions'] += message['reactions']
+
+        engagement_metrics['total'] = engagement_metrics['messages'] + engagement_metrics['reactions']
+
+        return engagement_metrics
+
+    def _calculate_telegram_engagement(self, data: Dict[str, Any]) -> Dict[str, float]:
+        engagement_metrics = {'total': 0.0, 'views': 0, 'forwards': 0}
+
+        for message in data['recent_activity']:
+            engagement_metrics['views'] += message['views']
+            engagement_metrics['forwards'] += message['forwards']
+
+        engagement_metrics['total'] = engagement_metrics['views'] + engagement_metrics['forwards']
+
+        return engagement_metrics
+
+    def _calculate_activity_growth(self, timestamps: Dict[str, np.ndarray], week_ago: float) -> float:
         total_activity_last_week = 0
         total_activity_current_week = 0
         
-        for platform, data in platform_data.items():
-            # Assuming 'recent_activity' contains timestamps and some activity metric
-            for activity in data.get('recent_activity', []):
-                activity_time = activity.get('created_at')
-                if activity_time:
-                    # Parse the date string using strptime
-                    try:
-                        activity_timestamp = datetime.strptime(activity_time, '%a %b %d %H:%M:%S %z %Y').timestamp()
-                        if activity_timestamp < week_ago:
-                            total_activity_last_week += 1  # Count activity from last week
-                        else:
-                            total_activity_current_week += 1  # Count current week activity
-                    except ValueError as e:
-                        print(f"Error parsing date: {e}")  # Handle parsing errors
+        for platform_timestamps in timestamps.values():
+            last_week = int((platform_timestamps < week_ago).sum())
+            total_activity_last_week += last_week  # Count activity from last week
+            total_activity_current_week += len(platform_timestamps) - last_week  # Count current week activity
 
         # Calculate growth rate
         if total_activity_last_week == 0:
@@ -110,6 +165,20 @@ class MetricsCalculator:
                 'active_members': active_members,
                 'activity_pattern': activity_pattern
             }
+        elif platform == 'discord':
+            recent_activity = data.get('recent_activity', [])
+            return {
+                'followers': data.get('server_info', {}).get('member_count', 0),
+                'active_members': len({message['author'] for message in recent_activity}),
+                'activity_pattern': self._analyze_activity_pattern(recent_activity)
+            }
+        elif platform == 'telegram':
+            recent_activity = data.get('recent_activity', [])
+            return {
+                'followers': data.get('channel_info', {}).get('participants_count', 0),
+                'active_members': len(recent_activity),
+                'activity_pattern': [message['date'] for message in recent_activity]
+            }
         # Add other platforms as needed
         return {'followers': 0, 'active_members': 0, 'activity_pattern': []}
 
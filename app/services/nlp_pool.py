@@ -0,0 +1,99 @@
+import multiprocessing
+import os
+import threading
+from typing import Any, List, Optional
+from config.settings import settings
+from services.nlp_processor import NLPProcessor
+
+class NLPPoolBusy(Exception):
+    """Raised when every worker is busy and the queue stays full past NLP_POOL_QUEUE_TIMEOUT."""
+
+def _run_task(method: str, texts: List[str], *args) -> Any:
+    # Already imported by the forkserver, so this is a dictionary lookup in the worker
+    from services import nlp_worker
+    return nlp_worker.run_task(method, texts, *args)
+
+class NLPWorkerPool:
+    """
+    Process pool serving the CPU-bound NLPProcessor methods (TextBlob, YAKE,
+    pairwise similarity, transformer inference) so they are not serialized by
+    the GIL across Flask threads.
+
+    Workers are forked from a forkserver that has preloaded services.nlp_worker,
+    so the model is loaded once and shared copy-on-write. A worker is replaced
+    after NLP_WORKER_MAX_TASKS tasks to bound memory creep, and at most
+    NLP_POOL_MAX_PENDING tasks may be queued or running at once.
+    """
+
+    def __init__(self, workers: int = settings.NLP_WORKERS,
+                 max_tasks_per_worker: int = settings.NLP_WORKER_MAX_TASKS,
+                 max_pending: int = settings.NLP_POOL_MAX_PENDING):
+        self.workers = workers
+        self.max_tasks_per_worker = max_tasks_per_worker or None
+        self.max_pending = max_pending or workers * 2
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        # A pool inherited through fork() belongs to the parent, start a fresh one
+        if self._pool is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pid != os.getpid():
+                    context = multiprocessing.get_context('forkserver')
+                    context.set_forkserver_preload(['services.nlp_worker'])
+                    self._pool = context.Pool(
+                        processes=self.workers,
+                        maxtasksperchild=self.max_tasks_per_worker
+                    )
+                    self._pid = os.getpid()
+        return self._pool
+
+    def call(self, method: str, texts: List[str], *args) -> Any:
+        if not self._slots.acquire(timeout=settings.NLP_POOL_QUEUE_TIMEOUT):
+            raise NLPPoolBusy(f"NLP worker pool is full ({self.max_pending} pending tasks)")
+        try:
+            return self._get_pool().apply_async(_run_task, (method, texts, *args)).get(settings.NLP_POOL_TASK_TIMEOUT)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.close()
+                self._pool.join()
+            self._pool = None
+
+class PooledNLPProcessor(NLPProcessor):
+    """NLPProcessor whose CPU-heavy methods run in an NLPWorkerPool; text extraction stays local."""
+
+    def __init__(self, pool: NLPWorkerPool):
+        super().__init__()
+        self.pool = pool
+
+    def analyze_texts_sentiment(self, texts: List[str], scorer: Optional[str] = 'textblob', mode: str = 'full',
+                                deadline: Optional[float] = None, tokens: Optional[List[List[str]]] = None) -> float:
+        return self.pool.call('analyze_texts_sentiment', texts, scorer, mode, deadline, tokens)
+
+    def extract_topics_from_texts(self, texts: List[str]) -> List[str]:
+        return self.pool.call('extract_topics_from_texts', texts)
+
+    def rerank_topics(self, texts: List[str], candidates: List[str]) -> List[str]:
+        return self.pool.call('rerank_topics', texts, candidates)
+
+    def polarity_scores(self, texts: List[str], scorer: Optional[str] = None,
+                        tokens: Optional[List[List[str]]] = None) -> List[float]:
+        return self.pool.call('polarity_scores', texts, scorer, tokens)
+
+    def detect_spam_patterns(self, texts: List[str], tokens: Optional[List[List[str]]] = None,
+                             counts: Optional[List[int]] = None) -> bool:
+        return self.pool.call('detect_spam_patterns', texts, tokens, counts)
+
+    def warm_up(self):
+        self.pool._get_pool()
+
+def create_nlp_processor() -> NLPProcessor:
+    if settings.NLP_WORKERS > 0:
+        return PooledNLPProcessor(NLPWorkerPool())
+    return NLPProcessor()
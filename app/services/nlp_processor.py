@@ -1,13 +1,58 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+import math
 import numpy as np
-from transformers import pipeline
+import torch
 from collections import Counter
 from textblob import TextBlob
 import yake
+import threading
+import time
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+from config.settings import settings
+from services.lexicon_scorer import LexiconSentimentScorer
+from services.sentiment_model import load_sentiment_pipeline
+from services.text_normalizer import normalize_text, tokenize
+
+SENTIMENT_SCORERS = ('textblob', 'fast')
+# lexicon: lexicon scores only, sampled: transformer on an evenly spaced sample, full: transformer on every text (long ones in chunks)
+SENTIMENT_MODES = ('lexicon', 'sampled', 'full')
+
+def chunk_starts(length: int, window: int, overlap: int, max_chunks: int) -> List[int]:
+    """
+    Start offsets of the windows a text of `length` tokens is scored in: one
+    window when it fits, otherwise windows overlapping by `overlap` tokens,
+    at most `max_chunks` of them spread evenly from the start to the end.
+    """
+    if length == 0:
+        return []
+    if length <= window:
+        return [0]
+    count = min(max_chunks, math.ceil((length - overlap) / (window - overlap)))
+    if count <= 1:
+        return [0]
+    return [int(round(start)) for start in np.linspace(0, length - window, count)]
+
+def special_token_ids(tokenizer) -> tuple:
+    """
+    The ids the tokenizer puts before and after a single sequence ([CLS] and
+    [SEP] for BERT), found by encoding a probe word with and without them.
+    """
+    probe = tokenizer('a', add_special_tokens=False)['input_ids']
+    full = tokenizer('a')['input_ids']
+    for start in range(len(full) - len(probe) + 1):
+        if full[start:start + len(probe)] == probe:
+            return full[:start], full[start + len(probe):]
+    return [], []
 
 class NLPProcessor:
-    def __init__(self):
-        self.sentiment_analyzer = pipeline("sentiment-analysis")
+    def __init__(self, model_threads: Optional[int] = None, sentiment_analyzer=None):
+        # Intra-op threads for the sentiment model, SENTIMENT_THREADS by default;
+        # pass a loaded pipeline as sentiment_analyzer to use it instead
+        self.model_threads = model_threads
+        self._sentiment_analyzer = sentiment_analyzer
+        self._sentiment_lock = threading.Lock()
+        self._lexicon_scorer = None
         self.keyword_extractor = yake.KeywordExtractor(
             lan="en",
             n=2,
@@ -16,40 +61,197 @@ class NLPProcessor:
             features=None
         )
 
+    @property
+    def sentiment_analyzer(self):
+        # Loaded on first use so requests that never reach sentiment skip the model
+        if self._sentiment_analyzer is None:
+            with self._sentiment_lock:
+                if self._sentiment_analyzer is None:
+                    self._sentiment_analyzer = load_sentiment_pipeline(threads=self.model_threads)
+        return self._sentiment_analyzer
+
+    @property
+    def lexicon_scorer(self) -> LexiconSentimentScorer:
+        if self._lexicon_scorer is None:
+            with self._sentiment_lock:
+                if self._lexicon_scorer is None:
+                    self._lexicon_scorer = LexiconSentimentScorer()
+        return self._lexicon_scorer
+
     def analyze_sentiment(self, platform_data: Dict[str, Any], direct_text=False) -> float:
         if direct_text:
             all_texts = [platform_data]
         else:
             all_texts = self._extract_texts(platform_data)
-        sentiments = []
+        return self.analyze_texts_sentiment(all_texts)
+
+    def analyze_texts_sentiment(self, texts: List[str], scorer: Optional[str] = 'textblob', mode: str = 'full',
+                                deadline: Optional[float] = None, tokens: Optional[List[List[str]]] = None) -> float:
+        """
+        Mean sentiment of `texts`. The lexicon part of each score comes from
+        TextBlob, or with scorer='fast' from one vectorized pass over the batch
+        (scorer=None picks by batch size, see polarity_scores).
+        `mode` picks which texts also go through the transformer (see
+        SENTIMENT_MODES); after `deadline` (a time.time() value) the remaining
+        texts get lexicon scores only.
+        """
+        if mode not in SENTIMENT_MODES:
+            raise ValueError(f"Unknown sentiment mode: {mode}")
+        lexicon_scores = np.asarray(self.polarity_scores(texts, scorer, tokens), dtype=float)
+        non_empty = np.array([bool(text.strip()) for text in texts], dtype=bool)
+
+        if mode == 'full':
+            selected = np.flatnonzero(non_empty)
+        elif mode == 'sampled':
+            selected = np.array(self._transformer_sample(texts), dtype=np.int64)
+        else:
+            selected = np.array([], dtype=np.int64)
+
+        sentiments = lexicon_scores.copy()
+        if len(selected):
+            try:
+                transformer = self.transformer_scores([texts[i] for i in selected], deadline)
+                scored = ~np.isnan(transformer)
+                # Combine both scores with more weight on transformer
+                sentiments[selected[scored]] = transformer[scored] * 0.7 + lexicon_scores[selected[scored]] * 0.3
+            except Exception:
+                # Model unavailable, the lexicon scores stand
+                pass
+
+        sentiments = sentiments[non_empty]
+        return float(np.mean(sentiments)) if len(sentiments) else 0.0
+
+    def transformer_scores(self, texts: List[str], deadline: Optional[float] = None) -> np.ndarray:
+        """
+        Signed transformer sentiment per text (+p for a positive label, -p
+        otherwise), NaN where the deadline came before the text was scored.
+
+        The batch is tokenized once. Texts longer than the model window are
+        split into at most SENTIMENT_MAX_CHUNKS overlapping windows spread
+        over the whole text, chunks of all texts are scored together in
+        batches of SENTIMENT_BATCH_SIZE (shortest first, so little padding),
+        and a text's score is the token-weighted mean of its chunks.
+        """
+        classifier = self.sentiment_analyzer
+        tokenizer, model = classifier.tokenizer, classifier.model
+        window = self._chunk_window(tokenizer, model)
+        overlap = min(settings.SENTIMENT_CHUNK_OVERLAP, window // 2)
+
+        token_ids = tokenizer(list(texts), add_special_tokens=False, truncation=False, verbose=False)['input_ids']
+        chunks, owners = [], []
+        for owner, ids in enumerate(token_ids):
+            for start in chunk_starts(len(ids), window, overlap, settings.SENTIMENT_MAX_CHUNKS):
+                chunks.append(ids[start:start + window])
+                owners.append(owner)
+
+        prefix, suffix = special_token_ids(tokenizer)
+        chunk_scores = np.full(len(chunks), np.nan)
+        positive = self._positive_label_index(model)
+        order = sorted(range(len(chunks)), key=lambda c: len(chunks[c]))
+        for offset in range(0, len(order), settings.SENTIMENT_BATCH_SIZE):
+            if deadline is not None and time.time() >= deadline:
+                break
+            batch = order[offset:offset + settings.SENTIMENT_BATCH_SIZE]
+            encoded = tokenizer.pad(
+                {'input_ids': [prefix + chunks[c] + suffix for c in batch]},
+                return_tensors='pt'
+            )
+            with torch.inference_mode():
+                logits = model(input_ids=encoded['input_ids'], attention_mask=encoded['attention_mask']).logits
+            probabilities = torch.softmax(logits, dim=-1).numpy()
+            top = probabilities.max(axis=1)
+            chunk_scores[batch] = np.where(probabilities.argmax(axis=1) == positive, top, -top)
+
+        owners = np.array(owners, dtype=np.int64)
+        lengths = np.array([len(chunk) for chunk in chunks], dtype=float)
+        done = ~np.isnan(chunk_scores)
+        weighted = np.bincount(owners[done], weights=chunk_scores[done] * lengths[done], minlength=len(texts))
+        weights = np.bincount(owners[done], weights=lengths[done], minlength=len(texts))
+        return np.divide(weighted, weights, out=np.full(len(texts), np.nan), where=weights > 0)
+
+    def _chunk_window(self, tokenizer, model) -> int:
+        # Content tokens per chunk: the model limit minus [CLS]/[SEP], or SENTIMENT_CHUNK_TOKENS if smaller
+        limit = min(tokenizer.model_max_length, getattr(model.config, 'max_position_embeddings', 512))
+        window = limit - tokenizer.num_special_tokens_to_add()
+        if settings.SENTIMENT_CHUNK_TOKENS > 0:
+            window = min(window, settings.SENTIMENT_CHUNK_TOKENS)
+        return window
+
+    @staticmethod
+    def _positive_label_index(model) -> int:
+        for index, label in model.config.id2label.items():
+            if str(label).upper() == 'POSITIVE':
+                return int(index)
+        return len(model.config.id2label) - 1
+
+    def _transformer_sample(self, texts: List[str]) -> List[int]:
+        # Evenly spaced over the batch so the sample covers every platform's activity
+        eligible = [i for i, text in enumerate(texts) if text.strip()]
+        size = settings.SAMPLED_TRANSFORMER_TEXTS
+        if len(eligible) <= size:
+            return eligible
+        return [eligible[int(j)] for j in np.linspace(0, len(eligible) - 1, size)]
+
+    def polarity_scores(self, texts: List[str], scorer: Optional[str] = None,
+                        tokens: Optional[List[List[str]]] = None) -> List[float]:
+        """
+        Lexicon polarity per text. Without an explicit scorer, batches of at
+        least FAST_SENTIMENT_MIN_BATCH texts use the vectorized scorer, which
+        reuses `tokens` (see normalize_texts) when they are given.
+        """
+        if scorer is None:
+            scorer = 'fast' if len(texts) >= settings.FAST_SENTIMENT_MIN_BATCH else 'textblob'
+        if scorer not in SENTIMENT_SCORERS:
+            raise ValueError(f"Unknown sentiment scorer: {scorer}")
+        if scorer == 'fast':
+            if tokens is not None:
+                return self.lexicon_scorer.score_tokens(tokens).tolist()
+            return self.lexicon_scorer.score(texts).tolist()
+        return [TextBlob(text).sentiment.polarity for text in texts]
+
+    def detect_spam_patterns(self, texts: List[str], tokens: Optional[List[List[str]]] = None,
+                             counts: Optional[List[int]] = None) -> bool:
+        """
+        True when more than 10% as many text pairs as texts are near duplicates
+        (cosine similarity of term counts above 0.8). All texts are vectorized
+        once and compared in one sparse product. `counts` says how many
+        collected texts each entry stands for, so deduplicated texts still
+        count as the duplicate pairs they were.
+        """
+        duplicate_threshold = 0.8
+        if tokens is None:
+            tokens = [tokenize(normalize_text(text)) for text in texts]
+        counts = np.ones(len(tokens)) if counts is None else np.asarray(counts, dtype=float)
+
+        try:
+            vectors = CountVectorizer(analyzer=_similarity_terms).fit_transform(tokens)
+        except ValueError:
+            # Empty vocabulary, nothing to compare
+            return False
+
+        similar = (cosine_similarity(vectors, dense_output=False) > duplicate_threshold).astype(float)
+        self_similar = similar.diagonal()
+        cross_pairs = (counts @ (similar @ counts) - (self_similar * counts ** 2).sum()) / 2
+        duplicate_pairs = (self_similar * counts * (counts - 1) / 2).sum()
+        similar_content_count = cross_pairs + duplicate_pairs
         
-        for text in all_texts:
-            if not text.strip():
-                continue
-                
-            # Use TextBlob for faster processing of large amounts of text
-            blob_sentiment = TextBlob(text).sentiment.polarity
-            
-            # Use transformers for more accurate but slower analysis of important text
-            if len(text.split()) < 100:  # Only for shorter texts
-                try:
-                    transformer_result = self.sentiment_analyzer(text[:512])[0]
-                    transformer_score = 1 if transformer_result['label'] == 'POSITIVE' else -1
-                    transformer_score *= transformer_result['score']
-                    
-                    # Combine both scores with more weight on transformer
-                    sentiment = (transformer_score * 0.7) + (blob_sentiment * 0.3)
-                except:
-                    sentiment = blob_sentiment
-            else:
-                sentiment = blob_sentiment
-                
-            sentiments.append(sentiment)
-            
-        return np.mean(sentiments) if sentiments else 0.0
+        return similar_content_count > counts.sum() * 0.1  # More than 10% similar content
+
+    def warm_up(self):
+        """Loads the transformer weights and the TextBlob lexicon ahead of the first request."""
+        TextBlob("warm up").sentiment
+        self.lexicon_scorer
+        try:
+            self.sentiment_analyzer("warm up")
+        except Exception as e:
+            # analyze_texts_sentiment falls back to TextBlob when the model is unavailable
+            print(f"Error loading sentiment model: {e}")
 
     def extract_trending_topics(self, platform_data: Dict[str, Any]) -> List[str]:
-        all_texts = self._extract_texts(platform_data)
+        return self.extract_topics_from_texts(self._extract_texts(platform_data))
+
+    def extract_topics_from_texts(self, texts: List[str]) -> List[str]:
+        all_texts = texts
         combined_text = " ".join(all_texts)
         
         # Extract keywords using YAKE
@@ -60,6 +262,13 @@ class NLPProcessor:
         
         return [keyword[0] for keyword in sorted_keywords]
 
+    def rerank_topics(self, texts: List[str], candidates: List[str]) -> List[str]:
+        """Orders candidate phrases by their YAKE score over `texts`; phrases YAKE did not pick keep their order, last."""
+        keywords = self.keyword_extractor.extract_keywords(" ".join(texts))
+        yake_scores = {keyword.lower(): score for keyword, score in keywords}
+        ranked = sorted((phrase for phrase in candidates if phrase in yake_scores), key=yake_scores.get)
+        return ranked + [phrase for phrase in candidates if phrase not in yake_scores]
+
     def _extract_texts(self, platform_data: Dict[str, Any]) -> List[str]:
         texts = []
         
@@ -70,6 +279,13 @@ class NLPProcessor:
                 for post in data['recent_activity']:
                     texts.append(post['title'])
                     texts.append(post['text'])
-            # Add other platforms as needed
+                    texts.extend(comment['text'] for comment in post.get('comments', []))
+            elif platform == 'discord':
+                texts.extend(message['content'] for message in data['recent_activity'])
+            elif platform == 'telegram':
+                texts.extend(message['text'] for message in data['recent_activity'])
             
-        return texts 
\ No newline at end of file
+        return texts
+
+def _similarity_terms(tokens: List[str]) -> List[str]:
+    return [token for token in tokens if token != '!']
\ No newline at end of file
@@ -0,0 +1,15 @@
+"""
+Worker-side state of the NLP process pool. The forkserver imports this module
+once (see NLPWorkerPool), so the transformer weights and lexicons are loaded
+a single time and every worker forked from it shares those pages
+copy-on-write. The web process never imports it.
+"""
+from config.settings import settings
+from services.nlp_processor import NLPProcessor
+
+# One intra-op thread per worker by default; parallelism comes from the processes
+processor = NLPProcessor(model_threads=settings.NLP_WORKER_THREADS)
+processor.warm_up()
+
+def run_task(method: str, texts, *args):
+    return getattr(processor, method)(texts, *args)
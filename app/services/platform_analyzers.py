@@ -1,17 +1,27 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Callable
+import asyncio
 import tweepy
 import praw
 import discord
 import telethon
+from telethon.tl.functions.channels import GetFullChannelRequest
 import requests
 import json
-from datetime import datetime, timedelta
-from config import settings
+import time
+from datetime import datetime, timedelta, timezone
+from config.settings import settings
+from services.metrics_calculator import ACTIVITY_DATE_FORMAT
+from services.latency_budget import seconds_left
 
 class PlatformAnalyzer(ABC):
     @abstractmethod
-    def collect_data(self, handle: str) -> Dict[str, Any]:
+    def collect_data(self, handle: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Collects recent activity for `handle`, returning what it has by `deadline` (a time.time() value)."""
+        pass
+
+    def reset_after_fork(self):
+        """Drops connections inherited from the parent process; they are reopened on first use."""
         pass
 
     def _calculate_time_window(self) -> tuple:
@@ -29,14 +39,14 @@ class TwitterAnalyzer(PlatformAnalyzer):
             access_token_secret="YOUR_ACCESS_TOKEN_SECRET"
         )
 
-    def collect_data(self, handle: str) -> Dict[str, Any]:
+    def collect_data(self, handle: str, deadline: Optional[float] = None) -> Dict[str, Any]:
         print("handle",handle)
         username = handle.split("/")[-1]
         username = "MagicEden"
         print("username",username)
         url = f"https://syndication.twitter.com/srv/timeline-profile/screen-name/{username}"
 
-        r = requests.get(url)
+        r = requests.get(url, timeout=seconds_left(deadline))
 
         html = r.text
 
@@ -86,107 +96,330 @@ class TwitterAnalyzer(PlatformAnalyzer):
         }
 
 class RedditAnalyzer(PlatformAnalyzer):
+    """
+    Talks to the raw listing endpoints instead of lazy PRAW models so every
+    HTTP round-trip is explicit and counted against REDDIT_REQUEST_BUDGET.
+    """
+
     def __init__(self):
-        self.reddit = praw.Reddit(
+        self.reddit = self._create_client()
+
+    def _create_client(self) -> praw.Reddit:
+        return praw.Reddit(
             client_id="YOUR_CLIENT_ID",
             client_secret="YOUR_CLIENT_SECRET",
             user_agent="SocioPulse/1.0"
         )
 
-    def collect_data(self, subreddit_name: str) -> Dict[str, Any]:
-        subreddit = self.reddit.subreddit(subreddit_name)
+    def reset_after_fork(self):
+        # PRAW's HTTP session may hold the parent's keep-alive sockets
+        self.reddit = self._create_client()
+
+    def collect_data(self, subreddit_name: str, deadline: Optional[float] = None) -> Dict[str, Any]:
         week_ago, _ = self._calculate_time_window()
+        budget = RequestBudget(settings.REDDIT_REQUEST_BUDGET, deadline)
+
+        # A single about.json call carries every community field we need
+        about = self._get(f"r/{subreddit_name}/about", budget=budget)['data']
 
-        posts = list(subreddit.new(limit=100))
+        posts = list(self.iter_recent_posts(subreddit_name, week_ago.timestamp(), budget))
+
+        if settings.REDDIT_COMMENT_MODE == 'recent':
+            self._attach_recent_comments(subreddit_name, posts, week_ago.timestamp(), budget)
+        elif settings.REDDIT_COMMENT_MODE == 'top':
+            self._attach_top_comments(posts, budget)
         
         return {
             'community_info': {
-                'subscribers': subreddit.subscribers,
-                'active_users': subreddit.active_user_count,
-                'created_utc': subreddit.created_utc
+                'subscribers': about.get('subscribers') or 0,
+                'active_users': about.get('active_user_count') or about.get('accounts_active') or 0,
+                'created_utc': about.get('created_utc')
             },
-            'recent_activity': [
-                {
-                    'title': post.title,
-                    'text': post.selftext,
-                    'score': post.score,
-                    'num_comments': post.num_comments,
-                    'created_utc': post.created_utc
+            'recent_activity': posts,
+            'requests_used': budget.used,
+            'deadline_reached': budget.expired
+        }
+
+    def iter_recent_posts(self, subreddit_name: str, since: float, budget: 'RequestBudget'):
+        """
+        Pages through /new (newest first) and stops at the first post older
+        than `since`, when REDDIT_MAX_POSTS is reached or the budget runs out.
+        """
+        after = None
+        yielded = 0
+
+        while budget.remaining > 0:
+            listing = self._get(
+                f"r/{subreddit_name}/new",
+                params={'limit': settings.REDDIT_PAGE_SIZE, 'after': after, 'raw_json': 1},
+                budget=budget
+            )['data']
+
+            for child in listing['children']:
+                post = child['data']
+                if post['created_utc'] <= since:
+                    return
+                yield {
+                    'id': post['name'],
+                    'title': post['title'],
+                    'text': post['selftext'],
+                    'score': post['score'],
+                    'num_comments': post['num_comments'],
+                    'created_utc': post['created_utc'],
+                    'comments': []
                 }
-                for post in posts
-                if post.created_utc > week_ago.timestamp()
-            ]
-        } 
+                yielded += 1
+                if yielded >= settings.REDDIT_MAX_POSTS:
+                    return
+
+            after = listing.get('after')
+            if not after:
+                return
+
+    def _attach_recent_comments(self, subreddit_name: str, posts: List[Dict[str, Any]],
+                                since: float, budget: 'RequestBudget'):
+        # /r/<sub>/comments returns the newest comments of the whole subreddit,
+        # 100 per request, instead of one request per post
+        posts_by_id = {post['id']: post for post in posts}
+        after = None
+
+        while budget.remaining > 0:
+            listing = self._get(
+                f"r/{subreddit_name}/comments",
+                params={'limit': settings.REDDIT_PAGE_SIZE, 'after': after, 'raw_json': 1},
+                budget=budget
+            )['data']
+
+            for child in listing['children']:
+                comment = child['data']
+                if comment['created_utc'] <= since:
+                    return
+                post = posts_by_id.get(comment['link_id'])
+                if post is not None:
+                    post['comments'].append({'text': comment['body'], 'score': comment['score']})
+
+            after = listing.get('after')
+            if not after:
+                return
+
+    def _attach_top_comments(self, posts: List[Dict[str, Any]], budget: 'RequestBudget'):
+        # Spend the remaining budget on the most discussed posts first
+        for post in sorted(posts, key=lambda post: post['num_comments'], reverse=True):
+            if budget.remaining <= 0 or post['num_comments'] == 0:
+                return
+            thread = self._get(
+                f"comments/{post['id'][3:]}",
+                params={'sort': 'top', 'limit': settings.REDDIT_TOP_COMMENTS, 'depth': 1, 'raw_json': 1},
+                budget=budget
+            )
+            post['comments'] = [
+                {'text': child['data']['body'], 'score': child['data']['score']}
+                for child in thread[1]['data']['children']
+                if child['kind'] == 't1'
+            ][:settings.REDDIT_TOP_COMMENTS]
+
+    def _get(self, path: str, params: Optional[Dict[str, Any]] = None, budget: Optional['RequestBudget'] = None) -> Any:
+        if budget is not None:
+            budget.spend()
+        params = {key: value for key, value in (params or {}).items() if value is not None}
+        return self.reddit.request(method='GET', path=path, params=params)
+
+class RequestBudget:
+    """Caps the requests of one collection; none remain once `deadline` has passed."""
+
+    def __init__(self, limit: int, deadline: Optional[float] = None):
+        self.limit = limit
+        self.deadline = deadline
+        self.used = 0
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.time() >= self.deadline
+
+    @property
+    def remaining(self) -> int:
+        if self.expired:
+            return 0
+        return self.limit - self.used
+
+    def spend(self):
+        self.used += 1
 
 class DiscordAnalyzer(PlatformAnalyzer):
-    def __init__(self):
-        self.client = discord.Client()
+    """
+    Keeps a single logged-in Discord HTTP session alive on the background
+    event loop. The client is created lazily inside the loop so that it is
+    bound to it; pass `client_factory` to inject a fake client for offline use.
+    """
+
+    def __init__(self, client_factory: Optional[Callable[[], Any]] = None):
         self.token = settings.DISCORD_BOT_TOKEN
+        self.client_factory = client_factory or (lambda: discord.Client(intents=discord.Intents.none()))
+        self.client = None
+        self._start_lock = None
+        self._read_semaphore = None
+
+    async def _ensure_started(self):
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+            self._read_semaphore = asyncio.Semaphore(settings.COLLECTOR_MAX_CONCURRENT_READS)
+
+        async with self._start_lock:
+            if self.client is None:
+                client = self.client_factory()
+                await client.login(self.token)
+                self.client = client
+        return self.client
 
-    async def collect_data(self, server_id: str) -> Dict[str, Any]:
+    def reset_after_fork(self):
+        # The session and its locks belong to the parent's event loop, which does not run here
+        self.client = None
+        self._start_lock = None
+        self._read_semaphore = None
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    async def collect_data(self, server_id: str, deadline: Optional[float] = None) -> Dict[str, Any]:
         week_ago, _ = self._calculate_time_window()
+        week_ago = week_ago.replace(tzinfo=timezone.utc)
         
         try:
-            guild = await self.client.fetch_guild(int(server_id))
+            client = await self._ensure_started()
+            # with_counts returns approximate_member_count with the guild itself,
+            # no need to page through the member list
+            guild = await client.fetch_guild(int(server_id), with_counts=True)
             channels = await guild.fetch_channels()
-            
+            text_channels = [
+                channel for channel in channels
+                if getattr(channel, 'type', None) == discord.ChannelType.text
+            ]
+
+            reads = [
+                asyncio.ensure_future(self._read_channel_history(channel, week_ago))
+                for channel in text_channels
+            ]
+            if reads:
+                # Channels still being read at the deadline are dropped, the rest are kept
+                _, unfinished = await asyncio.wait(reads, timeout=seconds_left(deadline))
+                for read in unfinished:
+                    read.cancel()
+                await asyncio.gather(*unfinished, return_exceptions=True)
+
             messages = []
-            for channel in channels:
-                if isinstance(channel, discord.TextChannel):
-                    async for message in channel.history(limit=100, after=week_ago):
-                        messages.append({
-                            'content': message.content,
-                            'created_at': message.created_at,
-                            'reactions': len(message.reactions),
-                            'author': str(message.author)
-                        })
+            deadline_reached = False
+            for channel, read in zip(text_channels, reads):
+                if read.cancelled():
+                    print(f"Discord channel {channel} not read before the deadline")
+                    deadline_reached = True
+                    continue
+                if read.exception() is not None:
+                    print(f"Error reading Discord channel {channel}: {read.exception()}")
+                    continue
+                messages.extend(read.result())
 
             return {
                 'server_info': {
-                    'member_count': guild.member_count,
-                    'created_at': guild.created_at
+                    'member_count': guild.approximate_member_count or guild.member_count or 0,
+                    'presence_count': guild.approximate_presence_count or 0,
+                    'created_at': guild.created_at.strftime(ACTIVITY_DATE_FORMAT)
                 },
-                'recent_activity': messages
+                'recent_activity': messages,
+                'deadline_reached': deadline_reached
             }
         except Exception as e:
             print(f"Error collecting Discord data: {e}")
             return {'server_info': {}, 'recent_activity': []}
 
+    async def _read_channel_history(self, channel, week_ago: datetime) -> List[Dict[str, Any]]:
+        messages = []
+        async with self._read_semaphore:
+            async for message in channel.history(limit=settings.COLLECTOR_HISTORY_LIMIT, after=week_ago):
+                messages.append({
+                    'content': message.content,
+                    'created_at': message.created_at.strftime(ACTIVITY_DATE_FORMAT),
+                    'reactions': sum(reaction.count for reaction in message.reactions),
+                    'author': str(message.author)
+                })
+        return messages
+
 class TelegramAnalyzer(PlatformAnalyzer):
-    def __init__(self):
-        self.client = telethon.TelegramClient(
-            'sociopulse_bot',
+    """
+    Starts the Telegram session once on the background event loop and reuses
+    it for every collection. Pass `client_factory` to inject a fake client.
+    """
+
+    def __init__(self, client_factory: Optional[Callable[[], Any]] = None):
+        self.client_factory = client_factory or (lambda: telethon.TelegramClient(
+            settings.TELEGRAM_SESSION,
             settings.TELEGRAM_API_ID,
             settings.TELEGRAM_API_HASH
-        )
+        ))
+        self.client = None
+        self._start_lock = None
+        self._read_semaphore = None
+
+    async def _ensure_started(self):
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+            self._read_semaphore = asyncio.Semaphore(settings.COLLECTOR_MAX_CONCURRENT_READS)
 
-    async def collect_data(self, channel_name: str) -> Dict[str, Any]:
+        async with self._start_lock:
+            if self.client is None or not self.client.is_connected():
+                client = self.client or self.client_factory()
+                await client.start(bot_token=settings.TELEGRAM_BOT_TOKEN)
+                self.client = client
+        return self.client
+
+    def reset_after_fork(self):
+        self.client = None
+        self._start_lock = None
+        self._read_semaphore = None
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.disconnect()
+            self.client = None
+
+    async def collect_data(self, channel_name: str, deadline: Optional[float] = None) -> Dict[str, Any]:
         week_ago, _ = self._calculate_time_window()
+        week_ago = week_ago.replace(tzinfo=timezone.utc)
         
         try:
-            await self.client.start(bot_token=settings.TELEGRAM_BOT_TOKEN)
-            
-            channel = await self.client.get_entity(channel_name)
+            client = await self._ensure_started()
+            channel = await client.get_entity(channel_name)
+
             messages = []
-            
-            async for message in self.client.iter_messages(channel, limit=100):
-                if message.date > week_ago:
+            deadline_reached = False
+            async with self._read_semaphore:
+                # Messages come newest first, stop as soon as we leave the window
+                async for message in client.iter_messages(channel, limit=settings.COLLECTOR_HISTORY_LIMIT):
+                    if message.date <= week_ago:
+                        break
+                    if deadline is not None and time.time() >= deadline:
+                        deadline_reached = True
+                        break
                     messages.append({
-                        'text': message.text,
-                        'date': message.date,
-                        'views': message.views,
-                        'forwards': message.forwards
+                        'text': message.text or '',
+                        'date': message.date.strftime(ACTIVITY_DATE_FORMAT),
+                        'views': message.views or 0,
+                        'forwards': message.forwards or 0
                     })
 
-            participants_count = await self.client.get_participants(channel, limit=0)
+            # The full channel info carries the member count, fetching the
+            # participant list just to count it is slow and needs admin rights
+            full_channel = await client(GetFullChannelRequest(channel))
             
             return {
                 'channel_info': {
-                    'participants_count': len(participants_count),
-                    'created_at': channel.date
+                    'participants_count': full_channel.full_chat.participants_count or 0,
+                    'created_at': channel.date.strftime(ACTIVITY_DATE_FORMAT)
                 },
-                'recent_activity': messages
+                'recent_activity': messages,
+                'deadline_reached': deadline_reached
             }
         except Exception as e:
             print(f"Error collecting Telegram data: {e}")
-            return {'channel_info': {}, 'recent_activity': []} 
\ No newline at end of file
+            return {'channel_info': {}, 'recent_activity': []}
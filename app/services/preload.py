@@ -0,0 +1,83 @@
+"""
+Preloading for prefork WSGI servers (see wsgi.py).
+
+preload() runs once in the master process. It builds the shared analyzer,
+loads the sentiment model and the TextBlob and YAKE lexicons, and warms
+them up, so forked workers share those pages copy-on-write instead of
+each loading a copy. Right before every fork the objects alive so far are
+moved to the permanent GC generation (gc.freeze), so collections in the
+workers do not write to them and unshare their pages.
+
+The master creates nothing that is unsafe to inherit: no threads, no
+event loop, no open connections, and the model warms up on a single
+intra-op thread since an OpenMP pool started before fork() is unusable in
+the children. _init_worker sets those up in each worker. It is registered
+with os.register_at_fork, so it runs under any server that forks with
+os.fork() or calls PyOS_AfterFork (gunicorn, uWSGI without lazy-apps).
+
+The watchlist refresher runs in one worker only: the first to take an
+exclusive lock on WATCHLIST_LOCK_FILE. The lock is released when that
+worker exits, and the worker the server forks to replace it takes it over.
+It only refreshes the tokens watched in that worker (configured, learned
+from its requests or added by its subscriptions); an empty
+WATCHLIST_LOCK_FILE runs a refresher in every worker instead.
+"""
+import fcntl
+import gc
+import os
+import torch
+from textblob import TextBlob
+from tqdm import tqdm
+from config.settings import settings
+from services.event_loop import get_background_loop
+from services.nlp_pool import PooledNLPProcessor
+from services.social_pulse_analyzer import get_analyzer
+from services.watchlist import watchlist_refresher
+
+_preloaded = False
+_worker_threads = 0
+_watchlist_lock = None
+
+def preload():
+    global _preloaded, _worker_threads
+    if _preloaded:
+        return
+    # The progress bars of model loading would leave tqdm's monitor thread running in the master
+    tqdm.monitor_interval = 0
+    processor = get_analyzer().nlp_processor
+    if isinstance(processor, PooledNLPProcessor):
+        # The model lives in the NLP pool each worker starts, only the local lexicons are shared
+        TextBlob("warm up").sentiment
+        processor.lexicon_scorer
+    else:
+        _worker_threads = processor.model_threads or settings.SENTIMENT_THREADS or torch.get_num_threads()
+        threads, processor.model_threads = processor.model_threads, 1
+        processor.warm_up()
+        processor.model_threads = threads
+        processor.extract_topics_from_texts(["warm up the keyword extractor"])
+
+    os.register_at_fork(before=gc.freeze, after_in_child=_init_worker)
+    _preloaded = True
+
+def _init_worker():
+    if _worker_threads:
+        torch.set_num_threads(_worker_threads)
+    get_background_loop().reset_after_fork()
+    get_analyzer().reset_after_fork()
+    if settings.WATCHLIST_ENABLED and _claim_watchlist():
+        watchlist_refresher.start()
+
+def _claim_watchlist() -> bool:
+    """True in the one worker that holds WATCHLIST_LOCK_FILE (every worker when it is empty)."""
+    global _watchlist_lock
+    if not settings.WATCHLIST_LOCK_FILE:
+        return True
+    # Opened after the fork, so each worker locks its own file description
+    lock = open(settings.WATCHLIST_LOCK_FILE, 'a')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return False
+    _watchlist_lock = lock
+    return True
@@ -0,0 +1,174 @@
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config.settings import settings
+from services.stage_executor import inline_stages
+
+PROFILE_MODES = ('sample', 'cprofile')
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(APP_ROOT):
+        filename = os.path.relpath(filename, APP_ROOT)
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+def _is_app_code(code) -> bool:
+    return code.co_filename.startswith(APP_ROOT) and 'site-packages' not in code.co_filename
+
+class StackSampler:
+    """
+    Samples the Python stacks of every thread each `interval` seconds from a
+    background thread while running. Stacks without any frame of this app
+    (idle pool workers, the event loop waiting on sockets) are left out, so
+    the samples cover collection, stage threads and waits on the NLP pool;
+    requests running at the same time show up as well.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.app_functions = set()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> 'StackSampler':
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                app_codes = [code for code in codes if _is_app_code(code)]
+                if app_codes:
+                    self.app_functions.update(_frame_label(code) for code in app_codes)
+                    labels = [names.get(ident, str(ident))] + [_frame_label(code) for code in reversed(codes)]
+                    self.stacks[tuple(labels)] += 1
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed format (root;...;leaf count), the input of flamegraph.pl and speedscope."""
+        return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def ranked(self, limit: int) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        This app's functions by the time they were on the stack (total), and
+        the functions of any module that were running the most (self).
+        """
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for label in set(stack[1:]):
+                if label in self.app_functions:
+                    total[label] += count
+
+        def row(label: str, samples: int) -> Dict[str, Any]:
+            return {'function': label, 'ms': round(samples * self.interval * 1000, 1), 'samples': samples}
+
+        return {
+            'total': [row(label, count) for label, count in total.most_common(limit)],
+            'self': [row(label, count) for label, count in own.most_common(limit)],
+        }
+
+def _ranked_calls(profiler: cProfile.Profile, limit: int) -> Tuple[List[Dict[str, Any]], str]:
+    stats = pstats.Stats(profiler)
+    stats.sort_stats('cumulative')
+    report = io.StringIO()
+    stats.stream = report
+    stats.print_stats(limit)
+    ranked = []
+    for function in stats.fcn_list[:limit]:
+        _, calls, own_time, cumulative_time, _ = stats.stats[function]
+        filename, line, name = function
+        ranked.append({
+            'function': f"{name} ({os.path.basename(filename)}:{line})",
+            'calls': calls,
+            'self_ms': round(own_time * 1000, 2),
+            'cumulative_ms': round(cumulative_time * 1000, 2),
+        })
+    return ranked, report.getvalue()
+
+def profile_call(func: Callable[[], Any], mode: str, label: str) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Runs `func` under the profiler and returns (its result, profile report).
+
+    'sample' samples all threads, so the analysis keeps its normal
+    concurrency. 'cprofile' traces every call deterministically; the stages
+    then run inline on the request thread so the trace covers them. The
+    collapsed stacks, the ranked report and (for cprofile) the pstats dump
+    are written to PROFILE_DIR when it is set.
+    """
+    profiler = cProfile.Profile() if mode == 'cprofile' else None
+    started = time.perf_counter()
+    with StackSampler(settings.PROFILE_SAMPLE_INTERVAL_MS / 1000) as sampler:
+        with inline_stages() if profiler is not None else nullcontext():
+            if profiler is not None:
+                profiler.enable()
+            try:
+                result = func()
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+    elapsed = time.perf_counter() - started
+
+    report = {
+        'mode': mode,
+        'elapsed_ms': round(elapsed * 1000, 1),
+        'samples': sampler.samples,
+    }
+    text = ''
+    if profiler is not None:
+        report['ranked'], text = _ranked_calls(profiler, settings.PROFILE_TOP_FUNCTIONS)
+    else:
+        report['ranked'] = sampler.ranked(settings.PROFILE_TOP_FUNCTIONS)
+
+    if settings.PROFILE_DIR:
+        report['files'] = _store(label, sampler, profiler, text or _format_ranked(report['ranked']))
+    else:
+        report['collapsed_stacks'] = sampler.collapsed()
+    return result, report
+
+def _format_ranked(ranked: Dict[str, List[Dict[str, Any]]]) -> str:
+    return ''.join(
+        f"{kind} ms\n" + ''.join(f"{row['ms']:>10}  {row['function']}\n" for row in rows) + '\n'
+        for kind, rows in ranked.items()
+    )
+
+def _store(label: str, sampler: StackSampler, profiler: Optional[cProfile.Profile], text: str) -> Dict[str, str]:
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    name = re.sub(r'[^\w.-]+', '_', label)[:80]
+    base = os.path.join(settings.PROFILE_DIR, f"{int(time.time() * 1000)}-{name}")
+    files = {'collapsed': f"{base}.collapsed", 'report': f"{base}.txt"}
+    with open(files['collapsed'], 'w', encoding='utf-8') as f:
+        f.write(sampler.collapsed())
+    with open(files['report'], 'w', encoding='utf-8') as f:
+        f.write(text)
+    if profiler is not None:
+        files['pstats'] = f"{base}.prof"
+        profiler.dump_stats(files['pstats'])
+    return files
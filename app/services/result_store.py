@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set
+from config.settings import settings
+
+@dataclass
+class StoredResult:
+    key: str
+    response: Dict[str, Any]
+    computed_at: float
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.computed_at
+
+def token_key(request_data: Dict[str, Any]) -> str:
+    """
+    Builds a stable key for an analysis request so that the same token
+    requested by contract address or by the same set of handles maps to
+    the same stored result.
+    """
+    if request_data.get('contract_address'):
+        return request_data['contract_address']
+    handles = request_data.get('social_handles') or {}
+    return ','.join(f"{platform}:{handles[platform].lower()}" for platform in sorted(handles))
+
+class ResultStore:
+    """
+    Thread-safe in-memory store of the latest formatted analysis per token.
+    Listeners are called with (key, new, previous) after every put.
+
+    Results older than `ttl` seconds are dropped on the next put, and past
+    `max_size` results the least recently stored go first. Pinned keys (the
+    watchlist's) are exempt, so each refresh of a watched token is still
+    compared with the one before it however long its interval.
+    """
+
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None):
+        self.max_size = settings.RESULT_STORE_MAX_SIZE if max_size is None else max_size
+        self.ttl = settings.RESULT_TTL if ttl is None else ttl
+        # Least recently stored first
+        self._results: 'OrderedDict[str, StoredResult]' = OrderedDict()
+        self._pinned: Set[str] = set()
+        self._listeners: List[Callable[[str, StoredResult, Optional[StoredResult]], None]] = []
+        self._lock = threading.Lock()
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[StoredResult]:
+        with self._lock:
+            stored = self._results.get(key)
+        if stored is None or (max_age is not None and stored.age > max_age):
+            return None
+        return stored
+
+    def put(self, key: str, response: Dict[str, Any]) -> StoredResult:
+        stored = StoredResult(key=key, response=response, computed_at=time.time())
+        with self._lock:
+            previous = self._results.pop(key, None)
+            self._results[key] = stored
+            self._evict(stored.computed_at)
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            try:
+                listener(key, stored, previous)
+            except Exception as e:
+                print(f"Error in result store listener: {e}")
+        return stored
+
+    def _evict(self, now: float):
+        # Called with the lock held
+        unpinned = len(self._results) - sum(1 for key in self._pinned if key in self._results)
+        for key, stored in list(self._results.items()):
+            if unpinned <= self.max_size and stored.computed_at >= now - self.ttl:
+                break
+            if key not in self._pinned:
+                del self._results[key]
+                unpinned -= 1
+
+    def pin(self, key: str):
+        with self._lock:
+            self._pinned.add(key)
+
+    def unpin(self, key: str):
+        with self._lock:
+            self._pinned.discard(key)
+
+    def add_listener(self, listener: Callable[[str, StoredResult, Optional[StoredResult]], None]):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._results)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._results)
+
+result_store = ResultStore()
@@ -0,0 +1,51 @@
+import io
+from typing import Optional
+import torch
+from torch.ao.quantization import quantize_dynamic
+from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+from config.settings import settings
+
+MODEL_BACKENDS = ('fp32', 'int8')
+
+# The model pipeline("sentiment-analysis") picks when none is given
+DEFAULT_SENTIMENT_MODEL = 'distilbert/distilbert-base-uncased-finetuned-sst-2-english'
+
+def load_sentiment_pipeline(backend: Optional[str] = None, model_dir: Optional[str] = None,
+                            threads: Optional[int] = None):
+    """
+    Builds the sentiment-analysis pipeline used by NLPProcessor.
+
+    Args:
+        backend (str): 'fp32' for the model as published, 'int8' to replace its
+            Linear layers with dynamically quantized ones (SENTIMENT_MODEL_BACKEND).
+        model_dir (str): Local model directory (SENTIMENT_MODEL_DIR). When set,
+            nothing is downloaded; otherwise SENTIMENT_MODEL is fetched from the hub.
+        threads (int): Intra-op threads for this process, 0 keeps torch's default
+            (SENTIMENT_THREADS).
+    """
+    backend = backend or settings.SENTIMENT_MODEL_BACKEND
+    model_dir = model_dir if model_dir is not None else settings.SENTIMENT_MODEL_DIR
+    threads = settings.SENTIMENT_THREADS if threads is None else threads
+    if backend not in MODEL_BACKENDS:
+        raise ValueError(f"Unknown sentiment model backend: {backend}")
+
+    if threads > 0:
+        torch.set_num_threads(threads)
+
+    source = model_dir or settings.SENTIMENT_MODEL or DEFAULT_SENTIMENT_MODEL
+    local_only = bool(model_dir)
+    tokenizer = AutoTokenizer.from_pretrained(source, local_files_only=local_only)
+    model = AutoModelForSequenceClassification.from_pretrained(source, local_files_only=local_only)
+    model.eval()
+
+    if backend == 'int8':
+        # Weights are stored as int8, activations are quantized on the fly per batch
+        model = quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    return pipeline('sentiment-analysis', model=model, tokenizer=tokenizer, device=-1)
+
+def model_size_bytes(model) -> int:
+    """Size of the serialized state dict, a proxy for the weights' resident memory."""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
@@ -0,0 +1,351 @@
+import fcntl
+import os
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from config.settings import settings
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64(0xFFFFFFFF)
+SHINGLE_SIZE = 3
+# 2: the token key table is a unicode array, so the file loads without pickle
+INDEX_FORMAT_VERSION = 2
+# Pending bucket keys merged into the main sorted arrays at once
+MERGE_PENDING_KEYS = 1 << 16
+PAIR_SPAN = 1 << 40
+
+def shingle_hashes(tokens: List[str]) -> np.ndarray:
+    """Stable 32-bit hashes of the word 3-grams of a token list (crc32, so they survive restarts)."""
+    words = [token for token in tokens if token != '!']
+    shingles = {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    return np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+
+class MinHasher:
+    """MinHash signatures of many texts at once, one universal hash (a * x + b mod p) per permutation."""
+
+    def __init__(self, num_perm: int, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+    def signatures(self, hash_sets: List[np.ndarray]) -> np.ndarray:
+        """(len(hash_sets), num_perm) uint32 signatures; every set must be non-empty."""
+        if not hash_sets:
+            return np.zeros((0, len(self.a)), dtype=np.uint32)
+        lengths = np.fromiter(map(len, hash_sets), dtype=np.int64, count=len(hash_sets))
+        values = np.concatenate(hash_sets)
+        permuted = ((values[None, :] * self.a[:, None] + self.b[:, None]) % MERSENNE_PRIME) & MAX_HASH
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        return np.minimum.reduceat(permuted, starts, axis=1).T.astype(np.uint32)
+
+@dataclass
+class ShillReport:
+    texts_checked: int
+    # Texts whose near-duplicates were posted for at least SHILL_MIN_OTHER_TOKENS other tokens
+    cross_token_texts: int
+    other_tokens: int
+
+class ShillIndex:
+    """
+    Near-duplicate index of collected texts across every analyzed token.
+
+    Each text with at least SHILL_MIN_TEXT_TOKENS tokens gets a MinHash
+    signature of its word 3-grams. Signatures are split into SHILL_BANDS
+    bands and each band folds into one 64-bit bucket key (LSH), so the
+    candidates for a text are found by binary search over the sorted keys of
+    all indexed texts instead of a scan; candidates count as matches when
+    their estimated Jaccard similarity reaches SHILL_SIMILARITY.
+
+    Entries are stored as columns (signature, token, time) in id order, so
+    age eviction (SHILL_MAX_AGE, then the oldest beyond SHILL_MAX_ENTRIES)
+    only moves the first live id; stale bucket keys are dropped at the next
+    merge. New keys go to a small sorted pending buffer that is merged into
+    the main arrays once it holds MERGE_PENDING_KEYS keys. With
+    SHILL_INDEX_FILE set the index is loaded on first use and saved in the
+    background every SHILL_SAVE_INTERVAL seconds. Saves merge with the
+    file, so processes sharing it (bulk analysis workers, prefork servers)
+    keep each other's entries.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = settings.SHILL_INDEX_FILE if path is None else path
+        self.bands = settings.SHILL_BANDS
+        self.rows = settings.SHILL_NUM_PERM // settings.SHILL_BANDS
+        self.hasher = MinHasher(self.bands * self.rows)
+        # Odd multipliers folding the rows of a band into its bucket key, different for every band
+        self._band_multipliers = np.random.default_rng(2).integers(
+            1, 2 ** 63, size=(self.bands, self.rows), dtype=np.uint64
+        ) | np.uint64(1)
+        # Row i of the columns holds entry id base + i; ids start..end-1 are live
+        self._signatures = np.zeros((0, self.bands * self.rows), dtype=np.uint32)
+        self._token_of = np.zeros(0, dtype=np.int64)
+        self._observed = np.zeros(0, dtype=np.float64)
+        self._base = self._start = self._end = 0
+        # Bucket keys sorted, with the entry id of each
+        self._keys = np.zeros(0, dtype=np.uint64)
+        self._key_ids = np.zeros(0, dtype=np.int64)
+        self._pending_keys = np.zeros(0, dtype=np.uint64)
+        self._pending_ids = np.zeros(0, dtype=np.int64)
+        # hash((token id, signature)) -> entry id, so re-collected texts are indexed once per token
+        self._known: Dict[int, int] = {}
+        self._tokens: List[str] = []
+        self._token_ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._last_saved = time.time()
+        self._saving = False
+
+    def observe(self, key: str, token_lists: List[List[str]]) -> ShillReport:
+        """
+        Looks up every text of token `key` against the texts of all other
+        tokens, then adds the ones not indexed yet for this token.
+        """
+        hash_sets = [shingle_hashes(tokens) for tokens in token_lists
+                     if len(tokens) >= settings.SHILL_MIN_TEXT_TOKENS]
+        hash_sets = [hashes for hashes in hash_sets if len(hashes)]
+        signatures = self.hasher.signatures(hash_sets)
+        band_keys = self._band_keys(signatures)
+        now = time.time()
+
+        with self._lock:
+            self._ensure_loaded()
+            self._evict(now)
+            token_id = self._token_id(key)
+            rows, tokens = self._matching_pairs(signatures, band_keys)
+            others = tokens != token_id
+            rows, tokens = rows[others], tokens[others]
+            flagged = np.bincount(rows, minlength=len(signatures)) >= settings.SHILL_MIN_OTHER_TOKENS
+            cross_token_texts = int(flagged.sum())
+            other_tokens = len(np.unique(tokens[flagged[rows]]))
+            self._append(token_id, now, signatures, band_keys)
+            save_due = bool(self.path) and not self._saving and now - self._last_saved > settings.SHILL_SAVE_INTERVAL
+            if save_due:
+                self._saving = True
+
+        if save_due:
+            threading.Thread(target=self.save, name='shill-index-save', daemon=True).start()
+        return ShillReport(len(signatures), cross_token_texts, other_tokens)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._end - self._start
+
+    def _band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """(len(signatures), bands) bucket keys; keys only pick candidates, matches are verified."""
+        bands = signatures.reshape(len(signatures), self.bands, self.rows).astype(np.uint64)
+        return (bands * self._band_multipliers).sum(axis=2)
+
+    def _matching_pairs(self, signatures: np.ndarray, band_keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Unique (signature row, token id) pairs where that token has a near-duplicate of the row."""
+        rows, ids = [], []
+        # Searching in key order keeps the binary searches cache friendly
+        order = np.argsort(band_keys.ravel())
+        flat = band_keys.ravel()[order]
+        for keys, key_ids in ((self._keys, self._key_ids), (self._pending_keys, self._pending_ids)):
+            lefts = np.searchsorted(keys, flat, 'left')
+            counts = np.searchsorted(keys, flat, 'right') - lefts
+            total = int(counts.sum())
+            if not total:
+                continue
+            # Every position of every matched key range, and the signature row it was looked up for
+            run_starts = np.repeat(np.cumsum(counts) - counts, counts)
+            positions = np.repeat(lefts, counts) + np.arange(total) - run_starts
+            rows.append(np.repeat(order // self.bands, counts))
+            ids.append(key_ids[positions])
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        rows, ids = np.concatenate(rows), np.concatenate(ids)
+        live = ids >= self._start
+        # Pairs packed as row * PAIR_SPAN + column so one 1-d unique dedups them
+        pairs = np.unique(rows[live] * PAIR_SPAN + ids[live] - self._base)
+        rows, entries = pairs // PAIR_SPAN, pairs % PAIR_SPAN
+        similarity = (self._signatures[entries] == signatures[rows]).mean(axis=1)
+        similar = similarity >= settings.SHILL_SIMILARITY
+        matches = np.unique(rows[similar] * PAIR_SPAN + self._token_of[entries[similar]])
+        return matches // PAIR_SPAN, matches % PAIR_SPAN
+
+    def _append(self, token_id: int, observed_at: float, signatures: np.ndarray, band_keys: np.ndarray):
+        new = []
+        for row, signature in enumerate(signatures):
+            known_key = hash((token_id, signature.tobytes()))
+            if self._known.get(known_key, -1) >= self._start:
+                continue
+            self._known[known_key] = self._end + len(new)
+            new.append(row)
+        if not new:
+            return
+
+        count = len(new)
+        used = self._end - self._base
+        if used + count > len(self._signatures):
+            self._compact()
+            used = self._end - self._base
+            capacity = max(2 * len(self._signatures), used + count, 1024)
+            self._signatures = np.resize(self._signatures, (capacity, self._signatures.shape[1]))
+            self._token_of = np.resize(self._token_of, capacity)
+            self._observed = np.resize(self._observed, capacity)
+        self._signatures[used:used + count] = signatures[new]
+        self._token_of[used:used + count] = token_id
+        self._observed[used:used + count] = observed_at
+
+        ids = np.arange(self._end, self._end + count, dtype=np.int64)
+        self._end += count
+        self._start = max(self._start, self._end - settings.SHILL_MAX_ENTRIES)
+        self._add_keys(band_keys[new].ravel(), np.repeat(ids, self.bands))
+
+    def _add_keys(self, keys: np.ndarray, ids: np.ndarray):
+        keys = np.concatenate((self._pending_keys, keys))
+        ids = np.concatenate((self._pending_ids, ids))
+        order = np.argsort(keys, kind='stable')
+        self._pending_keys, self._pending_ids = keys[order], ids[order]
+        if len(self._pending_keys) < MERGE_PENDING_KEYS:
+            return
+
+        live = self._key_ids >= self._start
+        main_keys, main_ids = self._keys[live], self._key_ids[live]
+        positions = np.searchsorted(main_keys, self._pending_keys)
+        self._keys = np.insert(main_keys, positions, self._pending_keys)
+        self._key_ids = np.insert(main_ids, positions, self._pending_ids)
+        self._pending_keys = np.zeros(0, dtype=np.uint64)
+        self._pending_ids = np.zeros(0, dtype=np.int64)
+        if len(self._known) > 2 * (self._end - self._start):
+            self._known = {known_key: entry_id for known_key, entry_id in self._known.items() if entry_id >= self._start}
+
+    def _evict(self, now: float):
+        live = self._observed[self._start - self._base:self._end - self._base]
+        # Entries are appended in time order, so expired ones are a prefix
+        self._start += int(np.searchsorted(live, now - settings.SHILL_MAX_AGE, 'left'))
+
+    def _compact(self):
+        offset = self._start - self._base
+        self._signatures = self._signatures[offset:].copy()
+        self._token_of = self._token_of[offset:].copy()
+        self._observed = self._observed[offset:].copy()
+        self._base = self._start
+
+    def _token_id(self, key: str) -> int:
+        token_id = self._token_ids.get(key)
+        if token_id is None:
+            token_id = self._token_ids[key] = len(self._tokens)
+            self._tokens.append(key)
+        return token_id
+
+    def save(self):
+        """
+        Writes the live entries to `path` atomically, as arrays plus the token
+        key table, merged with the entries other processes saved there.
+        """
+        try:
+            with self._lock:
+                live = slice(self._start - self._base, self._end - self._base)
+                signatures = self._signatures[live].copy()
+                token_of = self._token_of[live].copy()
+                observed = self._observed[live].copy()
+                tokens = list(self._tokens)
+            # Held from reading the file to replacing it, so concurrent savers do not drop each other's entries
+            with open(f"{self.path}.lock", 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    on_disk = self._read_file()
+                except Exception as e:
+                    print(f"Error reading shill index, overwriting it: {e}")
+                    on_disk = None
+                if on_disk is not None:
+                    signatures, token_of, observed = self._merge(on_disk, signatures, token_of, observed, tokens)
+
+                # Per process, so processes sharing the path do not write the same temporary file
+                temporary = f"{self.path}.{os.getpid()}.tmp"
+                with open(temporary, 'wb') as f:
+                    np.savez(
+                        f,
+                        version=np.array(INDEX_FORMAT_VERSION),
+                        bands=np.array(self.bands),
+                        token_of=token_of,
+                        observed=observed,
+                        signatures=signatures,
+                        tokens=np.array(tokens, dtype=str)
+                    )
+                os.replace(temporary, self.path)
+        except Exception as e:
+            print(f"Error saving shill index: {e}")
+        finally:
+            with self._lock:
+                self._last_saved = time.time()
+                self._saving = False
+
+    def _merge(self, saved: Dict[str, Any], signatures: np.ndarray, token_of: np.ndarray,
+               observed: np.ndarray, tokens: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Our entries plus the saved ones, with the saved token ids renumbered
+        into `tokens` (extended in place). Each token keeps one entry per
+        signature, the latest; the result is in time order and within
+        SHILL_MAX_AGE and SHILL_MAX_ENTRIES.
+        """
+        ids = {key: token_id for token_id, key in enumerate(tokens)}
+        remap = np.empty(len(saved['tokens']), dtype=np.int64)
+        for saved_id, key in enumerate(saved['tokens']):
+            if key not in ids:
+                ids[key] = len(tokens)
+                tokens.append(key)
+            remap[saved_id] = ids[key]
+        signatures = np.concatenate([saved['signatures'], signatures])
+        token_of = np.concatenate([remap[saved['token_of']], token_of])
+        observed = np.concatenate([saved['observed'], observed])
+
+        newest = {}
+        for row in np.argsort(observed, kind='stable').tolist():
+            newest[(int(token_of[row]), signatures[row].tobytes())] = row
+        rows = np.fromiter(newest.values(), dtype=np.int64, count=len(newest))
+        rows = rows[np.argsort(observed[rows], kind='stable')]
+        rows = rows[observed[rows] >= time.time() - settings.SHILL_MAX_AGE][-settings.SHILL_MAX_ENTRIES:]
+        return signatures[rows], token_of[rows], observed[rows]
+
+    def _read_file(self) -> Optional[Dict[str, Any]]:
+        """The entries saved at `path`, None when there is no usable file."""
+        if not os.path.exists(self.path):
+            return None
+        with np.load(self.path) as saved:
+            if int(saved['version']) != INDEX_FORMAT_VERSION or int(saved['bands']) != self.bands \
+                    or saved['signatures'].shape[1:] != self._signatures.shape[1:]:
+                print("Shill index file was written with other settings, ignoring it")
+                return None
+            return {
+                'tokens': [str(token) for token in saved['tokens']],
+                'token_of': saved['token_of'],
+                'observed': saved['observed'],
+                'signatures': saved['signatures'],
+            }
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path:
+            return
+        try:
+            saved = self._read_file()
+        except Exception as e:
+            print(f"Error loading shill index: {e}")
+            return
+        if saved is None:
+            return
+        tokens = saved['tokens']
+        token_of, observed, signatures = saved['token_of'], saved['observed'], saved['signatures']
+
+        for key in tokens:
+            self._token_id(key)
+        self._signatures, self._token_of, self._observed = signatures, token_of, observed
+        self._base = self._start = 0
+        self._end = len(signatures)
+        keys = self._band_keys(signatures).ravel()
+        order = np.argsort(keys, kind='stable')
+        self._keys = keys[order]
+        self._key_ids = np.repeat(np.arange(self._end, dtype=np.int64), self.bands)[order]
+        self._known = {hash((int(token_id), signature.tobytes())): entry_id
+                       for entry_id, (token_id, signature) in enumerate(zip(token_of, signatures))}
+
+shill_index = ShillIndex()
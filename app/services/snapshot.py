@@ -0,0 +1,291 @@
+import json
+import mmap
+import os
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from services.metrics_calculator import activity_timestamp
+
+MAGIC = b'ATSNAP\x00\x00'
+SNAPSHOT_VERSION = 1
+# Magic, then format version and header length as little-endian uint32
+PREAMBLE = struct.Struct('<8sII')
+ALIGNMENT = 8
+
+# Presence codes of a column's mask, rows without a mask are all PRESENT
+PRESENT, MISSING, NONE = 0, 1, 2
+
+class SnapshotError(ValueError):
+    pass
+
+class _Writer:
+    """Accumulates aligned column arrays and an interned string table."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.size = 0
+        self.strings: Dict[str, int] = {}
+
+    def array(self, values: np.ndarray) -> Dict[str, Any]:
+        data = np.ascontiguousarray(values).tobytes()
+        info = {'offset': self.size, 'length': len(values), 'dtype': values.dtype.str}
+        self.chunks.append(data)
+        self.size += len(data)
+        padding = -self.size % ALIGNMENT
+        if padding:
+            self.chunks.append(b'\x00' * padding)
+            self.size += padding
+        return info
+
+    def string(self, value: str) -> int:
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        return index
+
+    def string_table(self) -> Dict[str, Any]:
+        encoded = [value.encode('utf-8') for value in self.strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return {
+            'offsets': self.array(offsets),
+            'data': self.array(np.frombuffer(b''.join(encoded), dtype=np.uint8))
+        }
+
+def _column_kind(values: List[Any]) -> str:
+    present = [value for value in values if value is not None]
+    if all(isinstance(value, dict) for value in present):
+        return 'struct'
+    if present and all(isinstance(value, list) and all(isinstance(item, dict) for item in value) for value in present):
+        return 'table'
+    if all(isinstance(value, bool) for value in present):
+        return 'bool'
+    if all(isinstance(value, int) and not isinstance(value, bool) for value in present):
+        if all(-2 ** 63 <= value < 2 ** 63 for value in present):
+            return 'int'
+    elif all(isinstance(value, float) for value in present):
+        return 'float'
+    elif all(isinstance(value, str) for value in present):
+        return 'str'
+    return 'json'
+
+def _encode_table(rows: List[Dict[str, Any]], writer: _Writer) -> Dict[str, Any]:
+    """Columns of a list of dicts: one entry per key, in first-seen order."""
+    names: Dict[str, None] = {}
+    for row in rows:
+        names.update(dict.fromkeys(row))
+
+    fields = []
+    for name in names:
+        codes = np.array([
+            MISSING if name not in row else NONE if row[name] is None else PRESENT for row in rows
+        ], dtype=np.uint8)
+        values = [row.get(name) for row in rows]
+        kind = _column_kind(values)
+        field = {'name': name, 'kind': kind}
+        if codes.any():
+            field['mask'] = writer.array(codes)
+
+        if kind == 'struct':
+            field['table'] = _encode_table([value or {} for value in values], writer)
+        elif kind == 'table':
+            children = [child for value in values for child in value or []]
+            offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+            np.cumsum([len(value or []) for value in values], out=offsets[1:])
+            field['offsets'] = writer.array(offsets)
+            field['table'] = _encode_table(children, writer)
+        elif kind == 'bool':
+            field['values'] = writer.array(np.array([bool(value) for value in values], dtype=np.uint8))
+        elif kind == 'int':
+            field['values'] = writer.array(np.array([value or 0 for value in values], dtype=np.int64))
+        elif kind == 'float':
+            field['values'] = writer.array(np.array([value or 0.0 for value in values], dtype=np.float64))
+        elif kind == 'str':
+            field['values'] = writer.array(np.array([writer.string(value or '') for value in values], dtype=np.uint32))
+        else:
+            field['values'] = writer.array(np.array([
+                writer.string(json.dumps(value, default=str)) for value in values
+            ], dtype=np.uint32))
+        fields.append(field)
+    return {'count': len(rows), 'fields': fields}
+
+def encode_snapshot(platform_data: Dict[str, Any], meta: Optional[Dict[str, Any]] = None) -> bytes:
+    """
+    Serializes a platform collection (as returned by collect_platform_data)
+    to snapshot bytes; `meta` is a small JSON-able dict kept in the header.
+    """
+    writer = _Writer()
+    timestamps = {}
+    for platform, data in platform_data.items():
+        parsed = [activity_timestamp(activity) for activity in data.get('recent_activity', [])]
+        timestamps[platform] = writer.array(np.array([np.nan if ts is None else ts for ts in parsed], dtype=np.float64))
+    header = {
+        'version': SNAPSHOT_VERSION,
+        'meta': meta or {},
+        'root': _encode_table([platform_data], writer),
+        'timestamps': timestamps,
+    }
+    header['strings'] = writer.string_table()
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    header_bytes += b' ' * (-(PREAMBLE.size + len(header_bytes)) % ALIGNMENT)
+    return b''.join([PREAMBLE.pack(MAGIC, SNAPSHOT_VERSION, len(header_bytes)), header_bytes, *writer.chunks])
+
+def write_snapshot(platform_data: Dict[str, Any], path: str, meta: Optional[Dict[str, Any]] = None) -> int:
+    """Writes a snapshot file atomically and returns its size in bytes."""
+    data = encode_snapshot(platform_data, meta)
+    temporary = f"{path}.tmp"
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, path)
+    return len(data)
+
+class Snapshot:
+    """
+    Read access to a platform collection snapshot.
+
+    The file is one JSON header followed by aligned column arrays: each
+    dict key of the collection is a column (numbers as int64/float64,
+    strings as indices into a shared, deduplicated string table, nested
+    dicts and lists of dicts as child columns), plus a float64 timestamp
+    column per platform. Columns are returned as NumPy views into the
+    buffer, so reading metrics or timestamps from a memory-mapped file
+    copies nothing; to_platform_data() rebuilds the original dict tree.
+    """
+
+    def __init__(self, buffer, mapped: Optional[mmap.mmap] = None):
+        self.buffer = memoryview(buffer)
+        self._mapped = mapped
+        if len(self.buffer) < PREAMBLE.size:
+            raise SnapshotError("Not a snapshot: too short")
+        magic, version, header_length = PREAMBLE.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise SnapshotError("Not a snapshot: bad magic")
+        if version != SNAPSHOT_VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {version}")
+        self.data_start = PREAMBLE.size + header_length
+        self.header = json.loads(bytes(self.buffer[PREAMBLE.size:self.data_start]))
+        self._string_offsets = self._array(self.header['strings']['offsets'])
+        self._string_data = self._array(self.header['strings']['data'])
+        self._strings: Optional[List[str]] = None
+
+    @classmethod
+    def open(cls, path: str) -> 'Snapshot':
+        """Memory-maps a snapshot file read-only."""
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, mapped)
+
+    def close(self):
+        self._string_offsets = self._string_data = None
+        try:
+            self.buffer.release()
+            if self._mapped is not None:
+                self._mapped.close()
+        except BufferError:
+            # Column views handed out are still alive; the map is unmapped once they are collected
+            pass
+
+    def __enter__(self) -> 'Snapshot':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        return self.header['meta']
+
+    @property
+    def platforms(self) -> List[str]:
+        return list(self.header['timestamps'])
+
+    def timestamps(self, platform: str) -> np.ndarray:
+        """Epoch seconds of the platform's recent activities, NaN where unparseable (zero-copy)."""
+        return self._array(self.header['timestamps'][platform])
+
+    def column(self, *path: str) -> np.ndarray:
+        """
+        Values of a scalar column, e.g. column('twitter', 'recent_activity',
+        'public_metrics', 'favorite_count'), zero-copy. String and JSON
+        columns hold string table indices, see string().
+        """
+        field = self._field(path)
+        if 'values' not in field:
+            raise SnapshotError(f"{'/'.join(path)} is not a scalar column")
+        return self._array(field['values'])
+
+    def offsets(self, *path: str) -> np.ndarray:
+        """Row offsets of a list-of-dicts column: rows offsets[i]:offsets[i + 1] of its children belong to row i."""
+        field = self._field(path)
+        if field['kind'] != 'table':
+            raise SnapshotError(f"{'/'.join(path)} is not a table column")
+        return self._array(field['offsets'])
+
+    def string(self, index: int) -> str:
+        start, end = self._string_offsets[index:index + 2]
+        return bytes(self._string_data[start:end]).decode('utf-8')
+
+    def texts(self, platform: str, name: str = 'text') -> List[str]:
+        """One string column of a platform's recent activities, decoded ('content' for Discord)."""
+        return [self.string(index) for index in self.column(platform, 'recent_activity', name).tolist()]
+
+    def to_platform_data(self) -> Dict[str, Any]:
+        if self._strings is None:
+            data = bytes(self._string_data)
+            bounds = self._string_offsets.tolist()
+            self._strings = [data[start:end].decode('utf-8') for start, end in zip(bounds, bounds[1:])]
+        return self._decode_table(self.header['root'])[0]
+
+    def _array(self, info: Dict[str, Any]) -> np.ndarray:
+        return np.frombuffer(self.buffer, dtype=np.dtype(info['dtype']), count=info['length'],
+                             offset=self.data_start + info['offset'])
+
+    def _field(self, path: Tuple[str, ...]) -> Dict[str, Any]:
+        table = self.header['root']
+        field = None
+        for name in path:
+            if field is not None:
+                if 'table' not in field:
+                    raise SnapshotError(f"No column {'/'.join(path)}")
+                table = field['table']
+            field = next((candidate for candidate in table['fields'] if candidate['name'] == name), None)
+            if field is None:
+                raise SnapshotError(f"No column {'/'.join(path)}")
+        if field is None:
+            raise SnapshotError("Empty column path")
+        return field
+
+    def _decode_table(self, table: Dict[str, Any]) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = [{} for _ in range(table['count'])]
+        for field in table['fields']:
+            kind = field['kind']
+            if kind == 'struct':
+                values = self._decode_table(field['table'])
+            elif kind == 'table':
+                children = self._decode_table(field['table'])
+                bounds = self._array(field['offsets']).tolist()
+                values = [children[start:end] for start, end in zip(bounds, bounds[1:])]
+            else:
+                values = self._array(field['values']).tolist()
+                if kind == 'bool':
+                    values = [bool(value) for value in values]
+                elif kind == 'str':
+                    values = [self._strings[index] for index in values]
+                elif kind == 'json':
+                    values = [json.loads(self._strings[index]) for index in values]
+
+            codes = self._array(field['mask']).tolist() if 'mask' in field else None
+            name = field['name']
+            for position, (row, value) in enumerate(zip(rows, values)):
+                code = PRESENT if codes is None else codes[position]
+                if code == PRESENT:
+                    row[name] = value
+                elif code == NONE:
+                    row[name] = None
+        return rows
+
+def read_snapshot(path: str) -> Dict[str, Any]:
+    """Loads a snapshot file back into the platform_data dict tree."""
+    with Snapshot.open(path) as snapshot:
+        return snapshot.to_platform_data()
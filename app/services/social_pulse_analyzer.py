@@ -1,27 +1,116 @@
-from dataclasses import dataclass
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Iterator, Iterable
+import asyncio
+import os
+import re
+import threading
+import time
 from services.platform_analyzers import TwitterAnalyzer, RedditAnalyzer, DiscordAnalyzer, TelegramAnalyzer
 from services.nlp_processor import NLPProcessor
-from services.metrics_calculator import MetricsCalculator
+from services.nlp_pool import create_nlp_processor
+from services.metrics_calculator import MetricsCalculator, activity_timestamp
+from services.event_loop import get_background_loop
+from services.stage_executor import Stage, StageExecutor, stage_executor
+from services.latency_budget import AnalysisBudget, seconds_left
+from services.result_store import token_key
+from services.trending import trending_engine
+from services.shill_index import shill_index
+from services.snapshot import Snapshot, write_snapshot
+from services.text_normalizer import NormalizedTexts, normalize_texts
+from config.settings import settings
 from utils.social_finder import SocialFinder
 import numpy as np
 from datetime import datetime, timedelta
-from textblob import TextBlob
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
-@dataclass
+# Cheapest stages first, so partial results are available as early as possible
+ANALYSIS_FIELDS = (
+    'engagement_metrics',
+    'community_stats',
+    'sentiment_score',
+    'trending_topics',
+    'risk_factors',
+    'detailed_analysis',
+)
+
 class AnalysisResult:
-    sentiment_score: float
-    engagement_metrics: Dict[str, float]
-    community_stats: Dict[str, Any]
-    trending_topics: List[str]
-    risk_factors: List[str]
-    detailed_analysis: Dict[str, Any]
+    """
+    Analysis fields computed on demand from a stage graph (see StageExecutor).
+    `initial` seeds the graph, typically with the collected platform data;
+    values passed as keywords are used as they are. Intermediate values such
+    as extracted texts are shared by every stage that needs them, and the
+    seconds spent in each stage are recorded in `stage_timings`.
+    """
+
+    def __init__(self, stages: Optional[Dict[str, Stage]] = None, initial: Optional[Dict[str, Any]] = None,
+                 executor: Optional[StageExecutor] = None, **values):
+        unknown = set(values) - set(ANALYSIS_FIELDS)
+        if unknown:
+            raise TypeError(f"Unknown analysis fields: {', '.join(sorted(unknown))}")
+        self._stages = stages or {}
+        self._values = dict(initial or {})
+        self._values.update(values)
+        self._executor = executor or stage_executor
+        self._lock = threading.RLock()
+        self.stage_timings: Dict[str, float] = {}
+
+    def get(self, name: str) -> Any:
+        if name not in self._values:
+            with self._lock:
+                if name not in self._values:
+                    if name in self._stages:
+                        self._executor.run(self._stages, [name], self._values, self.stage_timings)
+                    else:
+                        self._values[name] = None
+        return self._values[name]
+
+    def is_computed(self, name: str) -> bool:
+        return name in self._values
+
+    def iter_compute(self, fields: Iterable[str] = ANALYSIS_FIELDS) -> Iterator[str]:
+        """
+        Computes the given fields, running independent stages concurrently,
+        and yields each field name as soon as its value is available.
+        """
+        wanted = [name for name in ANALYSIS_FIELDS if name in set(fields)]
+        with self._lock:
+            for name in wanted:
+                if name in self._values:
+                    yield name
+
+            missing = [name for name in wanted if name not in self._values and name in self._stages]
+            for name, _ in self._executor.iter_run(self._stages, missing, self._values, self.stage_timings):
+                if name in wanted:
+                    yield name
+
+            for name in wanted:
+                if name not in self._values:
+                    self._values[name] = None
+                    yield name
+
+    def compute(self, fields: Iterable[str] = ANALYSIS_FIELDS) -> 'AnalysisResult':
+        for _ in self.iter_compute(fields):
+            pass
+        return self
+
+    def __repr__(self) -> str:
+        computed = ', '.join(f"{name}={self._values[name]!r}" for name in ANALYSIS_FIELDS if name in self._values)
+        return f"AnalysisResult({computed})"
+
+def _analysis_field(name: str) -> property:
+    def getter(self):
+        return self.get(name)
+
+    def setter(self, value):
+        self._values[name] = value
+
+    return property(getter, setter)
+
+for _name in ANALYSIS_FIELDS:
+    setattr(AnalysisResult, _name, _analysis_field(_name))
 
 class SocialPulseAnalyzer:
-    def __init__(self):
-        self.nlp_processor = NLPProcessor()
+    def __init__(self, nlp_processor: Optional[NLPProcessor] = None):
+        # Pass a processor to share already loaded models, e.g. in batch workers
+        self.nlp_processor = nlp_processor or create_nlp_processor()
         self.metrics_calculator = MetricsCalculator()
         self.social_finder = SocialFinder()
         
@@ -29,56 +118,200 @@ class SocialPulseAnalyzer:
         self.analyzers = {
             'twitter': TwitterAnalyzer(),
             'reddit': RedditAnalyzer(),
-            #'discord': DiscordAnalyzer(),
-            #'telegram': TelegramAnalyzer()
         }
 
-    def analyze_by_contract(self, contract_address: str) -> AnalysisResult:
-        # Find social media handles/channels associated with the contract
-        social_handles = self.social_finder.find_socials(contract_address)
-        print(social_handles)
-        return self.analyze_by_socials(social_handles)
+        # Async collectors keep their sessions open on the background loop,
+        # so they are only enabled when credentials are configured
+        if settings.DISCORD_BOT_TOKEN:
+            self.analyzers['discord'] = DiscordAnalyzer()
+        if settings.TELEGRAM_API_ID and settings.TELEGRAM_API_HASH and settings.TELEGRAM_BOT_TOKEN:
+            self.analyzers['telegram'] = TelegramAnalyzer()
 
-    def analyze_by_socials(self, social_handles: Dict[str, str]) -> AnalysisResult:
-        all_platform_data = {}
-        
+        self.stages = self._build_stages()
+
+    def reset_after_fork(self):
+        """Drops the collectors' connections inherited from a preloading parent process (see services/preload.py)."""
+        for analyzer in self.analyzers.values():
+            analyzer.reset_after_fork()
+
+    def _build_stages(self) -> Dict[str, Stage]:
+        stages = [
+            # Shared intermediates, computed once per analysis
+            Stage('texts', self._extract_texts, ('platform_data',)),
+            # One cleanup and tokenization pass whose tokens every NLP stage reuses
+            Stage('normalized', normalize_texts, ('texts',)),
+            Stage('timestamps', self.metrics_calculator.parse_timestamps, ('platform_data',)),
+            Stage('text_times', self._extract_text_times, ('platform_data',)),
+
+            Stage('engagement_metrics', self.metrics_calculator.calculate_engagement, ('platform_data', 'timestamps')),
+            Stage('community_stats', self.metrics_calculator.analyze_community, ('platform_data',)),
+            Stage('sentiment_score', self.score_sentiment, ('normalized', 'budget')),
+            # Only scheduled when trending_topics is wanted
+            Stage('trending_update', self.update_trending, ('normalized', 'text_times', 'token_key')),
+            Stage('trending_topics', self.extract_trending_topics, ('normalized', 'token_key', 'budget', 'trending_update')),
+            Stage('risk_factors', self.analyze_risk_factors,
+                  ('platform_data', 'normalized', 'timestamps', 'budget', 'token_key')),
+            Stage('detailed_analysis', self.generate_detailed_analysis, ('platform_data',)),
+        ]
+        return {stage.name: stage for stage in stages}
+
+    def analyze_request(self, request_data: Dict[str, Any], budget: Optional[AnalysisBudget] = None) -> AnalysisResult:
+        return self.analyze_by_socials(self.resolve_handles(request_data), budget, token_key(request_data))
+
+    def resolve_handles(self, request_data: Dict[str, Any]) -> Dict[str, str]:
+        if 'contract_address' in request_data:
+            # Find social media handles/channels associated with the contract
+            social_handles = self.social_finder.find_socials(request_data['contract_address'])
+            print(social_handles)
+            return social_handles
+        return request_data['social_handles']
+
+    def analyze_by_contract(self, contract_address: str, budget: Optional[AnalysisBudget] = None) -> AnalysisResult:
+        return self.analyze_request({'contract_address': contract_address}, budget)
+
+    def analyze_by_socials(self, social_handles: Dict[str, str], budget: Optional[AnalysisBudget] = None,
+                           key: Optional[str] = None) -> AnalysisResult:
+        """
+        Collects platform data right away and returns an AnalysisResult whose
+        stages only run when a field is read or computed, so callers that need
+        a subset of the response (see format_analysis_response fields) skip
+        the rest. `budget` (unlimited full quality by default) is handed to
+        the collectors and to every stage. `key` (token_key of the handles by
+        default) names the token in the trending engine and the shill index.
+        """
         print("analyze_by_socials")
         print(social_handles)
 
+        budget = budget or AnalysisBudget()
+        all_platform_data = budget.cap_activities(self.collect_platform_data(social_handles, budget))
+        key = key or token_key({'social_handles': social_handles})
+        if settings.SNAPSHOT_DIR:
+            self.save_snapshot(key, all_platform_data)
+
+        print("all_platform_data")
+        print(all_platform_data)
+
+        return self.analyze_platform_data(all_platform_data, key, budget)
+
+    def analyze_platform_data(self, platform_data: Dict[str, Any], key: str,
+                              budget: Optional[AnalysisBudget] = None) -> AnalysisResult:
+        """Lazy analysis of an already collected platform_data, e.g. one replayed from a snapshot."""
+        return AnalysisResult(stages=self.stages, initial={
+            'platform_data': platform_data,
+            'budget': budget or AnalysisBudget(),
+            'token_key': key
+        })
+
+    def analyze_snapshot(self, path: str, budget: Optional[AnalysisBudget] = None) -> AnalysisResult:
+        """Replays a collection written by save_snapshot under the token key it was collected for."""
+        with Snapshot.open(path) as snapshot:
+            platform_data = snapshot.to_platform_data()
+            key = snapshot.meta.get('token_key') or os.path.splitext(os.path.basename(path))[0]
+        return self.analyze_platform_data(platform_data, key, budget)
+
+    def save_snapshot(self, key: str, platform_data: Dict[str, Any]) -> Optional[str]:
+        """Writes the collection to SNAPSHOT_DIR as <key>-<epoch ms>.snap; failures are only logged."""
+        collected_at = time.time()
+        name = re.sub(r'[^\w.-]+', '_', key)[:100]
+        path = os.path.join(settings.SNAPSHOT_DIR, f"{name}-{int(collected_at * 1000)}.snap")
+        try:
+            os.makedirs(settings.SNAPSHOT_DIR, exist_ok=True)
+            write_snapshot(platform_data, path, {'token_key': key, 'collected_at': collected_at})
+            return path
+        except Exception as e:
+            print(f"Error writing snapshot {path}: {e}")
+            return None
+
+    def collect_platform_data(self, social_handles: Dict[str, str],
+                              budget: Optional[AnalysisBudget] = None) -> Dict[str, Any]:
+        all_platform_data = {}
+        pending = {}
+        background_loop = get_background_loop()
+        budget = budget or AnalysisBudget()
+        deadline = budget.collection_deadline
+
+        # Start the async collectors first so they run while the sync ones block
+        for platform, handle in social_handles.items():
+            analyzer = self.analyzers.get(platform)
+            if analyzer is not None and asyncio.iscoroutinefunction(analyzer.collect_data):
+                pending[platform] = background_loop.submit(analyzer.collect_data(handle, deadline))
+
         # Collect data from each platform
         for platform, handle in social_handles.items():
-            if platform in self.analyzers:
-                platform_data = self.analyzers[platform].collect_data(handle)
+            if platform in self.analyzers and platform not in pending:
+                if deadline is not None and seconds_left(deadline) == 0:
+                    budget.degrade(f"{platform}:collection_skipped_after_deadline")
+                    continue
+                try:
+                    platform_data = self.analyzers[platform].collect_data(handle, deadline)
+                except Exception:
+                    if deadline is None:
+                        raise
+                    # A collector cut short by the deadline costs that platform, not the request
+                    budget.degrade(f"{platform}:collection_failed_before_deadline")
+                    continue
                 all_platform_data[platform] = platform_data
 
-        print("all_platform_data")
-        print(all_platform_data)
-        
-        # Process collected data
-        print("NLP")
-        sentiment_score = self.nlp_processor.analyze_sentiment(all_platform_data)
-        print("Engagement")
-        engagement_metrics = self.metrics_calculator.calculate_engagement(all_platform_data)
-        print("Community")
-        community_stats = self.metrics_calculator.analyze_community(all_platform_data)
-        print("Trending")
-        trending_topics = self.nlp_processor.extract_trending_topics(all_platform_data)
-        print("Risk")
-        risk_factors = self.analyze_risk_factors(all_platform_data)
-        print("Detailed")
-        detailed_analysis = self.generate_detailed_analysis(all_platform_data)
-        print("detailed_analysis",detailed_analysis)
-
-        return AnalysisResult(
-            sentiment_score=sentiment_score,
-            engagement_metrics=engagement_metrics,
-            community_stats=community_stats,
-            trending_topics=trending_topics,
-            risk_factors=risk_factors,
-            detailed_analysis=detailed_analysis
+        for platform, future in pending.items():
+            try:
+                # Collectors return partial data at the collection deadline, the
+                # rest of the budget is the hard limit for getting it back
+                all_platform_data[platform] = future.result(seconds_left(budget.deadline, settings.COLLECTOR_TIMEOUT))
+            except Exception as e:
+                future.cancel()
+                if deadline is not None:
+                    budget.degrade(f"{platform}:collection_timed_out")
+                print(f"Error collecting {platform} data: {e}")
+
+        for platform, platform_data in all_platform_data.items():
+            if platform_data.pop('deadline_reached', False):
+                budget.degrade(f"{platform}:collection_cut_at_deadline")
+
+        return all_platform_data
+
+    def score_sentiment(self, normalized: NormalizedTexts, budget: AnalysisBudget) -> float:
+        mode = budget.sentiment_mode
+        if mode == 'lexicon':
+            budget.degrade("sentiment_score:lexicon_only")
+        elif mode == 'sampled':
+            budget.degrade(f"sentiment_score:transformer_sample_of_{settings.SAMPLED_TRANSFORMER_TEXTS}")
+        # The vectorized lexicon only for budgeted requests; otherwise polarity_scores picks by batch size
+        scorer = 'fast' if budget.requested else None
+        score = self.nlp_processor.analyze_texts_sentiment(
+            normalized.texts, scorer, mode, budget.deadline, normalized.tokens
         )
+        if mode != 'lexicon' and budget.expired:
+            budget.degrade("sentiment_score:deadline_reached")
+        return score
+
+    def update_trending(self, normalized: NormalizedTexts, text_times: List[Optional[float]], token_key: str) -> int:
+        """Feeds the collection's tokens to the trending engine, returning how many distinct texts were new."""
+        return trending_engine.observe(token_key, normalized, text_times)
 
-    def analyze_risk_factors(self, platform_data: Dict) -> List[str]:
+    def extract_trending_topics(self, normalized: NormalizedTexts, token_key: str, budget: AnalysisBudget,
+                                trending_update: int = 0) -> List[str]:
+        """
+        Top phrases from the token's time-decayed counts, read once this
+        collection has been added to them (trending_update). YAKE is only run when
+        TRENDING_SOURCE=yake (over all texts) or TRENDING_YAKE_RERANK is set (to
+        order the sketch's candidates), and never by the cheaper tiers.
+        """
+        use_yake = settings.TRENDING_SOURCE == 'yake' or settings.TRENDING_YAKE_RERANK
+        if use_yake and not budget.skips('keyword_extraction'):
+            if settings.TRENDING_SOURCE == 'yake':
+                return self.nlp_processor.extract_topics_from_texts(normalized.texts)
+            candidates = [phrase for phrase, _ in trending_engine.top(token_key, settings.TRENDING_RERANK_CANDIDATES)]
+            return self.nlp_processor.rerank_topics(normalized.texts, candidates)[:10]
+        return [phrase for phrase, _ in trending_engine.top(token_key, 10)]
+
+    def analyze_risk_factors(self, platform_data: Dict, normalized: Optional[NormalizedTexts] = None,
+                             timestamps: Optional[Dict[str, np.ndarray]] = None,
+                             budget: Optional[AnalysisBudget] = None,
+                             token_key: Optional[str] = None) -> List[str]:
+        if normalized is None:
+            normalized = normalize_texts(self._extract_texts(platform_data))
+        if timestamps is None:
+            timestamps = self.metrics_calculator.parse_timestamps(platform_data)
         risks = []
         
         # Analyze engagement patterns
@@ -93,7 +326,7 @@ class SocialPulseAnalyzer:
         
         # Analyze content patterns
         print("Analyze content patterns")
-        content_risks = self._analyze_content_risks(platform_data)
+        content_risks = self._analyze_content_risks(normalized, timestamps, budget or AnalysisBudget(), token_key)
         risks.extend(content_risks)
         
         return risks
@@ -134,6 +367,10 @@ class SocialPulseAnalyzer:
         for platform, data in platform_data.items():
             if platform == 'twitter':
                 total_followers += data.get('profile', {}).get('followers_count', 0)
+            elif platform == 'discord':
+                total_followers += data.get('server_info', {}).get('member_count', 0)
+            elif platform == 'telegram':
+                total_followers += data.get('channel_info', {}).get('participants_count', 0)
             elif platform == 'reddit':
                 community_info = data.get('community_info', {})
                 subscribers = community_info.get('subscribers', 0)
@@ -151,50 +388,42 @@ class SocialPulseAnalyzer:
 
         return risks
 
-    def _analyze_content_risks(self, platform_data: Dict) -> List[str]:
+    def _analyze_content_risks(self, normalized: NormalizedTexts, timestamps: Dict[str, np.ndarray],
+                               budget: AnalysisBudget, token_key: Optional[str] = None) -> List[str]:
         risks = []
         
-        # Combine all text content for analysis
-        all_texts = []
-        for platform, data in platform_data.items():
-            texts = self._extract_texts({platform: data})
-            all_texts.extend(texts)
-        
-        if all_texts:
+        if normalized.total:
             # Check content frequency
             week_ago = (datetime.utcnow() - timedelta(days=7)).timestamp()
-            recent_content = [
-                text for text in all_texts
-                if getattr(text, 'created_at', week_ago) > week_ago
-            ]
+            recent_content = sum(int((platform_timestamps > week_ago).sum()) for platform_timestamps in timestamps.values())
             
-            if len(recent_content) < 5:
+            if recent_content < 5:
                 risks.append("Low content creation frequency in the past week")
             
-            # Analyze sentiment volatility
-            sentiments = [TextBlob(text).sentiment.polarity for text in all_texts]
+            # Analyze sentiment volatility, over distinct texts like the sentiment score
+            sentiments = self.nlp_processor.polarity_scores(
+                normalized.texts, 'fast' if budget.requested else None, normalized.tokens
+            )
             sentiment_std = np.std(sentiments)
             if sentiment_std > 0.5:
                 risks.append("High sentiment volatility detected")
             
             # Check for spam patterns
-            if self._detect_spam_patterns(all_texts):
+            if not budget.skips('spam_detection') and self.nlp_processor.detect_spam_patterns(
+                normalized.texts, normalized.tokens, normalized.counts
+            ):
                 risks.append("Potential spam or artificial activity detected")
-        
-        return risks
 
-    def _detect_spam_patterns(self, texts: List[str]) -> bool:
-        # Implement spam detection logic
-        duplicate_threshold = 0.8
-        similar_content_count = 0
-        
-        for i, text1 in enumerate(texts):
-            for text2 in texts[i+1:]:
-                similarity = self._calculate_similarity(text1, text2)
-                if similarity > duplicate_threshold:
-                    similar_content_count += 1
+            # Check for copy posted across the communities of other tokens
+            if token_key is not None:
+                report = shill_index.observe(token_key, normalized.tokens)
+                if report.cross_token_texts >= settings.SHILL_RISK_MIN_TEXTS:
+                    risks.append(
+                        f"Coordinated promotion suspected: {report.cross_token_texts} posts match content "
+                        f"seen across {report.other_tokens} other tokens"
+                    )
         
-        return similar_content_count > len(texts) * 0.1  # More than 10% similar content
+        return risks
 
     def generate_detailed_analysis(self, platform_data: Dict[str, Any]) -> Dict[str, Any]:
         discussions = []
@@ -218,14 +447,14 @@ class SocialPulseAnalyzer:
 
             elif platform == 'reddit':
                 for post in data.get('recent_activity', []):
-                    sentiment_score = self.nlp_processor.analyze_sentiment(post['title'] + " " + post['selftext'],direct_text=True)  # Analyze sentiment of title and text
+                    sentiment_score = self.nlp_processor.analyze_sentiment(post['title'] + " " + post['text'],direct_text=True)  # Analyze sentiment of title and text
                     engagement_score = post['score']  # Reddit score as engagement
                     
                     discussions.append({
                         'title': post['title'],
                         'sentiment_score': sentiment_score,
                         'engagement_score': engagement_score,
-                        'content': post['selftext']
+                        'content': post['text']
                     })
                     sentiment_scores.append(sentiment_score)
                     total_engagement += engagement_score
@@ -260,13 +489,37 @@ class SocialPulseAnalyzer:
                 for post in data.get('recent_activity', []):
                     texts.append(post['title'])  # Add post title
                     texts.append(post['text'])    # Add post text
-            # Add other platforms as needed
-            # For example, if you have Discord or Telegram, extract their messages similarly
+                    texts.extend(comment['text'] for comment in post.get('comments', []))
+            elif platform == 'discord':
+                texts.extend(message['content'] for message in data.get('recent_activity', []))
+            elif platform == 'telegram':
+                texts.extend(message['text'] for message in data.get('recent_activity', []))
+
+        return texts
+
+    def _extract_text_times(self, platform_data: Dict[str, Any]) -> List[Optional[float]]:
+        """Epoch seconds of every text of _extract_texts, in the same order; comments without one take their post's."""
+        times = []
+
+        for platform, data in platform_data.items():
+            if platform == 'reddit':
+                for post in data.get('recent_activity', []):
+                    posted = activity_timestamp(post)
+                    times.extend([posted, posted])
+                    times.extend(activity_timestamp(comment) or posted for comment in post.get('comments', []))
+            elif platform in ('twitter', 'discord', 'telegram'):
+                times.extend(activity_timestamp(activity) for activity in data.get('recent_activity', []))
+
+        return times
 
-        return texts 
+# One analyzer per process so collector sessions and models are reused across requests
+_analyzer = None
+_analyzer_lock = threading.Lock()
 
-    def _calculate_similarity(self, text1: str, text2: str) -> float:
-        vectorizer = CountVectorizer().fit_transform([text1, text2])
-        vectors = vectorizer.toarray()
-        cosine_sim = cosine_similarity(vectors)
-        return cosine_sim[0][1] 
\ No newline at end of file
+def get_analyzer() -> SocialPulseAnalyzer:
+    global _analyzer
+    if _analyzer is None:
+        with _analyzer_lock:
+            if _analyzer is None:
+                _analyzer = SocialPulseAnalyzer()
+    return _analyzer
\ No newline at end of file
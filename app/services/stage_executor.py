@@ -0,0 +1,117 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Set, Tuple
+from config.settings import settings
+
+_inline = threading.local()
+
+@contextmanager
+def inline_stages():
+    """Runs the stages started by this thread on the thread itself, e.g. under a deterministic profiler."""
+    previous = getattr(_inline, 'active', False)
+    _inline.active = True
+    try:
+        yield
+    finally:
+        _inline.active = previous
+
+@dataclass
+class Stage:
+    name: str
+    func: Callable[..., Any]
+    # Names of the stages (or initial values) passed to func as keyword arguments
+    inputs: Tuple[str, ...] = ()
+
+class StageExecutor:
+    """
+    Runs a graph of analysis stages on a shared thread pool. A stage is
+    submitted as soon as all of its inputs are available, so independent
+    stages (NumPy metrics, YAKE, model inference) overlap, and intermediate
+    results such as extracted texts are computed once and handed to every
+    stage that declares them as an input.
+    """
+
+    def __init__(self, max_workers: int = settings.STAGE_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis-stage')
+
+    def iter_run(self, stages: Dict[str, Stage], targets: Iterable[str], values: Dict[str, Any],
+                 timings: Optional[Dict[str, float]] = None) -> Iterator[Tuple[str, Any]]:
+        """
+        Computes `targets` and everything they depend on that is not already in
+        `values`, yielding (name, value) for each stage as it finishes. Results
+        are written into `values` and wall-clock seconds per stage into `timings`.
+        """
+        needed = self._resolve(stages, targets, values)
+        if getattr(_inline, 'active', False):
+            yield from self._iter_run_inline(stages, needed, values, timings)
+            return
+        running = {}
+
+        while needed or running:
+            ready = [name for name in needed if all(inp in values for inp in stages[name].inputs)]
+            for name in ready:
+                needed.discard(name)
+                stage = stages[name]
+                running[self._pool.submit(self._timed, stage, {inp: values[inp] for inp in stage.inputs})] = name
+
+            if not running:
+                raise RuntimeError(f"Stages have unsatisfiable inputs: {', '.join(sorted(needed))}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    value, elapsed = future.result()
+                except Exception:
+                    for pending in running:
+                        pending.cancel()
+                    raise
+                values[name] = value
+                if timings is not None:
+                    timings[name] = elapsed
+                yield name, value
+
+    def _iter_run_inline(self, stages: Dict[str, Stage], needed: Set[str], values: Dict[str, Any],
+                         timings: Optional[Dict[str, float]]) -> Iterator[Tuple[str, Any]]:
+        while needed:
+            ready = [name for name in needed if all(inp in values for inp in stages[name].inputs)]
+            if not ready:
+                raise RuntimeError(f"Stages have unsatisfiable inputs: {', '.join(sorted(needed))}")
+            for name in ready:
+                needed.discard(name)
+                stage = stages[name]
+                value, elapsed = self._timed(stage, {inp: values[inp] for inp in stage.inputs})
+                values[name] = value
+                if timings is not None:
+                    timings[name] = elapsed
+                yield name, value
+
+    def run(self, stages: Dict[str, Stage], targets: Iterable[str], values: Dict[str, Any],
+            timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        for _ in self.iter_run(stages, targets, values, timings):
+            pass
+        return values
+
+    def _resolve(self, stages: Dict[str, Stage], targets: Iterable[str], values: Dict[str, Any]) -> Set[str]:
+        needed = set()
+        pending = [name for name in targets if name not in values]
+        while pending:
+            name = pending.pop()
+            if name in needed or name in values:
+                continue
+            if name not in stages:
+                raise KeyError(f"No stage produces {name}")
+            needed.add(name)
+            pending.extend(stages[name].inputs)
+        return needed
+
+    @staticmethod
+    def _timed(stage: Stage, kwargs: Dict[str, Any]) -> Tuple[Any, float]:
+        started = time.perf_counter()
+        value = stage.func(**kwargs)
+        return value, time.perf_counter() - started
+
+stage_executor = StageExecutor()
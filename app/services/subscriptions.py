@@ -0,0 +1,335 @@
+import heapq
+import itertools
+import json
+import math
+import random
+import secrets
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+import requests
+from config.settings import settings
+from services.leaderboard import METRIC_NAMES, RISK_LEVELS, metric_values, risk_level_code
+from services.result_store import ResultStore, StoredResult, result_store, token_key
+from services.watchlist import WatchlistRefresher, watchlist_refresher
+
+SENTIMENT = METRIC_NAMES.index('sentiment')
+
+@dataclass
+class PulseChange:
+    key: str
+    sentiment_delta: float
+    risk_level_changed: bool
+    # The event as JSON, encoded once for every subscriber
+    body: str
+
+def pulse_change(key: str, stored: StoredResult, previous: Optional[StoredResult]) -> Optional[PulseChange]:
+    """What changed between two analyses of a token, None for its first analysis."""
+    if previous is None:
+        return None
+    current_sentiment = metric_values(stored.response)[SENTIMENT]
+    previous_sentiment = metric_values(previous.response)[SENTIMENT]
+    delta = current_sentiment - previous_sentiment
+    current_level, previous_level = risk_level_code(stored.response), risk_level_code(previous.response)
+    body = json.dumps({
+        'token': key,
+        'computed_at': stored.computed_at,
+        'previous_computed_at': previous.computed_at,
+        'sentiment': {
+            'previous': None if math.isnan(previous_sentiment) else previous_sentiment,
+            'current': None if math.isnan(current_sentiment) else current_sentiment,
+            'delta': None if math.isnan(delta) else round(delta, 6),
+        },
+        'risk_level': {
+            'previous': RISK_LEVELS[previous_level] if previous_level >= 0 else None,
+            'current': RISK_LEVELS[current_level] if current_level >= 0 else None,
+            'changed': current_level != previous_level,
+        },
+    })
+    return PulseChange(key=key, sentiment_delta=delta, risk_level_changed=current_level != previous_level, body=body)
+
+@dataclass
+class Subscription:
+    id: str
+    keys: List[str]
+    risk_level_change: bool = True
+    sentiment_delta: Optional[float] = None
+    webhook_url: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    # Events matched so far; each event's sequence number, also its SSE id
+    sequence: int = 0
+    delivered: int = 0
+    failed: int = 0
+    closed: bool = False
+    # Latest (sequence, body) pairs for server-sent events
+    events: deque = field(default_factory=lambda: deque(maxlen=settings.SUBSCRIPTION_QUEUE_SIZE))
+    condition: Optional[threading.Condition] = None
+
+    def wants(self, change: PulseChange) -> bool:
+        # NaN deltas (sentiment missing on either side) compare False
+        return (self.risk_level_change and change.risk_level_changed) or (
+            self.sentiment_delta is not None and abs(change.sentiment_delta) >= self.sentiment_delta
+        )
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'tokens': self.keys,
+            'risk_level_change': self.risk_level_change,
+            'sentiment_delta': self.sentiment_delta,
+            'delivery': 'webhook' if self.webhook_url else 'sse',
+            'webhook_url': self.webhook_url,
+            'created_at': self.created_at,
+            'events': self.sequence,
+            'delivered': self.delivered,
+            'failed': self.failed,
+        }
+
+@dataclass
+class _Batch:
+    url: str
+    # (subscription, encoded event) pairs
+    items: List[Tuple[Subscription, str]] = field(default_factory=list)
+    due: float = 0.0
+    attempts: int = 0
+
+class WebhookDispatcher:
+    """
+    POSTs subscription events to their webhooks in batches per URL.
+
+    Events for one URL are held for up to SUBSCRIPTION_BATCH_WINDOW seconds,
+    or until SUBSCRIPTION_BATCH_SIZE are waiting, and sent together as
+    {"events": [...]}. A batch that fails with a connection error, a 5xx or
+    a 429 is retried up to SUBSCRIPTION_MAX_RETRIES times with jittered
+    exponential backoff; any other non-2xx response drops it. At most
+    SUBSCRIPTION_WEBHOOK_CONCURRENCY POSTs run at once. The scheduler thread
+    starts with the first event, so nothing runs before a prefork server
+    forks.
+    """
+
+    def __init__(self):
+        self._open: Dict[str, _Batch] = {}
+        self._schedule: List[tuple] = []
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.SUBSCRIPTION_WEBHOOK_CONCURRENCY,
+            thread_name_prefix='webhook-send'
+        )
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.retries = 0
+        self.failures = 0
+
+    def enqueue(self, subscription: Subscription, sequence: int, body: str):
+        item = f'{{"subscription": {json.dumps(subscription.id)}, "sequence": {sequence}, "event": {body}}}'
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='webhook-scheduler', daemon=True)
+                self._thread.start()
+            batch = self._open.get(subscription.webhook_url)
+            if batch is None:
+                batch = self._open[subscription.webhook_url] = _Batch(url=subscription.webhook_url)
+                self._push(batch, time.time() + settings.SUBSCRIPTION_BATCH_WINDOW)
+            batch.items.append((subscription, item))
+            if len(batch.items) >= settings.SUBSCRIPTION_BATCH_SIZE:
+                del self._open[batch.url]
+                self._push(batch, time.time())
+
+    def _push(self, batch: _Batch, due: float):
+        # Called with the condition held; an entry whose due time is no longer the batch's is stale
+        batch.due = due
+        heapq.heappush(self._schedule, (due, next(self._order), batch))
+        self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    timeout = self._schedule[0][0] - time.time() if self._schedule else None
+                    if timeout is not None and timeout <= 0:
+                        break
+                    self._condition.wait(timeout)
+                due, _, batch = heapq.heappop(self._schedule)
+                if batch.due != due:
+                    continue
+                if self._open.get(batch.url) is batch:
+                    del self._open[batch.url]
+            self._executor.submit(self._send, batch)
+
+    def _send(self, batch: _Batch):
+        body = '{"events": [' + ', '.join(item for _, item in batch.items) + ']}'
+        self.batches += 1
+        try:
+            response = requests.post(
+                batch.url, data=body.encode('utf-8'),
+                headers={'Content-Type': 'application/json'},
+                timeout=settings.SUBSCRIPTION_WEBHOOK_TIMEOUT
+            )
+            retry = response.status_code >= 500 or response.status_code == 429
+            delivered = 200 <= response.status_code < 300
+            error = f"HTTP {response.status_code}"
+        except requests.RequestException as e:
+            retry, delivered, error = True, False, str(e)
+
+        if delivered:
+            for subscription, _ in batch.items:
+                subscription.delivered += 1
+            return
+        if retry and batch.attempts < settings.SUBSCRIPTION_MAX_RETRIES:
+            batch.attempts += 1
+            self.retries += 1
+            backoff = settings.SUBSCRIPTION_RETRY_BACKOFF * 2 ** (batch.attempts - 1) * random.uniform(0.5, 1.5)
+            with self._condition:
+                self._push(batch, time.time() + backoff)
+            return
+        self.failures += 1
+        for subscription, _ in batch.items:
+            subscription.failed += 1
+        print(f"Dropping {len(batch.items)} webhook events for {batch.url}: {error}")
+
+    def status(self) -> Dict[str, Any]:
+        with self._condition:
+            waiting = sum(len(batch.items) for _, _, batch in self._schedule)
+        return {'batches_sent': self.batches, 'retries': self.retries, 'failed_batches': self.failures, 'waiting_events': waiting}
+
+class SubscriptionManager:
+    """
+    Pushes pulse changes to clients instead of having them poll.
+
+    A subscription names tokens (analysis requests) and what it wants to
+    hear about: the risk level bucket changing and/or sentiment moving by at
+    least `sentiment_delta` between consecutive analyses. Its tokens are
+    added to the watchlist, so the server keeps refreshing them; a
+    subscription whose new tokens do not fit in WATCHLIST_MAX_SIZE is
+    refused.
+
+    It listens to the result store: when a subscribed token's analysis
+    finishes, the change from its previous analysis is computed and encoded
+    once, then handed to every subscription it matches. Events go either to
+    the subscription's webhook (see WebhookDispatcher) or to its queue of
+    the latest SUBSCRIPTION_QUEUE_SIZE events, read as server-sent events.
+    Subscriptions live in memory, in the process that created them. Behind
+    a prefork server a client therefore has to reach the same worker to
+    read or delete its subscription, and only analyses finished in that
+    worker are pushed to it; run a single worker for subscriptions.
+    """
+
+    def __init__(self, store: ResultStore = result_store, watchlist: WatchlistRefresher = watchlist_refresher):
+        self.store = store
+        self.watchlist = watchlist
+        self.dispatcher = WebhookDispatcher()
+        self._subscriptions: Dict[str, Subscription] = {}
+        self._by_key: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def create(self, data: Dict[str, Any]) -> Subscription:
+        """
+        Registers a subscription from a validated request body (see
+        validate_subscription). Raises ValueError when the subscription or
+        watchlist limit is reached.
+        """
+        requests_by_key = {}
+        for request in data['tokens']:
+            request = {name: request[name] for name in ('contract_address', 'social_handles') if name in request}
+            requests_by_key[token_key(request)] = request
+        subscription = Subscription(
+            id=secrets.token_urlsafe(16),
+            keys=list(requests_by_key),
+            risk_level_change=data.get('risk_level_change', True),
+            sentiment_delta=data.get('sentiment_delta'),
+            webhook_url=data.get('webhook_url'),
+            condition=threading.Condition(self._lock)
+        )
+        with self._lock:
+            if len(self._subscriptions) >= settings.SUBSCRIPTION_MAX_SUBSCRIPTIONS:
+                raise ValueError("Too many subscriptions, delete one first")
+            self._subscriptions[subscription.id] = subscription
+            for key in subscription.keys:
+                self._by_key.setdefault(key, set()).add(subscription.id)
+
+        try:
+            self.watchlist.add_all(list(requests_by_key.values()), source='subscription')
+        except ValueError:
+            self.remove(subscription.id)
+            raise
+        return subscription
+
+    def get(self, subscription_id: str) -> Optional[Subscription]:
+        with self._lock:
+            return self._subscriptions.get(subscription_id)
+
+    def remove(self, subscription_id: str) -> bool:
+        with self._lock:
+            subscription = self._subscriptions.pop(subscription_id, None)
+            if subscription is None:
+                return False
+            subscription.closed = True
+            subscription.condition.notify_all()
+            unwatched = []
+            for key in subscription.keys:
+                subscribers = self._by_key.get(key, set())
+                subscribers.discard(subscription_id)
+                if not subscribers:
+                    self._by_key.pop(key, None)
+                    unwatched.append(key)
+
+        for key in unwatched:
+            entry = self.watchlist.entries.get(key)
+            if entry is not None and entry.source == 'subscription':
+                self.watchlist.remove(key)
+        return True
+
+    def on_result(self, key: str, stored: StoredResult, previous: Optional[StoredResult]):
+        with self._lock:
+            if key not in self._by_key:
+                return
+        change = pulse_change(key, stored, previous)
+        if change is None:
+            return
+
+        webhooks = []
+        with self._lock:
+            for subscription_id in self._by_key.get(key, ()):
+                subscription = self._subscriptions[subscription_id]
+                if not subscription.wants(change):
+                    continue
+                subscription.sequence += 1
+                if subscription.webhook_url:
+                    webhooks.append((subscription, subscription.sequence))
+                else:
+                    subscription.events.append((subscription.sequence, change.body))
+                    subscription.condition.notify_all()
+        for subscription, sequence in webhooks:
+            self.dispatcher.enqueue(subscription, sequence, change.body)
+
+    def wait_for_events(self, subscription: Subscription, after: int, timeout: float) -> Optional[List[Tuple[int, str]]]:
+        """
+        Queued events with a sequence number above `after`, waiting up to
+        `timeout` seconds for one; an empty list on timeout, None once the
+        subscription is deleted.
+        """
+        with subscription.condition:
+            subscription.condition.wait_for(lambda: subscription.closed or subscription.sequence > after, timeout)
+            if subscription.closed:
+                return None
+            return [(sequence, body) for sequence, body in subscription.events if sequence > after]
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            subscriptions = list(self._subscriptions.values())
+            tokens = len(self._by_key)
+        summary = self.dispatcher.status()
+        summary.update({
+            'subscriptions': len(subscriptions),
+            'webhook_subscriptions': sum(1 for subscription in subscriptions if subscription.webhook_url),
+            'tokens': tokens,
+            'events': sum(subscription.sequence for subscription in subscriptions),
+        })
+        return summary
+
+subscriptions = SubscriptionManager()
+result_store.add_listener(subscriptions.on_result)
@@ -0,0 +1,71 @@
+import html
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+RETWEET_PATTERN = re.compile(r"^RT\s+@\w+:?\s*")
+URL_PATTERN = re.compile(r"https?://\S+|www\.\S+")
+MENTION_PATTERN = re.compile(r"(?<![\w$])@\w+")
+EMOJI_PATTERN = re.compile("[\U0001F000-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF\uFE0F\u200D]+")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+# Words, numbers, cashtags ($sol) and hashtags (#solana) keep their prefix; "!" feeds the lexicon scorer
+TOKEN_PATTERN = re.compile(r"[$#]?[a-z0-9]+|!")
+
+def normalize_text(text: str) -> str:
+    """Drops the retweet prefix, URLs, @handles and emoji from a collected text and collapses whitespace."""
+    text = html.unescape(text)
+    text = RETWEET_PATTERN.sub('', text)
+    text = URL_PATTERN.sub(' ', text)
+    text = MENTION_PATTERN.sub(' ', text)
+    text = EMOJI_PATTERN.sub(' ', text)
+    return WHITESPACE_PATTERN.sub(' ', text).strip()
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased tokens of a normalized text, with "n't" spelled out as "not"."""
+    return TOKEN_PATTERN.findall(text.lower().replace("n't", " not"))
+
+@dataclass
+class NormalizedTexts:
+    """
+    Collected texts after one normalization and tokenization pass. Retweets
+    and texts with identical tokens are kept once, in first-seen order, and
+    `counts` records how many collected texts each one stands for; texts
+    with no tokens left are dropped. `positions` maps every collected text
+    to the index of its entry, -1 when it was dropped.
+
+    Scores built on it (sentiment mean and volatility, trending phrases)
+    weigh each distinct text once, so copies of one post do not dominate
+    them. Only spam detection uses `counts`, as copies are what it looks for.
+    """
+    texts: List[str] = field(default_factory=list)
+    tokens: List[List[str]] = field(default_factory=list)
+    counts: List[int] = field(default_factory=list)
+    positions: List[int] = field(default_factory=list)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+def normalize_texts(texts: List[str]) -> NormalizedTexts:
+    normalized = NormalizedTexts()
+    positions: Dict[str, int] = {}
+    for text in texts:
+        cleaned = normalize_text(text)
+        tokens = tokenize(cleaned)
+        if not tokens:
+            normalized.positions.append(-1)
+            continue
+        key = ' '.join(tokens)
+        position = positions.get(key)
+        if position is None:
+            positions[key] = len(normalized.texts)
+            normalized.texts.append(cleaned)
+            normalized.tokens.append(tokens)
+            normalized.counts.append(1)
+        else:
+            normalized.counts[position] += 1
+        normalized.positions.append(positions[key])
+    return normalized
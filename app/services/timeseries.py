@@ -0,0 +1,525 @@
+import calendar
+import io
+import math
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+import numpy as np
+from config.settings import settings
+from services.leaderboard import METRIC_NAMES, metric_values
+from services.result_store import StoredResult, result_store
+
+ROLLUP_WIDTHS = {'hour': 3600, 'day': 86400}
+RESOLUTIONS = ('auto', 'raw') + tuple(ROLLUP_WIDTHS)
+# Time covered by one segment file of each level
+SEGMENT_SPANS = {'raw': 86400, 'hour': 7 * 86400, 'day': 365 * 86400}
+# A rollup level is queried while it holds at most this many buckets per requested point
+SCAN_FACTOR = 4
+# Each frame of a segment file is its length followed by an npz archive
+FRAME_LENGTH = struct.Struct('<Q')
+
+class _Window:
+    """
+    The newest `capacity` rows of a set of columns, contiguous and in time
+    order so ranges are found by binary search. Rows are appended past the
+    end and, once the arrays are twice the capacity, the newest `capacity`
+    are moved to the front at once, so an append is amortized O(1).
+    """
+
+    def __init__(self, capacity: int, columns: Dict[str, Tuple[Tuple[int, ...], Any]]):
+        self.capacity = capacity
+        self.start = 0
+        self.end = 0
+        # Whether rows were ever dropped, i.e. the window no longer holds everything since the first row
+        self.dropped = False
+        self.columns = {name: np.empty((16,) + shape, dtype=dtype) for name, (shape, dtype) in columns.items()}
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def view(self, name: str) -> np.ndarray:
+        return self.columns[name][self.start:self.end]
+
+    def append(self) -> int:
+        """Index of a new last row, for the caller to fill."""
+        if self.end == len(self.columns['time']):
+            if self.end >= 2 * self.capacity:
+                for column in self.columns.values():
+                    column[:len(self)] = column[self.start:self.end]
+                self.start, self.end = 0, len(self)
+            else:
+                size = min(2 * self.end, 2 * self.capacity)
+                self.columns = {name: np.resize(column, (size,) + column.shape[1:]) for name, column in self.columns.items()}
+        row = self.end
+        self.end += 1
+        if self.end - self.start > self.capacity:
+            self.start += 1
+            self.dropped = True
+        return row
+
+    def insert(self, at: float) -> Optional[int]:
+        """Index of a new row at time `at` among the existing ones, None if it is older than the window."""
+        position = int(np.searchsorted(self.view('time'), at))
+        full = len(self) == self.capacity
+        if full and position == 0:
+            return None
+        self.append()
+        # Appending to a full window dropped its oldest row
+        row = self.start + position - full
+        for column in self.columns.values():
+            column[row + 1:self.end] = column[row:self.end - 1].copy()
+        self.columns['time'][row] = at
+        return row
+
+    def find(self, at: float) -> Optional[int]:
+        """Index of the row at time `at`, if there is one."""
+        times = self.view('time')
+        position = int(np.searchsorted(times, at))
+        if position < len(times) and times[position] == at:
+            return self.start + position
+        return None
+
+    def covers(self, since: float) -> bool:
+        return len(self) > 0 and (not self.dropped or self.columns['time'][self.start] <= since)
+
+class _Rollup(_Window):
+    """Per bucket of `width` seconds and per metric: analyses with the metric, sum, min and max."""
+
+    def __init__(self, width: int, capacity: int):
+        metrics = (len(METRIC_NAMES),)
+        super().__init__(capacity, {
+            'time': ((), np.float64),
+            'count': (metrics, np.uint32),
+            'sum': (metrics, np.float64),
+            'min': (metrics, np.float32),
+            'max': (metrics, np.float32),
+        })
+        self.width = width
+
+    def add(self, at: float, values: np.ndarray) -> Optional[float]:
+        """Merges one analysis into its bucket and returns the bucket's start, None if it is older than the window."""
+        bucket = math.floor(at / self.width) * self.width
+        row = self.find(bucket)
+        if row is None:
+            row = self.insert(bucket)
+            if row is None:
+                return None
+            self.columns['count'][row] = 0
+            self.columns['sum'][row] = 0.0
+            self.columns['min'][row] = np.inf
+            self.columns['max'][row] = -np.inf
+        present = ~np.isnan(values)
+        self.columns['count'][row] += present
+        self.columns['sum'][row] += np.where(present, values, 0.0)
+        # fmin/fmax skip NaN
+        self.columns['min'][row] = np.fmin(self.columns['min'][row], values)
+        self.columns['max'][row] = np.fmax(self.columns['max'][row], values)
+        return bucket
+
+    def replace(self, bucket: float, stats: Dict[str, np.ndarray]):
+        """Sets a bucket read back from disk; a later record of the same bucket supersedes an earlier one."""
+        row = self.find(bucket)
+        if row is None:
+            row = self.insert(bucket)
+            if row is None:
+                return
+        for name, values in stats.items():
+            self.columns[name][row] = values
+
+class TokenSeries:
+    """Recent analyses of one token, plus their hourly and daily rollups."""
+
+    def __init__(self):
+        self.raw = _Window(settings.TIMESERIES_RAW_POINTS, {
+            'time': ((), np.float64),
+            'values': ((len(METRIC_NAMES),), np.float32),
+        })
+        self.rollups = {
+            'hour': _Rollup(ROLLUP_WIDTHS['hour'], settings.TIMESERIES_HOURLY_BUCKETS),
+            'day': _Rollup(ROLLUP_WIDTHS['day'], settings.TIMESERIES_DAILY_BUCKETS),
+        }
+        # Per rollup level: buckets starting before this are on disk
+        self.written_through = {level: 0.0 for level in self.rollups}
+        self.updated_at = 0.0
+
+    def add(self, at: float, values: np.ndarray):
+        if not len(self.raw) or self.raw.columns['time'][self.raw.end - 1] <= at:
+            row = self.raw.append()
+            self.raw.columns['time'][row] = at
+            self.raw.columns['values'][row] = values
+        self.add_to_rollups(at, values)
+        self.updated_at = max(self.updated_at, at)
+
+    def add_to_rollups(self, at: float, values: np.ndarray):
+        for level, rollup in self.rollups.items():
+            bucket = rollup.add(at, values)
+            if bucket is not None and bucket < self.written_through[level]:
+                # A late analysis changed a bucket already on disk, write it again
+                self.written_through[level] = bucket
+
+    def closed_buckets(self, level: str, now: float) -> np.ndarray:
+        """Rows of the buckets that ended but are not on disk yet, and marks them written."""
+        rollup = self.rollups[level]
+        times = rollup.view('time')
+        first = int(np.searchsorted(times, self.written_through[level]))
+        last = int(np.searchsorted(times, now - rollup.width, 'right'))
+        if last > first:
+            self.written_through[level] = float(times[last - 1]) + rollup.width
+        return np.arange(rollup.start + first, rollup.start + max(first, last))
+
+    def has_open_buckets(self) -> bool:
+        return any(
+            len(rollup) and rollup.columns['time'][rollup.end - 1] >= self.written_through[level]
+            for level, rollup in self.rollups.items()
+        )
+
+@dataclass
+class TimeseriesQuery:
+    start: float
+    end: float
+    metrics: List[str] = field(default_factory=lambda: list(METRIC_NAMES))
+    points: int = 200
+    resolution: str = 'auto'
+
+def parse_timeseries_query(args, now: Optional[float] = None) -> TimeseriesQuery:
+    """
+    Builds a query from request arguments: metrics (comma separated, all by
+    default), start and end (unix seconds, the last 7 days by default),
+    points (the most points returned) and resolution (auto, raw, hour or
+    day). Raises ValueError with a message for the client on anything
+    invalid.
+    """
+    now = time.time() if now is None else now
+    try:
+        end = float(args.get('end') or now)
+        start = float(args.get('start') or end - 7 * 86400)
+        points = int(args.get('points', 200))
+    except ValueError:
+        raise ValueError("start, end and points must be numbers")
+    if not start < end:
+        raise ValueError("start must be before end")
+    if not 1 <= points <= settings.TIMESERIES_MAX_POINTS:
+        raise ValueError(f"points must be between 1 and {settings.TIMESERIES_MAX_POINTS}")
+
+    metrics = args['metrics'].split(',') if args.get('metrics') else list(METRIC_NAMES)
+    if set(metrics) - set(METRIC_NAMES):
+        raise ValueError(f"metrics must be among: {', '.join(METRIC_NAMES)}")
+    resolution = args.get('resolution', 'auto')
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"resolution must be one of: {', '.join(RESOLUTIONS)}")
+    return TimeseriesQuery(start=start, end=end, metrics=metrics, points=points, resolution=resolution)
+
+def _downsample(times: np.ndarray, stats: Dict[str, np.ndarray], origin: float, step: float) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Merges consecutive rows into buckets of `step` seconds aligned to `origin`."""
+    groups = np.floor((times - origin) / step).astype(np.int64)
+    boundaries = np.flatnonzero(np.diff(groups, prepend=groups[0] - 1))
+    return origin + groups[boundaries] * step, {
+        'count': np.add.reduceat(stats['count'], boundaries),
+        'sum': np.add.reduceat(stats['sum'], boundaries),
+        'min': np.minimum.reduceat(stats['min'], boundaries),
+        'max': np.maximum.reduceat(stats['max'], boundaries),
+    }
+
+def _values_or_none(values: np.ndarray, present: np.ndarray) -> List[Optional[float]]:
+    return [round(value, 6) if keep else None for value, keep in zip(values.tolist(), present.tolist())]
+
+class TimeseriesStore:
+    """
+    Sentiment, engagement and risk over time for every analyzed token.
+
+    Every finished analysis (request or watchlist refresh) is recorded with
+    the leaderboard's metrics. Per token, the newest TIMESERIES_RAW_POINTS
+    analyses are kept as they are, and every analysis is also merged into
+    hourly and daily buckets (count, sum, min and max per metric) holding
+    TIMESERIES_HOURLY_BUCKETS and TIMESERIES_DAILY_BUCKETS buckets. A query
+    reads the finest level that covers its range within SCAN_FACTOR rows per
+    requested point and merges those rows down to the requested points, so
+    its cost is bounded by the points asked for, not by the analyses stored.
+
+    With TIMESERIES_DIR set, new analyses and every bucket once it has
+    ended are appended to segment files (one per level and day, week or
+    year) every TIMESERIES_FLUSH_INTERVAL seconds. They are read back on
+    first use: the rollups from the bucket records, the raw window and the
+    buckets still open from the raw records. Segment files are deleted once
+    older than what their level keeps in memory (TIMESERIES_RAW_RETENTION
+    for raw analyses). At most TIMESERIES_MAX_TOKENS tokens are kept in
+    memory, the least recently analyzed are dropped first.
+
+    Each process keeps its own series, so behind a prefork server a query
+    only sees the analyses its worker recorded. Workers sharing
+    TIMESERIES_DIR append to the same segments: the raw analyses of all of
+    them are read back at startup, but an ended bucket written by several
+    workers keeps the statistics of whichever wrote it last.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = settings.TIMESERIES_DIR if directory is None else directory
+        self._series: 'OrderedDict[str, TokenSeries]' = OrderedDict()
+        # Analyses not written yet, and the tokens that may have buckets not written yet
+        self._pending: List[Tuple[str, float, np.ndarray]] = []
+        self._open: Set[str] = set()
+        self._lock = threading.Lock()
+        # Held for a whole flush, so frames are appended in the order their contents were taken
+        self._flush_lock = threading.Lock()
+        self._loaded = False
+        self._last_flushed = time.time()
+        self._flushing = False
+
+    def on_result(self, key: str, stored: StoredResult, previous: Optional[StoredResult]):
+        self.add(key, stored.computed_at, metric_values(stored.response))
+
+    def add(self, key: str, at: float, values: np.ndarray):
+        with self._lock:
+            self._ensure_loaded()
+            self._token(key).add(at, values)
+            self._series.move_to_end(key)
+            if self.directory:
+                self._pending.append((key, at, values))
+                self._open.add(key)
+            flush_due = bool(self.directory) and not self._flushing and time.time() - self._last_flushed > settings.TIMESERIES_FLUSH_INTERVAL
+            if flush_due:
+                self._flushing = True
+
+        if flush_due:
+            threading.Thread(target=self.flush, name='timeseries-flush', daemon=True).start()
+
+    def query(self, key: str, query: TimeseriesQuery) -> Optional[Dict[str, Any]]:
+        """The token's metrics over the query range, None for a token without analyses."""
+        columns = [METRIC_NAMES.index(name) for name in query.metrics]
+        with self._lock:
+            self._ensure_loaded()
+            series = self._series.get(key)
+            if series is None:
+                return None
+            resolution = self._resolution(series, query)
+            if resolution == 'raw':
+                window = series.raw
+                times = window.view('time')
+                first, last = np.searchsorted(times, query.start), np.searchsorted(times, query.end, 'right')
+                times = times[first:last].copy()
+                values = window.view('values')[first:last, columns].astype(np.float64)
+                present = ~np.isnan(values)
+                stats = {
+                    'count': present.astype(np.uint32),
+                    'sum': np.where(present, values, 0.0),
+                    'min': np.where(present, values, np.inf),
+                    'max': np.where(present, values, -np.inf),
+                }
+                width = 0
+            else:
+                window = series.rollups[resolution]
+                width = window.width
+                times = window.view('time')
+                first = np.searchsorted(times, math.floor(query.start / width) * width)
+                last = np.searchsorted(times, query.end, 'right')
+                times = times[first:last].copy()
+                stats = {name: window.view(name)[first:last, columns].astype(np.float64) for name in ('count', 'sum', 'min', 'max')}
+
+        step = None
+        if len(times) > query.points:
+            # Whole buckets of the level, wide enough for at most `points` (plus a partial one at each end)
+            step = max(query.end - query.start, 1.0) / query.points
+            if width:
+                step = math.ceil(step / width) * width
+            origin = math.floor(query.start / step) * step
+            times, stats = _downsample(times, stats, origin, step)
+
+        present = stats['count'] > 0
+        mean = stats['sum'] / np.maximum(stats['count'], 1)
+        return {
+            'token': key,
+            'resolution': resolution,
+            'step': step if step is not None else (width or None),
+            'start': query.start,
+            'end': query.end,
+            'times': times.tolist(),
+            'series': {
+                name: {
+                    'count': stats['count'][:, i].astype(np.int64).tolist(),
+                    'mean': _values_or_none(mean[:, i], present[:, i]),
+                    'min': _values_or_none(stats['min'][:, i], present[:, i]),
+                    'max': _values_or_none(stats['max'][:, i], present[:, i]),
+                }
+                for i, name in enumerate(query.metrics)
+            },
+        }
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._series)
+
+    def _resolution(self, series: TokenSeries, query: TimeseriesQuery) -> str:
+        if query.resolution != 'auto':
+            return query.resolution
+        times = series.raw.view('time')
+        in_range = np.searchsorted(times, query.end, 'right') - np.searchsorted(times, query.start)
+        if series.raw.covers(query.start) and in_range <= query.points:
+            return 'raw'
+        for level, rollup in series.rollups.items():
+            if rollup.covers(query.start) and (query.end - query.start) / rollup.width <= query.points * SCAN_FACTOR:
+                return level
+        return 'day'
+
+    def _token(self, key: str) -> TokenSeries:
+        series = self._series.get(key)
+        if series is None:
+            while len(self._series) >= settings.TIMESERIES_MAX_TOKENS:
+                evicted, _ = self._series.popitem(last=False)
+                self._open.discard(evicted)
+            series = self._series[key] = TokenSeries()
+        return series
+
+    def flush(self):
+        """Appends the pending analyses and the buckets that ended to the segment files."""
+        with self._flush_lock:
+            self._flush()
+
+    def _flush(self):
+        try:
+            now = time.time()
+            with self._lock:
+                pending, self._pending = self._pending, []
+                closed = {level: ([], []) for level in ROLLUP_WIDTHS}
+                for key in list(self._open):
+                    series = self._series.get(key)
+                    if series is None:
+                        self._open.discard(key)
+                        continue
+                    for level, (keys, stats) in closed.items():
+                        rows = series.closed_buckets(level, now)
+                        if len(rows):
+                            rollup = series.rollups[level]
+                            keys.append((key, len(rows)))
+                            stats.append({name: column[rows].copy() for name, column in rollup.columns.items()})
+                    if not series.has_open_buckets():
+                        self._open.discard(key)
+
+            os.makedirs(self.directory, exist_ok=True)
+            if pending:
+                keys, times, values = zip(*pending)
+                self._write_frame('raw', now, keys, time=np.array(times), values=np.stack(values).astype(np.float32))
+            for level, (keys, stats) in closed.items():
+                if keys:
+                    self._write_frame(
+                        level, now, [key for key, count in keys for _ in range(count)],
+                        **{name: np.concatenate([bucket[name] for bucket in stats]) for name in stats[0]}
+                    )
+            self._expire(now)
+        except Exception as e:
+            print(f"Error writing time series: {e}")
+        finally:
+            with self._lock:
+                self._last_flushed = time.time()
+                self._flushing = False
+
+    def _segment_path(self, level: str, at: float) -> str:
+        period = math.floor(at / SEGMENT_SPANS[level]) * SEGMENT_SPANS[level]
+        return os.path.join(self.directory, f"{level}-{time.strftime('%Y%m%d', time.gmtime(period))}.seg")
+
+    def _write_frame(self, level: str, at: float, keys: List[str], **columns: np.ndarray):
+        names, index = np.unique(np.array(keys, dtype=str), return_inverse=True)
+        buffer = io.BytesIO()
+        np.savez(buffer, metrics=np.array(METRIC_NAMES), keys=names, key_index=index.astype(np.uint32), **columns)
+        data = buffer.getvalue()
+        # One write in append mode, so frames of processes sharing the directory do not interleave
+        with open(self._segment_path(level, at), 'ab') as f:
+            f.write(FRAME_LENGTH.pack(len(data)) + data)
+
+    def _segments(self) -> List[Tuple[str, float, str]]:
+        """(level, period start, path) of every segment file, oldest first."""
+        segments = []
+        for name in sorted(os.listdir(self.directory)):
+            level, _, date = name[:-len('.seg')].partition('-')
+            if name.endswith('.seg') and level in SEGMENT_SPANS:
+                try:
+                    period = calendar.timegm(time.strptime(date, '%Y%m%d'))
+                except ValueError:
+                    continue
+                segments.append((level, float(period), os.path.join(self.directory, name)))
+        return segments
+
+    def _expire(self, now: float):
+        retention = {
+            'raw': settings.TIMESERIES_RAW_RETENTION,
+            'hour': settings.TIMESERIES_HOURLY_BUCKETS * ROLLUP_WIDTHS['hour'],
+            'day': settings.TIMESERIES_DAILY_BUCKETS * ROLLUP_WIDTHS['day'],
+        }
+        for level, period, path in self._segments():
+            if period + SEGMENT_SPANS[level] < now - retention[level]:
+                os.remove(path)
+
+    def _read_frames(self, path: str):
+        with open(path, 'rb') as f:
+            data = f.read()
+        offset = 0
+        while offset + FRAME_LENGTH.size <= len(data):
+            length, = FRAME_LENGTH.unpack_from(data, offset)
+            offset += FRAME_LENGTH.size
+            if offset + length > len(data):
+                print(f"Truncated frame at the end of {path}, skipping it")
+                return
+            with np.load(io.BytesIO(data[offset:offset + length])) as frame:
+                if tuple(frame['metrics']) != METRIC_NAMES:
+                    print(f"Frame in {path} was written with other metrics, skipping it")
+                else:
+                    yield {name: frame[name] for name in frame.files}
+            offset += length
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        try:
+            segments = self._segments()
+            # Ended buckets first, then the raw analyses fill the raw windows and the buckets still open
+            for wanted in ('day', 'hour', 'raw'):
+                for level, _, path in segments:
+                    if level != wanted:
+                        continue
+                    for frame in self._read_frames(path):
+                        keys = frame['keys'][frame['key_index']].tolist()
+                        if level == 'raw':
+                            self._load_raw(keys, frame['time'], frame['values'])
+                        else:
+                            self._load_buckets(level, keys, frame)
+        except Exception as e:
+            print(f"Error loading time series: {e}")
+
+        for key, series in sorted(self._series.items(), key=lambda item: item[1].updated_at):
+            self._series.move_to_end(key)
+            if series.has_open_buckets():
+                self._open.add(key)
+        while len(self._series) > settings.TIMESERIES_MAX_TOKENS:
+            evicted, _ = self._series.popitem(last=False)
+            self._open.discard(evicted)
+
+    def _load_buckets(self, level: str, keys: List[str], frame: Dict[str, np.ndarray]):
+        width = ROLLUP_WIDTHS[level]
+        for row, key in enumerate(keys):
+            series = self._series.get(key) or self._series.setdefault(key, TokenSeries())
+            bucket = float(frame['time'][row])
+            series.rollups[level].replace(bucket, {name: frame[name][row] for name in ('count', 'sum', 'min', 'max')})
+            series.written_through[level] = max(series.written_through[level], bucket + width)
+            series.updated_at = max(series.updated_at, bucket)
+
+    def _load_raw(self, keys: List[str], times: np.ndarray, values: np.ndarray):
+        for key, at, row in zip(keys, times.tolist(), values):
+            series = self._series.get(key) or self._series.setdefault(key, TokenSeries())
+            if not len(series.raw) or series.raw.columns['time'][series.raw.end - 1] <= at:
+                index = series.raw.append()
+                series.raw.columns['time'][index] = at
+                series.raw.columns['values'][index] = row
+            for level, rollup in series.rollups.items():
+                if at >= series.written_through[level]:
+                    rollup.add(at, row)
+            series.updated_at = max(series.updated_at, at)
+
+timeseries_store = TimeseriesStore()
+result_store.add_listener(timeseries_store.on_result)
@@ -0,0 +1,207 @@
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+from config.settings import settings
+from services.text_normalizer import NormalizedTexts
+
+STOP_WORDS = ENGLISH_STOP_WORDS
+
+# Forward decay weights are rescaled once they grow past 2 ** RENORMALIZE_AFTER
+RENORMALIZE_AFTER = 30
+
+def extract_phrases(words: List[str], max_ngram: int = 2) -> List[str]:
+    """Unigrams up to `max_ngram`-grams of a tokenized text that neither start nor end with a stop word or a bare number."""
+    usable = [len(word) > 2 and word not in STOP_WORDS and not word.isdigit() for word in words]
+    phrases = []
+    for n in range(1, max_ngram + 1):
+        for start in range(len(words) - n + 1):
+            if usable[start] and usable[start + n - 1]:
+                phrases.append(' '.join(words[start:start + n]))
+    return phrases
+
+class DecayedHeavyHitters:
+    """
+    Time-decayed phrase counts in bounded memory.
+
+    A Count-Min sketch (depth x width) estimates the decayed count of every
+    phrase ever seen, and the `capacity` phrases with the largest estimates
+    are monitored Space-Saving style: a new phrase replaces the smallest
+    monitored one once its estimate is larger. Decay is forward decay, an
+    observation at time t weighs 2 ** ((t - landmark) / half_life), so stored
+    counts are never aged in place; reads divide by the weight of now.
+    """
+
+    def __init__(self, capacity: int, width: int, depth: int, half_life: float):
+        self.capacity = capacity
+        self.width = width
+        self.half_life = half_life
+        self.landmark = time.time()
+        self.table = np.zeros((depth, width))
+        rng = np.random.default_rng(depth * 7919 + width)
+        # Multiply-shift hashing, one odd multiplier per row
+        self._multipliers = rng.integers(1, 2 ** 63, size=depth, dtype=np.uint64) | np.uint64(1)
+        self._offsets = rng.integers(0, 2 ** 63, size=depth, dtype=np.uint64)
+        self.monitored: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._ranking: Optional[List[Tuple[str, float]]] = None
+
+    def update(self, phrases: List[str], timestamps: np.ndarray):
+        if not phrases:
+            return
+        now = time.time()
+        if (now - self.landmark) / self.half_life > RENORMALIZE_AFTER:
+            self._renormalize(now)
+
+        weights = np.exp2((np.minimum(timestamps, now) - self.landmark) / self.half_life)
+        columns = self._columns(phrases)
+        for row in range(self.table.shape[0]):
+            np.add.at(self.table[row], columns[row], weights)
+        estimates = self.table[np.arange(self.table.shape[0])[:, None], columns].min(axis=0)
+
+        # Counts only grow, so the estimate after the whole batch is each phrase's current count
+        for phrase, estimate in dict(zip(phrases, estimates.tolist())).items():
+            self._offer(phrase, estimate)
+        self._ranking = None
+
+    def top(self, k: int) -> List[Tuple[str, float]]:
+        """The k phrases with the largest decayed counts, as of now."""
+        if self._ranking is None:
+            self._ranking = sorted(self.monitored.items(), key=lambda item: item[1], reverse=True)
+        scale = 2.0 ** (-(time.time() - self.landmark) / self.half_life)
+        return [(phrase, count * scale) for phrase, count in self._ranking[:k]]
+
+    @property
+    def nbytes(self) -> int:
+        # Table plus a rough per-entry cost of the monitored dict and heap
+        return self.table.nbytes + 200 * (len(self.monitored) + len(self._heap))
+
+    def _columns(self, phrases: List[str]) -> np.ndarray:
+        hashes = np.array([hash(phrase) for phrase in phrases], dtype=np.int64).view(np.uint64)
+        mixed = hashes[None, :] * self._multipliers[:, None] + self._offsets[:, None]
+        return ((mixed >> np.uint64(32)) % np.uint64(self.width)).astype(np.int64)
+
+    def _offer(self, phrase: str, estimate: float):
+        if phrase in self.monitored or len(self.monitored) < self.capacity:
+            self.monitored[phrase] = estimate
+            heapq.heappush(self._heap, (estimate, phrase))
+        else:
+            smallest_count, smallest = self._smallest()
+            if estimate <= smallest_count:
+                return
+            heapq.heappop(self._heap)
+            del self.monitored[smallest]
+            self.monitored[phrase] = estimate
+            heapq.heappush(self._heap, (estimate, phrase))
+
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild_heap()
+
+    def _smallest(self) -> Tuple[float, str]:
+        # Heap entries go stale when a monitored count grows, skip those
+        while True:
+            count, phrase = self._heap[0]
+            if self.monitored.get(phrase) == count:
+                return count, phrase
+            heapq.heappop(self._heap)
+
+    def _rebuild_heap(self):
+        self._heap = [(count, phrase) for phrase, count in self.monitored.items()]
+        heapq.heapify(self._heap)
+
+    def _renormalize(self, now: float):
+        scale = 2.0 ** (-(now - self.landmark) / self.half_life)
+        self.table *= scale
+        self.monitored = {phrase: count * scale for phrase, count in self.monitored.items()}
+        self._rebuild_heap()
+        self.landmark = now
+
+class TrendingEngine:
+    """
+    Keeps a DecayedHeavyHitters per token (at most TRENDING_MAX_TOKENS, least
+    recently updated evicted first) plus a global one across all tokens.
+
+    Every collection is fed through observe() as its NormalizedTexts; texts
+    already seen for that token are skipped, so re-collecting the same week
+    of history does not inflate counts and the cost of an update is
+    proportional to the new texts only. top() answers from the monitored phrases without
+    touching any text.
+    """
+
+    def __init__(self):
+        self._sketches: 'OrderedDict[str, DecayedHeavyHitters]' = OrderedDict()
+        self._seen: Dict[str, 'OrderedDict[int, None]'] = {}
+        self._global = self._new_sketch(settings.TRENDING_GLOBAL_CAPACITY)
+        self._lock = threading.Lock()
+
+    def observe(self, key: str, normalized: NormalizedTexts, times: List[Optional[float]]) -> int:
+        """
+        Adds the phrases of unseen texts, returning how many distinct texts
+        were new. `times` holds the epoch seconds (None when unknown) of every
+        collected text, aligned with normalized.positions. Like the other
+        scores on NormalizedTexts, a distinct text counts once however many
+        new copies of it were collected, at the time of the newest copy.
+        """
+        now = time.time()
+        with self._lock:
+            seen = self._seen.setdefault(key, OrderedDict())
+            new: Dict[int, float] = {}
+            for position, timestamp in zip(normalized.positions, times):
+                if position < 0:
+                    continue
+                fingerprint = hash((timestamp, tuple(normalized.tokens[position])))
+                if fingerprint not in seen:
+                    seen[fingerprint] = None
+                    when = now if timestamp is None else timestamp
+                    new[position] = max(when, new.get(position, when))
+            while len(seen) > settings.TRENDING_SEEN_LIMIT:
+                seen.popitem(last=False)
+        if not new:
+            return 0
+
+        phrases, phrase_times = [], []
+        for position, when in new.items():
+            text_phrases = extract_phrases(normalized.tokens[position], settings.TRENDING_MAX_NGRAM)
+            phrases.extend(text_phrases)
+            phrase_times.extend([when] * len(text_phrases))
+        times = np.array(phrase_times, dtype=np.float64)
+
+        with self._lock:
+            sketch = self._sketches.get(key)
+            if sketch is None:
+                sketch = self._sketches[key] = self._new_sketch(settings.TRENDING_CAPACITY)
+                while len(self._sketches) > settings.TRENDING_MAX_TOKENS:
+                    evicted, _ = self._sketches.popitem(last=False)
+                    self._seen.pop(evicted, None)
+            self._sketches.move_to_end(key)
+            sketch.update(phrases, times)
+            self._global.update(phrases, times)
+        return len(new)
+
+    def top(self, key: Optional[str] = None, k: int = 10) -> List[Tuple[str, float]]:
+        """Top-k (phrase, decayed count) for a token, or across all tokens when key is None."""
+        with self._lock:
+            sketch = self._global if key is None else self._sketches.get(key)
+            return sketch.top(k) if sketch is not None else []
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            sketches = list(self._sketches.values())
+            return {
+                'tracked_tokens': len(sketches),
+                'memory_bytes': self._global.nbytes + sum(sketch.nbytes for sketch in sketches)
+            }
+
+    @staticmethod
+    def _new_sketch(capacity: int) -> DecayedHeavyHitters:
+        return DecayedHeavyHitters(
+            capacity=capacity,
+            width=settings.TRENDING_SKETCH_WIDTH,
+            depth=settings.TRENDING_SKETCH_DEPTH,
+            half_life=settings.TRENDING_HALF_LIFE
+        )
+
+trending_engine = TrendingEngine()
@@ -0,0 +1,266 @@
+import heapq
+import json
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import numpy as np
+from config.settings import settings
+from services.result_store import ResultStore, result_store, token_key
+from services.social_pulse_analyzer import get_analyzer
+from utils.response_formatter import format_analysis_response
+
+@dataclass
+class WatchEntry:
+    key: str
+    request: Dict[str, Any]
+    interval: float
+    source: str = 'configured'
+    next_due: float = 0.0
+    last_refreshed: Optional[float] = None
+    refresh_count: int = 0
+    failures: int = 0
+    in_flight: bool = False
+
+@dataclass
+class RefreshMetrics:
+    refreshes: int = 0
+    failures: int = 0
+    lag_samples: deque = field(default_factory=lambda: deque(maxlen=1000))
+    duration_samples: deque = field(default_factory=lambda: deque(maxlen=1000))
+
+    def summary(self) -> Dict[str, Any]:
+        lags = np.array(self.lag_samples) if self.lag_samples else np.zeros(1)
+        durations = np.array(self.duration_samples) if self.duration_samples else np.zeros(1)
+        return {
+            'refreshes': self.refreshes,
+            'failures': self.failures,
+            'lag_seconds': {
+                'p50': float(np.percentile(lags, 50)),
+                'p95': float(np.percentile(lags, 95)),
+                'max': float(lags.max())
+            },
+            'refresh_seconds': {
+                'p50': float(np.percentile(durations, 50)),
+                'p95': float(np.percentile(durations, 95))
+            }
+        }
+
+class WatchlistRefresher:
+    """
+    Keeps pulses for watched tokens precomputed in the result store.
+
+    Every entry has its own refresh interval: it halves when the token's
+    sentiment or engagement moved noticeably since the previous refresh and
+    grows by half otherwise, clamped to [WATCHLIST_MIN_INTERVAL,
+    WATCHLIST_MAX_INTERVAL]. Due times are jittered so entries added together
+    do not refresh in lockstep, and at most WATCHLIST_MAX_CONCURRENCY
+    refreshes run at once. Watched tokens are pinned in the result store.
+    """
+
+    def __init__(self, store: ResultStore = result_store, analyzer=None):
+        self.store = store
+        self.analyzer = analyzer
+        self.entries: Dict[str, WatchEntry] = {}
+        self.metrics = RefreshMetrics()
+        self._schedule: List[tuple] = []
+        self._request_log: Dict[str, deque] = {}
+        self._condition = threading.Condition()
+        # Created by start(), so importing this module starts no threads
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots = threading.BoundedSemaphore(settings.WATCHLIST_MAX_CONCURRENCY)
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    def load_configured(self):
+        """Adds entries from WATCHLIST (comma separated contract addresses) and WATCHLIST_FILE (JSON list of request payloads)."""
+        for contract_address in filter(None, (address.strip() for address in settings.WATCHLIST.split(','))):
+            self.add({'contract_address': contract_address})
+
+        if settings.WATCHLIST_FILE:
+            with open(settings.WATCHLIST_FILE) as f:
+                for request in json.load(f):
+                    self.add(request)
+
+    def add(self, request: Dict[str, Any], source: str = 'configured') -> WatchEntry:
+        key = token_key(request)
+        with self._condition:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = WatchEntry(key=key, request=request, interval=settings.WATCHLIST_MIN_INTERVAL, source=source)
+                # Spread the first refresh of a batch of new entries over one interval
+                entry.next_due = time.time() + random.uniform(0, settings.WATCHLIST_MIN_INTERVAL)
+                self.entries[key] = entry
+                self.store.pin(key)
+                heapq.heappush(self._schedule, (entry.next_due, key))
+                self._condition.notify()
+            return entry
+
+    def add_all(self, requests: List[Dict[str, Any]], source: str) -> List[WatchEntry]:
+        """
+        Adds every request or none of them. Learned entries are evicted to
+        make room within WATCHLIST_MAX_SIZE; ValueError when even that
+        leaves too little.
+        """
+        with self._condition:
+            new = {token_key(request) for request in requests} - set(self.entries)
+            missing = len(self.entries) + len(new) - settings.WATCHLIST_MAX_SIZE
+            learned = sum(1 for entry in self.entries.values() if entry.source == 'learned')
+            if missing > learned:
+                raise ValueError(f"The watchlist is full ({settings.WATCHLIST_MAX_SIZE} tokens), unwatch some first")
+            for _ in range(missing):
+                self._evict_learned()
+            return [self.add(request, source) for request in requests]
+
+    def remove(self, key: str):
+        with self._condition:
+            if self.entries.pop(key, None) is not None:
+                self.store.unpin(key)
+
+    def record_request(self, request: Dict[str, Any]):
+        """
+        Counts on-demand requests per token; tokens requested at least
+        WATCHLIST_LEARN_THRESHOLD times within WATCHLIST_LEARN_WINDOW seconds
+        are added to the watchlist.
+        """
+        if settings.WATCHLIST_LEARN_THRESHOLD <= 0:
+            return
+        key = token_key(request)
+        now = time.time()
+        with self._condition:
+            if key in self.entries:
+                return
+            hits = self._request_log.setdefault(key, deque())
+            hits.append(now)
+            while hits and hits[0] < now - settings.WATCHLIST_LEARN_WINDOW:
+                hits.popleft()
+            if len(hits) < settings.WATCHLIST_LEARN_THRESHOLD:
+                return
+            del self._request_log[key]
+            if len(self.entries) >= settings.WATCHLIST_MAX_SIZE and not self._evict_learned():
+                return
+        self.add(request, source='learned')
+
+    def _evict_learned(self) -> bool:
+        # Drop the learned entry that has gone longest without a refresh
+        learned = [entry for entry in self.entries.values() if entry.source == 'learned']
+        if not learned:
+            return False
+        stalest = min(learned, key=lambda entry: entry.last_refreshed or 0)
+        del self.entries[stalest.key]
+        self.store.unpin(stalest.key)
+        return True
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.WATCHLIST_MAX_CONCURRENCY,
+                thread_name_prefix='watchlist-refresh'
+            )
+        self._thread = threading.Thread(target=self._run, name='watchlist-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running:
+                    timeout = self._schedule[0][0] - time.time() if self._schedule else None
+                    if timeout is not None and timeout <= 0:
+                        break
+                    self._condition.wait(timeout)
+                if not self._running:
+                    return
+                due, key = heapq.heappop(self._schedule)
+                entry = self.entries.get(key)
+                if entry is None or entry.next_due != due or entry.in_flight:
+                    continue  # removed or rescheduled since it was pushed
+                entry.in_flight = True
+
+            # Blocks here while the concurrency cap is reached
+            self._slots.acquire()
+            self._executor.submit(self._refresh, entry, due)
+
+    def _refresh(self, entry: WatchEntry, due: float):
+        started = time.time()
+        self.metrics.lag_samples.append(max(0.0, started - due))
+        try:
+            analyzer = self.analyzer or get_analyzer()
+            previous = self.store.get(entry.key)
+            response = format_analysis_response(analyzer.analyze_request(entry.request))
+            self.store.put(entry.key, response)
+
+            change = activity_change(previous.response if previous else None, response)
+            if change > settings.WATCHLIST_CHANGE_THRESHOLD:
+                entry.interval = max(settings.WATCHLIST_MIN_INTERVAL, entry.interval / 2)
+            else:
+                entry.interval = min(settings.WATCHLIST_MAX_INTERVAL, entry.interval * 1.5)
+
+            entry.refresh_count += 1
+            entry.last_refreshed = time.time()
+            self.metrics.refreshes += 1
+        except Exception as e:
+            entry.failures += 1
+            self.metrics.failures += 1
+            print(f"Error refreshing watchlist entry {entry.key}: {e}")
+        finally:
+            self.metrics.duration_samples.append(time.time() - started)
+            entry.in_flight = False
+            self._slots.release()
+            self._reschedule(entry)
+
+    def _reschedule(self, entry: WatchEntry):
+        jitter = settings.WATCHLIST_JITTER
+        with self._condition:
+            if self.entries.get(entry.key) is not entry:
+                return
+            entry.next_due = time.time() + entry.interval * random.uniform(1 - jitter, 1 + jitter)
+            heapq.heappush(self._schedule, (entry.next_due, entry.key))
+            self._condition.notify()
+
+    def status(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._condition:
+            entries = list(self.entries.values())
+        summary = self.metrics.summary()
+        summary.update({
+            'watched': len(entries),
+            'learned': sum(1 for entry in entries if entry.source == 'learned'),
+            'in_flight': sum(1 for entry in entries if entry.in_flight),
+            'overdue': sum(1 for entry in entries if not entry.in_flight and entry.next_due < now),
+            'mean_interval_seconds': float(np.mean([entry.interval for entry in entries])) if entries else 0.0
+        })
+        return summary
+
+def activity_change(previous: Optional[Dict[str, Any]], current: Dict[str, Any]) -> float:
+    """
+    Scores how much a token moved between two formatted responses: sentiment
+    delta in units of 0.1 plus the relative change in engagement.
+    """
+    if previous is None:
+        return float('inf')
+    sentiment_delta = abs(
+        current['overview']['sentiment_score']['value'] - previous['overview']['sentiment_score']['value']
+    ) / 0.1
+    previous_engagement = previous['engagement_metrics']['total_engagement_rate']
+    current_engagement = current['engagement_metrics']['total_engagement_rate']
+    engagement_delta = abs(current_engagement - previous_engagement) / max(previous_engagement, 1)
+    return sentiment_delta + engagement_delta
+
+watchlist_refresher = WatchlistRefresher()
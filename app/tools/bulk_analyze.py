@@ -0,0 +1,259 @@
+"""
+Analyzes a file of tokens offline across a process pool and streams one
+JSON result per line, resuming where a previous run of the same output
+stopped.
+
+    cd app && python -m tools.bulk_analyze tokens.jsonl results.jsonl [--workers N]
+
+Input is JSONL, one /api/analyze request body per line (contract_address
+or social_handles, optionally quality_tier, latency_budget_ms, fields and
+an "id"), or a record {"snapshot": path} replaying a collection snapshot.
+CSV input has an id, contract_address or twitter/reddit/discord/telegram
+columns, plus optional quality_tier and latency_budget_ms columns.
+
+Workers fork from a forkserver that preloaded services.nlp_worker, so the
+models are loaded and warmed once and shared copy-on-write. The output
+file is the checkpoint: every finished record is one flushed line, and on
+restart ids already in it are skipped (--retry-errors runs failed ones
+again). Throughput and an ETA are printed to stderr.
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+from services.latency_budget import QUALITY_TIERS, AnalysisBudget
+from services.result_store import token_key
+from utils.response_formatter import format_analysis_response
+from utils.validators import validate_request
+
+PLATFORMS = ('twitter', 'reddit', 'discord', 'telegram')
+
+_analyzer = None
+
+def record_from_row(row: Dict[str, str]) -> Dict[str, Any]:
+    record: Dict[str, Any] = {}
+    if row.get('id'):
+        record['id'] = row['id']
+    if row.get('contract_address'):
+        record['contract_address'] = row['contract_address'].strip()
+    handles = {platform: row[platform].strip() for platform in PLATFORMS if row.get(platform)}
+    if handles:
+        record['social_handles'] = handles
+    if row.get('quality_tier'):
+        record['quality_tier'] = row['quality_tier']
+    if row.get('latency_budget_ms'):
+        record['latency_budget_ms'] = float(row['latency_budget_ms'])
+    return record
+
+def iter_records(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """(line number, record) of every input entry; unreadable ones carry an "error" instead."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.lower().endswith('.csv'):
+            for line_number, row in enumerate(csv.DictReader(f), start=2):
+                try:
+                    yield line_number, record_from_row(row)
+                except ValueError as e:
+                    yield line_number, {'error': f"Invalid row: {e}"}
+            return
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                record = {'error': f"Invalid JSON: {e}"}
+            yield line_number, record if isinstance(record, dict) else {'error': "Expected a JSON object"}
+
+def record_id(line_number: int, record: Dict[str, Any]) -> str:
+    if record.get('id') is not None:
+        return str(record['id'])
+    if record.get('snapshot'):
+        return record['snapshot']
+    return token_key(record) or f"line:{line_number}"
+
+def load_checkpoint(output_path: str) -> Dict[str, str]:
+    """
+    Status by id of the records already in the output. A line cut short by
+    a killed run is truncated away so appending starts on a clean line.
+    """
+    done: Dict[str, str] = {}
+    if not os.path.exists(output_path):
+        return done
+    valid_bytes = 0
+    with open(output_path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            done[result['id']] = result['status']
+            valid_bytes += len(line)
+    if valid_bytes != os.path.getsize(output_path):
+        with open(output_path, 'r+b') as f:
+            f.truncate(valid_bytes)
+    return done
+
+def _init_worker(quiet: bool):
+    global _analyzer
+    from services import nlp_worker
+    from services.social_pulse_analyzer import SocialPulseAnalyzer
+    if quiet:
+        # The analyzer logs with print(); keep worker output off the progress display
+        sys.stdout = open(os.devnull, 'w')
+    _analyzer = SocialPulseAnalyzer(nlp_processor=nlp_worker.processor)
+
+def analyze_record(task: Tuple[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Runs in a worker; failures become an error line rather than stopping the run."""
+    item_id, record = task
+    started = time.time()
+    result: Dict[str, Any] = {'id': item_id}
+    try:
+        budget = AnalysisBudget.from_request(record)
+        if record.get('snapshot'):
+            analysis = _analyzer.analyze_snapshot(record['snapshot'], budget)
+        else:
+            analysis = _analyzer.analyze_request(record, budget)
+        result['key'] = analysis.get('token_key')
+        result['status'] = 'success'
+        result['data'] = format_analysis_response(analysis, record.get('fields'))
+        if budget.requested:
+            result['quality'] = budget.report()
+    except Exception as e:
+        result['status'] = 'error'
+        result['message'] = str(e)
+    result['elapsed_ms'] = round((time.time() - started) * 1000, 1)
+    return result
+
+def invalid_reason(record: Dict[str, Any]) -> Optional[str]:
+    if 'error' in record:
+        return record['error']
+    if record.get('snapshot'):
+        return None if os.path.exists(record['snapshot']) else f"Snapshot not found: {record['snapshot']}"
+    validation = validate_request({key: value for key, value in record.items() if key != 'id'})
+    return None if validation['valid'] else validation['message']
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+class Progress:
+    """Throughput over this run and the ETA of the remaining records, printed every `interval` seconds."""
+
+    def __init__(self, total: int, interval: float):
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.errors = 0
+        self.started = time.time()
+        self._last_report = 0.0
+
+    def record(self, status: str):
+        self.done += 1
+        self.errors += status != 'success'
+        if time.time() - self._last_report >= self.interval:
+            self.report()
+
+    def report(self):
+        self._last_report = time.time()
+        elapsed = self._last_report - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = format_duration((self.total - self.done) / rate) if rate else '?'
+        print(f"{self.done}/{self.total} done, {self.errors} errors, {rate:.2f} tokens/s, "
+              f"elapsed {format_duration(elapsed)}, ETA {eta}", file=sys.stderr, flush=True)
+
+def pending_tasks(path: str, skip: Set[str], output) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Records still to analyze; invalid ones are written straight to the output."""
+    seen = set(skip)
+    for line_number, record in iter_records(path):
+        item_id = record_id(line_number, record)
+        if item_id in seen:
+            continue
+        seen.add(item_id)
+        reason = invalid_reason(record)
+        if reason is not None:
+            output.write({'id': item_id, 'status': 'error', 'message': reason, 'elapsed_ms': 0.0})
+            continue
+        yield item_id, record
+
+class ResultWriter:
+    """
+    Appends JSON lines, flushing each and fsyncing at most every
+    `sync_interval` seconds. Thread-safe: invalid records are written from
+    the pool's task feeding thread.
+    """
+
+    def __init__(self, path: str, progress: Progress, sync_interval: float):
+        self.file = open(path, 'a', encoding='utf-8')
+        self.progress = progress
+        self.sync_interval = sync_interval
+        self._last_sync = time.time()
+        self._lock = threading.Lock()
+
+    def write(self, result: Dict[str, Any]):
+        line = json.dumps(result, default=str) + '\n'
+        with self._lock:
+            self.file.write(line)
+            self.file.flush()
+            if time.time() - self._last_sync >= self.sync_interval:
+                os.fsync(self.file.fileno())
+                self._last_sync = time.time()
+            self.progress.record(result['status'])
+
+    def close(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('input', help="JSONL or CSV file of tokens")
+    parser.add_argument('output', help="JSONL results, also the checkpoint of a resumed run")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--quality-tier', choices=QUALITY_TIERS, help="Tier for records that do not set one")
+    parser.add_argument('--retry-errors', action='store_true', help="Analyze records that failed in an earlier run again")
+    parser.add_argument('--restart', action='store_true', help="Ignore and overwrite an existing output")
+    parser.add_argument('--progress-interval', type=float, default=10.0, help="Seconds between progress lines")
+    parser.add_argument('--sync-interval', type=float, default=5.0, help="Seconds between fsyncs of the output")
+    parser.add_argument('--verbose', action='store_true', help="Keep the analyzer's own logging")
+    args = parser.parse_args()
+
+    if args.restart and os.path.exists(args.output):
+        os.remove(args.output)
+    done = load_checkpoint(args.output)
+    skip = {item_id for item_id, status in done.items() if status == 'success' or not args.retry_errors}
+
+    total = len({record_id(line_number, record) for line_number, record in iter_records(args.input)} - skip)
+    print(f"{len(skip)} records already in {args.output}, {total} to analyze with {args.workers} workers",
+          file=sys.stderr, flush=True)
+    if not total:
+        return
+
+    progress = Progress(total, args.progress_interval)
+    output = ResultWriter(args.output, progress, args.sync_interval)
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['services.nlp_worker', 'services.social_pulse_analyzer'])
+    pool = context.Pool(processes=args.workers, initializer=_init_worker, initargs=(not args.verbose,))
+    try:
+        tasks = pending_tasks(args.input, skip, output)
+        if args.quality_tier:
+            tasks = ((item_id, dict({'quality_tier': args.quality_tier}, **record)) for item_id, record in tasks)
+        for result in pool.imap_unordered(analyze_record, tasks):
+            output.write(result)
+        pool.close()
+    except KeyboardInterrupt:
+        print("Interrupted, run the same command again to resume", file=sys.stderr, flush=True)
+        pool.terminate()
+    finally:
+        pool.join()
+        output.close()
+        progress.report()
+
+if __name__ == '__main__':
+    main()
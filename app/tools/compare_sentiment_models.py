@@ -0,0 +1,70 @@
+"""
+Compares the full precision and the int8 sentiment model on a local labeled
+sample (CSV with text and label columns, label positive or negative):
+accuracy, agreement between the two, latency per text and model size.
+Loads from a local model directory only, so it runs offline.
+
+    cd app && python -m tools.compare_sentiment_models --model-dir <dir> [sample.csv]
+"""
+import argparse
+import csv
+import json
+import os
+import time
+import numpy as np
+from config.settings import settings
+from services.nlp_processor import NLPProcessor
+from services.sentiment_model import MODEL_BACKENDS, load_sentiment_pipeline, model_size_bytes
+
+DEFAULT_SAMPLE = os.path.join(os.path.dirname(__file__), '..', 'data', 'sentiment_labeled_sample.csv')
+
+def evaluate(backend: str, model_dir: str, threads: int, texts, labels, repeat: int):
+    started = time.perf_counter()
+    classifier = load_sentiment_pipeline(backend, model_dir, threads)
+    load_seconds = time.perf_counter() - started
+
+    processor = NLPProcessor(model_threads=threads, sentiment_analyzer=classifier)
+    processor.transformer_scores(texts[:1])  # first call pays for lazy initialization
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        scores = processor.transformer_scores(texts)
+    seconds = (time.perf_counter() - started) / repeat
+
+    return scores, {
+        'backend': backend,
+        'accuracy': float(((scores > 0) == labels).mean()),
+        'ms_per_text': seconds / len(texts) * 1000,
+        'load_seconds': load_seconds,
+        'model_mb': model_size_bytes(classifier.model) / 2 ** 20
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('sample', nargs='?', default=DEFAULT_SAMPLE)
+    parser.add_argument('--model-dir', default=settings.SENTIMENT_MODEL_DIR, required=not settings.SENTIMENT_MODEL_DIR)
+    parser.add_argument('--threads', type=int, default=settings.SENTIMENT_THREADS or 1)
+    parser.add_argument('--repeat', type=int, default=5, help="Timed passes over the sample")
+    args = parser.parse_args()
+
+    with open(args.sample, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    texts = [row['text'] for row in rows]
+    labels = np.array([row['label'].strip().lower() == 'positive' for row in rows])
+
+    scores, reports = {}, []
+    for backend in MODEL_BACKENDS:
+        scores[backend], report = evaluate(backend, args.model_dir, args.threads, texts, labels, args.repeat)
+        reports.append(report)
+
+    print(json.dumps({
+        'texts': len(texts),
+        'threads': args.threads,
+        'backends': reports,
+        'label_agreement': float(((scores['fp32'] > 0) == (scores['int8'] > 0)).mean()),
+        'mean_absolute_difference': float(np.abs(scores['fp32'] - scores['int8']).mean()),
+        'speedup': reports[0]['ms_per_text'] / reports[1]['ms_per_text']
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
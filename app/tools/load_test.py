@@ -0,0 +1,435 @@
+"""
+Load-tests /api/analyze against stubbed upstreams and reports throughput,
+latency percentiles, error rates and the memory of every server process.
+
+    cd app && python -m tools.load_test --concurrency 16 --duration 60 [--workers 2 --threads 8]
+
+Each of --workers server processes builds the app with create_app, with
+Twitter, pump.fun, Reddit, Discord and Telegram replaced by the in-memory
+fakes of services/fake_clients answering after --upstream-latency-ms, so
+collection, NLP and the result store run for real and nothing leaves the
+machine. --concurrency clients post back-to-back, spread round-robin over
+the workers. A --contract-share of the requests are by contract_address,
+the rest by social_handles; a --hot-share of them reuse one of --hot-keys
+keys per kind (answered from the result store once analyzed), the others
+are never-seen keys that run a full analysis.
+
+A progress line goes to stderr every --report-interval seconds and the
+JSON summary (overall and per request class, plus the RSS/PSS timeline of
+each server and its NLP workers) to stdout or --output. To load a server
+started separately, e.g. with `python -m tools.load_test serve --port 5000`,
+pass --url http://127.0.0.1:5000 and --pid <server pid> for its memory.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Tuple
+from unittest import mock
+import numpy as np
+import requests
+from werkzeug.serving import BaseWSGIServer
+from utils.process_memory import memory_usage, process_name, process_tree
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CORPUS = os.path.join(APP_DIR, 'data', 'sentiment_reference.txt')
+
+TWITTER_TIMELINE_URL = "https://syndication.twitter.com/srv/timeline-profile/screen-name/"
+PUMP_FUN_URL = "https://pump.fun/coin/"
+
+BASE58 = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+PLATFORMS = ('twitter', 'reddit', 'discord', 'telegram')
+
+class GeneratedEntries(OrderedDict):
+    """
+    Builds an upstream entry the first time a name is looked up, so cold
+    keys find data too. Only the `capacity` most recent are kept, so the
+    stubs do not grow the server's memory over a long run.
+    """
+
+    def __init__(self, build: Callable[[Any], Any], capacity: int = 1024):
+        super().__init__()
+        self.build = build
+        self.capacity = capacity
+        self._lock = threading.Lock()
+
+    def __missing__(self, name):
+        value = self.build(name)
+        with self._lock:
+            self[name] = value
+            while len(self) > self.capacity:
+                self.popitem(last=False)
+        return value
+
+def load_corpus() -> List[str]:
+    with open(DEFAULT_CORPUS, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+def texts_for(name: str, corpus: List[str], count: int) -> List[str]:
+    """`count` corpus texts starting at an offset derived from `name`, so tokens differ but stay reproducible."""
+    start = zlib.crc32(str(name).encode('utf-8'))
+    return [corpus[(start + i) % len(corpus)] for i in range(count)]
+
+def install_stubbed_upstreams(latency: float, activities: int):
+    """
+    Replaces every upstream of the shared analyzer with fakes answering
+    after `latency` seconds, returning the patch of requests.get (Twitter
+    syndication and pump.fun pages) to start.
+    """
+    from services import social_pulse_analyzer
+    from services.fake_clients import (
+        FakeDiscordClient, FakeGuild, FakeRedditClient, FakeTelegramChannel, FakeTelegramClient,
+        FakeTextChannel, FakeWeb, make_messages, make_subreddit, pump_fun_page, twitter_timeline_page
+    )
+    from services.platform_analyzers import DiscordAnalyzer, TelegramAnalyzer
+
+    corpus = load_corpus()
+    # Spread the activities over the collectors' one-week window
+    spacing = timedelta(days=7) / (activities + 1)
+
+    def messages(name):
+        return make_messages(texts_for(name, corpus, activities), spacing=spacing)
+
+    def audience(name) -> int:
+        return 1000 + zlib.crc32(str(name).encode('utf-8')) % 100000
+
+    def page(url: str) -> str:
+        if url.startswith(TWITTER_TIMELINE_URL):
+            name = url[len(TWITTER_TIMELINE_URL):]
+            return twitter_timeline_page(messages(name), audience(name))
+        if url.startswith(PUMP_FUN_URL):
+            return pump_fun_page({'twitter': f"https://x.com/{url[len(PUMP_FUN_URL):][:15]}"})
+        raise KeyError(url)
+
+    analyzer = social_pulse_analyzer.get_analyzer()
+    analyzer.analyzers['reddit'].reddit = FakeRedditClient(GeneratedEntries(
+        lambda name: make_subreddit(texts_for(name, corpus, activities), audience(name), spacing=spacing)
+    ), latency)
+    analyzer.analyzers['discord'] = DiscordAnalyzer(client_factory=lambda: FakeDiscordClient(GeneratedEntries(
+        lambda guild_id: FakeGuild(guild_id, audience(guild_id), [FakeTextChannel('general', messages(guild_id), latency)])
+    )))
+    analyzer.analyzers['telegram'] = TelegramAnalyzer(client_factory=lambda: FakeTelegramClient(GeneratedEntries(
+        lambda name: FakeTelegramChannel(name, audience(name), messages(name))
+    ), latency))
+    return mock.patch('requests.get', FakeWeb(GeneratedEntries(page), latency))
+
+def load_app():
+    # create_app lives in app/__init__.py; its package is importable from the repository root
+    sys.path.append(os.path.dirname(APP_DIR))
+    from app import create_app
+    return create_app()
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Handles each connection on one of `threads` threads, like a threaded WSGI worker."""
+
+    def __init__(self, host: str, port: int, app, threads: int):
+        super().__init__(host, port, app)
+        # Set after the handler was configured, so connections stay HTTP/1.0 and
+        # an idle keep-alive client cannot hold on to a pool thread
+        self.multithread = True
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix='wsgi')
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+def serve(args):
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    with install_stubbed_upstreams(args.upstream_latency_ms / 1000, args.activities):
+        server = PooledWSGIServer(args.host, args.port, load_app(), args.threads)
+        print(f"Serving on http://{args.host}:{args.port} with {args.threads} threads", file=sys.stderr, flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+def contract_address(rng: random.Random) -> str:
+    return ''.join(rng.choice(BASE58) for _ in range(40)) + 'pump'
+
+def social_handles(name: str, number: int, platforms: List[str]) -> Dict[str, str]:
+    handles = {
+        'twitter': name[:15],
+        'reddit': name[:21],
+        'discord': str(10 ** 17 + number),
+        'telegram': f"{name}_chat"[:32],
+    }
+    return {platform: handles[platform] for platform in platforms}
+
+class RequestMix:
+    """Request bodies by kind (contract, socials) and temperature (hot keys repeat, cold ones never do)."""
+
+    def __init__(self, contract_share: float, hot_share: float, hot_keys: int, platforms: List[str]):
+        self.contract_share = contract_share
+        self.hot_share = hot_share
+        self.platforms = platforms
+        self.hot = {
+            'contract': [{'contract_address': contract_address(random.Random(i))} for i in range(hot_keys)],
+            'socials': [{'social_handles': social_handles(f"hot{i:04d}coin", i, platforms)} for i in range(hot_keys)],
+        }
+        self._cold = 0
+        self._lock = threading.Lock()
+
+    def next(self, rng: random.Random) -> Tuple[str, Dict[str, Any]]:
+        kind = 'contract' if rng.random() < self.contract_share else 'socials'
+        if self.hot[kind] and rng.random() < self.hot_share:
+            return f"{kind}/hot", rng.choice(self.hot[kind])
+        with self._lock:
+            self._cold += 1
+            number = self._cold
+        if kind == 'contract':
+            return f"{kind}/cold", {'contract_address': contract_address(rng)}
+        return f"{kind}/cold", {'social_handles': social_handles(f"cold{number:07d}x", number, self.platforms)}
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {}
+    values = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'p50': round(float(p50), 1),
+        'p95': round(float(p95), 1),
+        'p99': round(float(p99), 1),
+        'max': round(float(values.max()), 1),
+        'mean': round(float(values.mean()), 1),
+    }
+
+def summarize(samples: List[Tuple[float, float, str, str]], seconds: float) -> Dict[str, Any]:
+    """Totals of (started, latency, request class, status) samples over `seconds` of load."""
+    statuses = Counter(status for _, _, _, status in samples)
+    errors = sum(count for status, count in statuses.items() if status != '200')
+    return {
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / seconds, 2) if seconds > 0 else 0.0,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+        'statuses': dict(statuses),
+        'latency_ms': percentiles([latency for _, latency, _, _ in samples]),
+    }
+
+class MemorySampler:
+    """Samples the memory of each server process and its descendants every `interval` seconds."""
+
+    def __init__(self, pids: List[int], interval: float):
+        self.pids = pids
+        self.interval = interval
+        self.started = time.time()
+        self.timeline: List[Dict[str, Any]] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='memory-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            self.sample()
+            if self._stop.wait(self.interval):
+                return
+
+    def sample(self) -> Dict[str, Any]:
+        processes = []
+        for server in self.pids:
+            for pid in process_tree(server):
+                usage = memory_usage(pid)
+                if usage is None:
+                    continue
+                processes.append(dict(
+                    {'pid': pid, 'server': server, 'name': process_name(pid)},
+                    **{f"{kind}_mb": round(value / 2 ** 20, 1) for kind, value in usage.items()}
+                ))
+        entry = {
+            't': round(time.time() - self.started, 1),
+            'processes': processes,
+            'total_rss_mb': round(sum(process['rss_mb'] for process in processes), 1),
+        }
+        if processes and all('pss_mb' in process for process in processes):
+            entry['total_pss_mb'] = round(sum(process['pss_mb'] for process in processes), 1)
+        self.timeline.append(entry)
+        return entry
+
+    def peaks(self) -> Dict[str, Any]:
+        peak: Dict[int, Dict[str, Any]] = {}
+        for entry in self.timeline:
+            for process in entry['processes']:
+                current = peak.setdefault(process['pid'], {'pid': process['pid'], 'name': process['name']})
+                for kind in ('rss_mb', 'pss_mb', 'uss_mb'):
+                    if kind in process:
+                        current[kind] = max(current.get(kind, 0.0), process[kind])
+        totals = [entry.get('total_pss_mb', entry['total_rss_mb']) for entry in self.timeline]
+        return {'processes': list(peak.values()), 'total_mb': max(totals, default=0.0)}
+
+def start_servers(args) -> Tuple[List[str], List[subprocess.Popen]]:
+    urls, servers = [], []
+    output = None if args.verbose else subprocess.DEVNULL
+    for worker in range(args.workers):
+        port = args.port + worker
+        command = [
+            sys.executable, '-m', 'tools.load_test', 'serve', '--port', str(port), '--threads', str(args.threads),
+            '--upstream-latency-ms', str(args.upstream_latency_ms), '--activities', str(args.activities)
+        ]
+        servers.append(subprocess.Popen(command, cwd=APP_DIR, stdout=output))
+        urls.append(f"http://127.0.0.1:{port}")
+
+    deadline = time.time() + args.startup_timeout
+    for url, server in zip(urls, servers):
+        while True:
+            if server.poll() is not None:
+                stop_servers(servers)
+                raise SystemExit(f"Server for {url} exited with code {server.returncode}")
+            if time.time() > deadline:
+                stop_servers(servers)
+                raise SystemExit(f"Server for {url} did not start within {args.startup_timeout:.0f}s")
+            try:
+                requests.get(f"{url}/api/trending", timeout=1)
+                break
+            except requests.RequestException:
+                time.sleep(0.5)
+    return urls, servers
+
+def stop_servers(servers: List[subprocess.Popen]):
+    for server in servers:
+        server.terminate()
+    for server in servers:
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+def run(args):
+    if args.url:
+        urls, servers, pids = [args.url.rstrip('/')], [], args.pid
+    else:
+        print(f"Starting {args.workers} server(s) with {args.threads} threads each", file=sys.stderr, flush=True)
+        urls, servers = start_servers(args)
+        pids = [server.pid for server in servers]
+
+    platforms = args.platforms.split(',')
+    mix = RequestMix(args.contract_share, args.hot_share, args.hot_keys, platforms)
+    samples: List[Tuple[float, float, str, str]] = []
+    stop = threading.Event()
+    memory = MemorySampler(pids, args.memory_interval)
+
+    def client(number: int):
+        rng = random.Random(args.seed + number)
+        session = requests.Session()
+        url = f"{urls[number % len(urls)]}/api/analyze"
+        while not stop.is_set():
+            request_class, body = mix.next(rng)
+            started = time.perf_counter()
+            try:
+                status = str(session.post(url, json=body, timeout=args.timeout).status_code)
+            except requests.RequestException as e:
+                status = type(e).__name__
+            samples.append((started, time.perf_counter() - started, request_class, status))
+
+    started = time.perf_counter()
+    memory.start()
+    clients = [threading.Thread(target=client, args=(number,), daemon=True) for number in range(args.concurrency)]
+    for thread in clients:
+        thread.start()
+    try:
+        reported = 0
+        while time.perf_counter() - started < args.duration:
+            time.sleep(min(args.report_interval, max(0.0, args.duration - (time.perf_counter() - started))))
+            window = samples[reported:]
+            reported += len(window)
+            progress = summarize(window, args.report_interval)
+            memory_now = memory.timeline[-1] if memory.timeline else {}
+            print(json.dumps({
+                't': round(time.perf_counter() - started, 1),
+                'done': reported,
+                'rps': progress['throughput_rps'],
+                'p50_ms': progress['latency_ms'].get('p50'),
+                'p99_ms': progress['latency_ms'].get('p99'),
+                'error_rate': progress['error_rate'],
+                'rss_mb': memory_now.get('total_rss_mb'),
+            }), file=sys.stderr, flush=True)
+    except KeyboardInterrupt:
+        print("Interrupted, summarizing the requests so far", file=sys.stderr, flush=True)
+    finally:
+        stop.set()
+        for thread in clients:
+            thread.join(args.timeout)
+        memory.stop()
+        memory.sample()
+        stop_servers(servers)
+
+    measured = [sample for sample in samples if sample[0] - started >= args.warmup]
+    seconds = max(0.0, min(args.duration, time.perf_counter() - started) - args.warmup)
+    classes = sorted({request_class for _, _, request_class, _ in measured})
+    summary = {
+        'config': {name: value for name, value in vars(args).items() if name != 'command'},
+        'duration_s': round(seconds, 1),
+        **summarize(measured, seconds),
+        'by_class': {
+            request_class: summarize([sample for sample in measured if sample[2] == request_class], seconds)
+            for request_class in classes
+        },
+        'memory': {'peak': memory.peaks(), 'timeline': memory.timeline},
+    }
+    text = json.dumps(summary, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('command', nargs='?', choices=('run', 'serve'), default='run',
+                        help="run drives the load (default), serve only starts one stubbed server")
+    parser.add_argument('--concurrency', type=int, default=8, help="Clients posting back-to-back")
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds of load")
+    parser.add_argument('--warmup', type=float, default=0.0, help="Seconds at the start left out of the summary")
+    parser.add_argument('--workers', type=int, default=1, help="Server processes, each with its own port")
+    parser.add_argument('--threads', type=int, default=8, help="Request threads per server process")
+    parser.add_argument('--port', type=int, default=5600, help="Port of the first server process")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--url', help="Load an already running server instead of starting one")
+    parser.add_argument('--pid', type=int, action='append', default=[], help="Process to sample memory of with --url")
+    parser.add_argument('--contract-share', type=float, default=0.3, help="Share of requests by contract_address")
+    parser.add_argument('--hot-share', type=float, default=0.8, help="Share of requests for a hot key")
+    parser.add_argument('--hot-keys', type=int, default=20, help="Hot keys per request kind")
+    parser.add_argument('--platforms', default='twitter,reddit', help=f"Handles of social_handles requests, of {','.join(PLATFORMS)}")
+    parser.add_argument('--upstream-latency-ms', type=float, default=100.0, help="Latency of every stubbed upstream call")
+    parser.add_argument('--activities', type=int, default=50, help="Activities every stubbed upstream returns")
+    parser.add_argument('--timeout', type=float, default=60.0, help="Client timeout per request in seconds")
+    parser.add_argument('--report-interval', type=float, default=5.0, help="Seconds between progress lines")
+    parser.add_argument('--memory-interval', type=float, default=1.0, help="Seconds between memory samples")
+    parser.add_argument('--startup-timeout', type=float, default=300.0, help="Seconds to wait for the servers to load")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the JSON summary here instead of stdout")
+    parser.add_argument('--verbose', action='store_true', help="Keep the servers' own logging")
+    args = parser.parse_args()
+
+    unknown = set(args.platforms.split(',')) - set(PLATFORMS)
+    if unknown:
+        parser.error(f"Unsupported platforms: {', '.join(sorted(unknown))}")
+    if args.command == 'serve':
+        serve(args)
+    else:
+        run(args)
+
+if __name__ == '__main__':
+    main()
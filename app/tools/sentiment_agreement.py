@@ -0,0 +1,25 @@
+"""
+Compares the vectorized lexicon scorer with TextBlob on a reference corpus
+(one text per line) and prints correlation, error, label agreement and speed.
+
+    cd app && python -m tools.sentiment_agreement [corpus.txt] [--repeat N]
+"""
+import argparse
+import json
+import os
+from services.lexicon_scorer import agreement_report
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), '..', 'data', 'sentiment_reference.txt')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('corpus', nargs='?', default=DEFAULT_CORPUS)
+    parser.add_argument('--repeat', type=int, default=1, help="Repeat the corpus to time larger batches")
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding='utf-8') as f:
+        texts = [line.strip() for line in f if line.strip()]
+    print(json.dumps(agreement_report(texts * args.repeat), indent=2))
+
+if __name__ == '__main__':
+    main()
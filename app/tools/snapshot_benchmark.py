@@ -0,0 +1,142 @@
+"""
+Compares platform collection snapshots with JSON: file size, write time,
+full load time and the time to get the activity timestamps back.
+
+    cd app && python -m tools.snapshot_benchmark [platform_data.json] [--activities N]
+
+Without a file, a synthetic collection in the collectors' output shape is
+built from the sentiment reference corpus, N activities per platform.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from services.metrics_calculator import ACTIVITY_DATE_FORMAT, MetricsCalculator
+from services.snapshot import Snapshot, read_snapshot, write_snapshot
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), '..', 'data', 'sentiment_reference.txt')
+
+def synthetic_platform_data(activities: int) -> dict:
+    with open(DEFAULT_CORPUS, encoding='utf-8') as f:
+        texts = [line.strip() for line in f if line.strip()]
+    now = datetime.now(timezone.utc)
+    dates = [(now - timedelta(minutes=7 * i)).strftime(ACTIVITY_DATE_FORMAT) for i in range(activities)]
+
+    def text(i: int) -> str:
+        return texts[i % len(texts)]
+
+    return {
+        'twitter': {
+            'profile': {'followers_count': 52000, 'following_count': 310, 'tweet_count': 4100},
+            'recent_activity': [
+                {
+                    'text': text(i),
+                    'created_at': dates[i],
+                    'public_metrics': {'favorite_count': i * 3 % 500, 'retweet_count': i % 90,
+                                       'reply_count': i % 40, 'quote_count': i % 7},
+                }
+                for i in range(activities)
+            ],
+        },
+        'reddit': {
+            'community_info': {'subscribers': 18000, 'active_users': 240, 'created_utc': 1650000000.0},
+            'recent_activity': [
+                {
+                    'id': f't3_{i:06x}',
+                    'title': text(i + 1),
+                    'text': text(i + 2),
+                    'score': i % 300,
+                    'num_comments': i % 5,
+                    'created_utc': now.timestamp() - 420.0 * i,
+                    'comments': [{'text': text(i + j), 'score': j} for j in range(i % 5)],
+                }
+                for i in range(activities)
+            ],
+            'requests_used': 12,
+            'deadline_reached': False,
+        },
+        'discord': {
+            'server_info': {'member_count': 9000, 'presence_count': 1200, 'created_at': dates[-1]},
+            'recent_activity': [
+                {'content': text(i + 3), 'created_at': dates[i], 'reactions': i % 6, 'author': f'user{i % 50}'}
+                for i in range(activities)
+            ],
+            'deadline_reached': False,
+        },
+        'telegram': {
+            'channel_info': {'participants_count': 30000, 'created_at': dates[-1]},
+            'recent_activity': [
+                {'text': text(i + 4), 'date': dates[i], 'views': 1000 + i, 'forwards': i % 20}
+                for i in range(activities)
+            ],
+            'deadline_reached': False,
+        },
+    }
+
+def best_of(repeat: int, fn) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('platform_data', nargs='?', help="JSON file holding one platform_data dict")
+    parser.add_argument('--activities', type=int, default=500, help="Activities per platform of the synthetic collection")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.platform_data:
+        with open(args.platform_data, encoding='utf-8') as f:
+            platform_data = json.load(f)
+    else:
+        platform_data = synthetic_platform_data(args.activities)
+
+    calculator = MetricsCalculator()
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, 'platform_data.json')
+        snapshot_path = os.path.join(directory, 'platform_data.snap')
+
+        def write_json():
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(platform_data, f)
+
+        def load_json():
+            with open(json_path, encoding='utf-8') as f:
+                return json.load(f)
+
+        def json_timestamps():
+            return calculator.parse_timestamps(load_json())
+
+        def snapshot_timestamps():
+            with Snapshot.open(snapshot_path) as snapshot:
+                return {platform: float(np.nansum(snapshot.timestamps(platform))) for platform in snapshot.platforms}
+
+        json_write_ms = best_of(args.repeat, write_json)
+        snapshot_write_ms = best_of(args.repeat, lambda: write_snapshot(platform_data, snapshot_path))
+        if read_snapshot(snapshot_path) != load_json():
+            raise SystemExit("Snapshot does not round-trip this collection")
+
+        print(json.dumps({
+            'activities': sum(len(data.get('recent_activity', [])) for data in platform_data.values()),
+            'json': {
+                'bytes': os.path.getsize(json_path),
+                'write_ms': round(json_write_ms, 2),
+                'load_ms': round(best_of(args.repeat, load_json), 2),
+                'timestamps_ms': round(best_of(args.repeat, json_timestamps), 2),
+            },
+            'snapshot': {
+                'bytes': os.path.getsize(snapshot_path),
+                'write_ms': round(snapshot_write_ms, 2),
+                'load_ms': round(best_of(args.repeat, lambda: read_snapshot(snapshot_path)), 2),
+                'timestamps_ms': round(best_of(args.repeat, snapshot_timestamps), 2),
+            },
+        }, indent=2))
+
+if __name__ == '__main__':
+    main()
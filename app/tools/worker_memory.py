@@ -0,0 +1,126 @@
+"""
+Measures the memory each worker of a prefork deployment costs.
+
+    cd app && python -m tools.worker_memory --pid <server master pid>
+
+reports the RSS, PSS and USS of a running server's master and of every
+process under it (workers, and NLP pools if NLP_WORKERS is set).
+
+    cd app && python -m tools.worker_memory --simulate 4
+
+runs a master that forks 4 workers twice, once after preload() (as wsgi.py
+does) and once with every worker loading its own model, has each worker
+score a batch of the sentiment reference corpus, and compares both.
+
+RSS counts a shared page in every process mapping it, so summing it over
+workers overstates the footprint. PSS divides shared pages among the
+processes sharing them and sums to the real footprint; USS (private pages)
+is roughly what one more worker adds.
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+from typing import Any, Dict, List
+from utils.process_memory import memory_usage, process_name, process_tree
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CORPUS = os.path.join(APP_DIR, 'data', 'sentiment_reference.txt')
+
+def _row(pid: int) -> Dict[str, Any]:
+    usage = memory_usage(pid) or {}
+    row = {'pid': pid, 'name': process_name(pid)}
+    row.update({f"{kind}_mb": round(value / 2 ** 20, 1) for kind, value in usage.items()})
+    return row
+
+def _mean(rows: List[Dict[str, Any]], field: str) -> float:
+    values = [row[field] for row in rows if field in row]
+    return round(sum(values) / len(values), 1) if values else 0.0
+
+def measure(master: int) -> Dict[str, Any]:
+    workers = [_row(pid) for pid in process_tree(master) if pid != master]
+    report = {'master': _row(master), 'workers': workers}
+    processes = [report['master']] + workers
+    report['total_rss_mb'] = round(sum(row.get('rss_mb', 0.0) for row in processes), 1)
+    if all('pss_mb' in row for row in processes):
+        report['total_pss_mb'] = round(sum(row['pss_mb'] for row in processes), 1)
+        report['worker_pss_mb'] = _mean(workers, 'pss_mb')
+        report['worker_uss_mb'] = _mean(workers, 'uss_mb')
+    return report
+
+def run_master(mode: str, workers: int, batch: int):
+    """Forks `workers` workers, waits until each has scored `batch` texts, then prints measure() of this process."""
+    from services.nlp_processor import NLPProcessor
+    from services.preload import preload
+    from services.social_pulse_analyzer import get_analyzer
+
+    if mode == 'preload':
+        preload()
+    with open(DEFAULT_CORPUS, encoding='utf-8') as f:
+        texts = [line.strip() for line in f if line.strip()][:batch]
+
+    ready_read, ready_write = os.pipe()
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                sys.stdout = open(os.devnull, 'w')
+                if mode == 'preload':
+                    processor = get_analyzer().nlp_processor
+                else:
+                    processor = NLPProcessor()
+                    processor.warm_up()
+                processor.analyze_texts_sentiment(texts, scorer='fast')
+                os.write(ready_write, b'.')
+                signal.pause()
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    ready = 0
+    while ready < workers:
+        ready += len(os.read(ready_read, workers))
+    report = measure(os.getpid())
+    for pid in children:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+    print(json.dumps(report))
+
+def simulate(workers: int, batch: int) -> Dict[str, Any]:
+    results = {}
+    # Measured without NLP pools: each worker runs the model in-process
+    env = dict(os.environ, NLP_WORKERS='0')
+    for mode in ('preload', 'independent'):
+        completed = subprocess.run(
+            [sys.executable, '-m', 'tools.worker_memory', '--master', mode,
+             '--simulate', str(workers), '--batch', str(batch)],
+            cwd=APP_DIR, env=env, stdout=subprocess.PIPE, text=True, check=True
+        )
+        results[mode] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    summary = {'workers': workers, **results}
+    if all('total_pss_mb' in result for result in results.values()):
+        summary['saved_mb'] = round(results['independent']['total_pss_mb'] - results['preload']['total_pss_mb'], 1)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--pid', type=int, help="Master process of a running server")
+    target.add_argument('--simulate', type=int, metavar='WORKERS', help="Compare preloaded and independent workers")
+    parser.add_argument('--batch', type=int, default=200, help="Texts each simulated worker scores")
+    parser.add_argument('--master', choices=('preload', 'independent'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.master:
+        run_master(args.master, args.simulate, args.batch)
+    elif args.pid:
+        print(json.dumps(measure(args.pid), indent=2))
+    else:
+        print(json.dumps(simulate(args.simulate, args.batch), indent=2))
+
+if __name__ == '__main__':
+    main()
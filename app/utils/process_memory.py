@@ -0,0 +1,61 @@
+import os
+from typing import Dict, List, Optional
+
+def process_tree(pid: int) -> List[int]:
+    """`pid` and all of its descendants (e.g. NLP pool workers), read from /proc."""
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', encoding='utf-8') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name may contain spaces, the fields after its closing parenthesis do not
+        parent = int(stat.rsplit(')', 1)[1].split()[1])
+        children.setdefault(parent, []).append(int(entry))
+
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending.extend(children.get(current, []))
+    return tree
+
+def process_name(pid: int) -> str:
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            return f.read().replace(b'\x00', b' ').decode('utf-8', 'replace').strip()[:120]
+    except OSError:
+        return ''
+
+def memory_usage(pid: int) -> Optional[Dict[str, int]]:
+    """
+    Resident (rss), proportional (pss: shared pages divided among the
+    processes sharing them) and private (uss) bytes of a process, None once
+    it is gone. Summing pss over workers forked from one parent counts
+    copy-on-write pages once; pss and uss are missing on kernels without
+    /proc/<pid>/smaps_rollup.
+    """
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', encoding='utf-8') as f:
+            fields = {line.split(':')[0]: int(line.split()[1]) * 1024 for line in f if line.rstrip().endswith('kB')}
+        return {
+            'rss': fields['Rss'],
+            'pss': fields['Pss'],
+            'uss': fields['Private_Clean'] + fields['Private_Dirty'],
+        }
+    except FileNotFoundError:
+        if not os.path.exists(f'/proc/{pid}'):
+            return None
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        with open(f'/proc/{pid}/status', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return {'rss': int(line.split()[1]) * 1024}
+    except OSError:
+        return None
+    return None
@@ -1,37 +1,95 @@
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Iterator, Tuple, Optional, List, Set
 from services.social_pulse_analyzer import AnalysisResult
 
-def format_analysis_response(analysis: AnalysisResult) -> Dict[str, Any]:
-    return {
-        'overview': {
+# AnalysisResult fields each response section reads
+SECTION_FIELDS = {
+    'overview': ('sentiment_score', 'engagement_metrics', 'community_stats'),
+    'engagement_metrics': ('engagement_metrics',),
+    'community_insights': ('community_stats',),
+    'content_analysis': ('trending_topics',),
+    'risk_assessment': ('risk_factors', 'sentiment_score', 'engagement_metrics', 'community_stats'),
+}
+
+def format_analysis_response(analysis: AnalysisResult, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Formats the requested response sections (all of them by default). Only
+    the AnalysisResult fields those sections read get computed, and
+    independent ones are computed concurrently.
+    """
+    sections = requested_sections(fields)
+    analysis.compute(required_fields(sections))
+    return {section: format_section(section, analysis) for section in sections}
+
+def requested_sections(fields: Optional[List[str]] = None) -> List[str]:
+    if not fields:
+        return list(SECTION_FIELDS)
+    return [section for section in SECTION_FIELDS if section in fields]
+
+def required_fields(sections: Iterable[str]) -> Set[str]:
+    return {field for section in sections for field in SECTION_FIELDS[section]}
+
+def project_response(response: Dict[str, Any], fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    return {section: response[section] for section in requested_sections(fields) if section in response}
+
+def format_section(section: str, analysis: AnalysisResult) -> Dict[str, Any]:
+    if section == 'overview':
+        return {
             'sentiment_score': {
                 'value': analysis.sentiment_score,
                 'interpretation': interpret_sentiment(analysis.sentiment_score)
             },
             'community_health_score': calculate_health_score(analysis)
-        },
-        'engagement_metrics': {
+        }
+    elif section == 'engagement_metrics':
+        return {
             'total_engagement_rate': analysis.engagement_metrics['total_engagement_rate'],
             'activity_growth': analysis.engagement_metrics['activity_growth'],
             'platform_breakdown': analysis.engagement_metrics['platform_breakdown']
-        },
-        'community_insights': {
+        }
+    elif section == 'community_insights':
+        return {
             'total_followers': analysis.community_stats['total_followers'],
             'active_members': analysis.community_stats['active_members'],
             'growth_rate': analysis.community_stats['growth_rate'],
             'activity_distribution': analysis.community_stats['activity_distribution']
-        },
-        'content_analysis': {
+        }
+    elif section == 'content_analysis':
+        return {
             'trending_topics': analysis.trending_topics,
             #'key_discussions': extract_key_discussions(analysis),
             #'sentiment_distribution': analysis.detailed_analysis['sentiment_distribution']
-        },
-        'risk_assessment': {
+        }
+    elif section == 'risk_assessment':
+        return {
             'identified_risks': analysis.risk_factors,
             'risk_level': calculate_risk_level(analysis)
-        },
-        #'detailed_metrics': analysis.detailed_analysis
-    } 
+        }
+    #'detailed_metrics': analysis.detailed_analysis
+    raise ValueError(f"Unknown response section: {section}")
+
+def iter_ready_sections(analysis: AnalysisResult, completed_fields: Iterable[str],
+                        sections: Optional[List[str]] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Formats each response section as soon as every field it reads has been
+    reported in `completed_fields` (typically AnalysisResult.iter_compute).
+
+    Args:
+        analysis (AnalysisResult): The analysis being computed.
+        completed_fields (Iterable[str]): Names of AnalysisResult fields, in completion order.
+        sections (Optional[List[str]]): Sections to emit, all of them by default.
+
+    Returns:
+        Iterator[Tuple[str, Dict[str, Any]]]: (section name, formatted section) pairs.
+    """
+    completed = set()
+    pending = requested_sections(sections)
+
+    for field in completed_fields:
+        completed.add(field)
+        for section in list(pending):
+            if completed.issuperset(SECTION_FIELDS[section]):
+                pending.remove(section)
+                yield section, format_section(section, analysis)
 
 def interpret_sentiment(score: float) -> str:
     """
@@ -1,5 +1,7 @@
 from typing import Dict, Any, Union
+from urllib.parse import urlparse
 import re
+from config.settings import settings
 
 def validate_request(data: Dict[str, Any]) -> Dict[str, Union[bool, str]]:
     """
@@ -95,7 +97,128 @@ def validate_request(data: Dict[str, Any]) -> Dict[str, Union[bool, str]]:
                         'message': 'Invalid Telegram channel name format'
                     }
 
+    # Validate optional streaming mode
+    if 'stream' in data and data['stream'] not in ('ndjson', 'sse'):
+        return {
+            'valid': False,
+            'message': 'stream must be either "ndjson" or "sse"'
+        }
+
+    # Validate optional field projection
+    if 'fields' in data:
+        valid_fields = {'overview', 'engagement_metrics', 'community_insights', 'content_analysis', 'risk_assessment'}
+        if not isinstance(data['fields'], list) or not data['fields']:
+            return {
+                'valid': False,
+                'message': 'fields must be a non-empty list'
+            }
+
+        for field in data['fields']:
+            if field not in valid_fields:
+                return {
+                    'valid': False,
+                    'message': f'Unsupported field: {field}'
+                }
+
+    # Validate optional quality tier and latency budget
+    if 'quality_tier' in data and data['quality_tier'] not in ('fast', 'balanced', 'full'):
+        return {
+            'valid': False,
+            'message': 'quality_tier must be one of "fast", "balanced" or "full"'
+        }
+
+    if 'latency_budget_ms' in data:
+        budget = data['latency_budget_ms']
+        if isinstance(budget, bool) or not isinstance(budget, (int, float)) or budget <= 0:
+            return {
+                'valid': False,
+                'message': 'latency_budget_ms must be a positive number'
+            }
+
     # All validations passed
     return {
         'valid': True
-    } 
\ No newline at end of file
+    }
+
+def validate_subscription(data: Dict[str, Any]) -> Dict[str, Union[bool, str]]:
+    """
+    Validates the request body of a new pulse subscription.
+
+    Args:
+        data (Dict[str, Any]): The subscription payload to validate
+
+    Returns:
+        Dict[str, Union[bool, str]]: Validation result with 'valid' status and optional 'message'
+    """
+
+    if not isinstance(data, dict) or not data:
+        return {
+            'valid': False,
+            'message': 'Request body cannot be empty'
+        }
+
+    # Every token is given as an analysis request
+    tokens = data.get('tokens')
+    if not isinstance(tokens, list) or not tokens:
+        return {
+            'valid': False,
+            'message': 'tokens must be a non-empty list of {"contract_address": ...} or {"social_handles": {...}} objects'
+        }
+
+    if len(tokens) > settings.SUBSCRIPTION_MAX_TOKENS:
+        return {
+            'valid': False,
+            'message': f'A subscription can follow at most {settings.SUBSCRIPTION_MAX_TOKENS} tokens'
+        }
+
+    for token in tokens:
+        if not isinstance(token, dict):
+            return {
+                'valid': False,
+                'message': 'Every token must be an object'
+            }
+        result = validate_request({name: token[name] for name in ('contract_address', 'social_handles') if name in token})
+        if not result['valid']:
+            return result
+
+    # At least one condition to be notified on
+    if 'risk_level_change' in data and not isinstance(data['risk_level_change'], bool):
+        return {
+            'valid': False,
+            'message': 'risk_level_change must be a boolean'
+        }
+
+    if 'sentiment_delta' in data:
+        delta = data['sentiment_delta']
+        if isinstance(delta, bool) or not isinstance(delta, (int, float)) or not 0 < delta <= 2:
+            return {
+                'valid': False,
+                'message': 'sentiment_delta must be a number in (0, 2]'
+            }
+
+    if not data.get('risk_level_change', True) and 'sentiment_delta' not in data:
+        return {
+            'valid': False,
+            'message': 'Set risk_level_change or sentiment_delta'
+        }
+
+    # Webhooks may only target the configured hosts
+    if 'webhook_url' in data:
+        url = data['webhook_url']
+        parsed = urlparse(url) if isinstance(url, str) else None
+        if parsed is None or parsed.scheme not in ('http', 'https') or not parsed.hostname:
+            return {
+                'valid': False,
+                'message': 'webhook_url must be an http(s) URL'
+            }
+
+        allowed_hosts = {host.strip().lower() for host in settings.SUBSCRIPTION_WEBHOOK_HOSTS.split(',') if host.strip()}
+        if '*' not in allowed_hosts and parsed.hostname.lower() not in allowed_hosts:
+            return {
+                'valid': False,
+                'message': f'webhook_url host must be one of: {", ".join(sorted(allowed_hosts))}'
+            }
+
+    return {
+        'valid': True
+    }
\ No newline at end of file
@@ -0,0 +1,31 @@
+"""
+WSGI entry point for production servers:
+
+    cd app && gunicorn --preload --workers 4 --threads 8 wsgi:app
+
+With PRELOAD=true (the default), importing this module loads the sentiment
+model and lexicons (services/preload.py), so the server has to import it
+once in the master before forking its workers: gunicorn --preload, or uWSGI
+without lazy-apps. Workers then share the weights copy-on-write and start
+their own threads and connections after the fork; only the worker holding
+WATCHLIST_LOCK_FILE runs the watchlist refresher. Set PRELOAD=false for a
+server that imports the app in every worker.
+
+With NLP_WORKERS > 0 each worker starts its own NLP pool holding a copy of
+the model; behind a prefork server keep NLP_WORKERS=0 and scale with the
+server's workers. `python -m tools.worker_memory` measures what a worker
+costs.
+"""
+import os
+import sys
+from config.settings import settings
+from services import preload
+
+if settings.PRELOAD:
+    preload.preload()
+
+# create_app lives in app/__init__.py; its package is importable from the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app  # noqa: E402
+
+app = create_app(start_background=not settings.PRELOAD)
@@ -0,0 +1,114 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from services.social_pulse_analyzer import AnalysisResult
+from tools import bulk_analyze
+from tools.bulk_analyze import Progress, ResultWriter, analyze_record, iter_records, load_checkpoint, pending_tasks
+
+ADDRESS = 'So11111111111111111111111111111111111111112'
+
+class StubAnalyzer:
+    def __init__(self):
+        self.requests = []
+
+    def analyze_request(self, record, budget):
+        self.requests.append(record)
+        if record.get('social_handles', {}).get('reddit') == 'broken_sub':
+            raise RuntimeError('reddit is down')
+        return AnalysisResult(initial={'token_key': bulk_analyze.token_key(record)}, sentiment_score=0.4)
+
+class ListOutput:
+    def __init__(self):
+        self.results = []
+
+    def write(self, result):
+        self.results.append(result)
+
+class TestBulkAnalyze(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name, content=None):
+        path = os.path.join(self.directory.name, name)
+        if content is not None:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content)
+        return path
+
+    def test_records_from_jsonl_and_csv(self):
+        jsonl = self.path('tokens.jsonl', '{"contract_address": "%s"}\n\nnot json\n[1]\n' % ADDRESS)
+        records = list(iter_records(jsonl))
+        self.assertEqual([line for line, _ in records], [1, 3, 4])
+        self.assertEqual(records[0][1], {'contract_address': ADDRESS})
+        self.assertIn('Invalid JSON', records[1][1]['error'])
+        self.assertEqual(records[2][1], {'error': 'Expected a JSON object'})
+
+        csv_path = self.path('tokens.csv', 'id,twitter,reddit,latency_budget_ms\nt1,token, tokensub ,300\nt2,,,abc\n')
+        rows = list(iter_records(csv_path))
+        self.assertEqual(rows[0], (2, {'id': 't1', 'social_handles': {'twitter': 'token', 'reddit': 'tokensub'},
+                                       'latency_budget_ms': 300.0}))
+        self.assertIn('Invalid row', rows[1][1]['error'])
+
+    def test_checkpoint_drops_a_line_cut_short(self):
+        output = self.path('results.jsonl', '{"id": "a", "status": "success"}\n{"id": "b", "status": "error"}\n{"id": "c", "sta')
+
+        self.assertEqual(load_checkpoint(output), {'a': 'success', 'b': 'error'})
+        with open(output, encoding='utf-8') as f:
+            self.assertTrue(f.read().endswith('"error"}\n'))
+        self.assertEqual(load_checkpoint(self.path('missing.jsonl')), {})
+
+    def test_pending_tasks_skip_done_and_repeated_ids_and_report_invalid_ones(self):
+        tokens = self.path('tokens.jsonl', '\n'.join(json.dumps(record) for record in [
+            {'id': 'done', 'contract_address': ADDRESS},
+            {'id': 'new', 'social_handles': {'twitter': 'token'}},
+            {'id': 'new', 'social_handles': {'twitter': 'again'}},
+            {'id': 'bad', 'social_handles': {'myspace': 'token'}},
+            {'snapshot': self.path('missing.snap')},
+        ]) + '\n')
+        output = ListOutput()
+
+        tasks = list(pending_tasks(tokens, {'done'}, output))
+
+        self.assertEqual(tasks, [('new', {'id': 'new', 'social_handles': {'twitter': 'token'}})])
+        self.assertEqual([(result['id'], result['status']) for result in output.results],
+                         [('bad', 'error'), (self.path('missing.snap'), 'error')])
+        self.assertIn('Unsupported platform', output.results[0]['message'])
+
+    def test_interrupted_run_resumes_where_it_stopped(self):
+        records = [{'id': f't{i}', 'social_handles': {'reddit': 'broken_sub' if i == 1 else f'token_{i}'}} for i in range(4)]
+        tokens = self.path('tokens.jsonl', '\n'.join(map(json.dumps, records)) + '\n')
+        output_path = self.path('results.jsonl')
+        analyzer = StubAnalyzer()
+
+        def run(skip, limit=None):
+            writer = ResultWriter(output_path, Progress(len(records), interval=3600), sync_interval=0)
+            with mock.patch.object(bulk_analyze, '_analyzer', analyzer), \
+                    mock.patch.object(bulk_analyze, 'format_analysis_response',
+                                      lambda analysis, fields: {'sentiment': analysis.sentiment_score}):
+                for count, task in enumerate(pending_tasks(tokens, skip, writer)):
+                    if count == limit:
+                        break
+                    writer.write(analyze_record(task))
+            writer.close()
+
+        # The first run is stopped after two records, one of which fails
+        run(set(), limit=2)
+        done = load_checkpoint(output_path)
+        self.assertEqual(done, {'t0': 'success', 't1': 'error'})
+
+        run({item_id for item_id, status in done.items() if status == 'success'})
+
+        with open(output_path, encoding='utf-8') as f:
+            results = [json.loads(line) for line in f]
+        self.assertEqual([(result['id'], result['status']) for result in results],
+                         [('t0', 'success'), ('t1', 'error'), ('t1', 'error'), ('t2', 'success'), ('t3', 'success')])
+        self.assertEqual(results[0]['data'], {'sentiment': 0.4})
+        self.assertEqual(results[0]['key'], 'reddit:token_0')
+        self.assertEqual(results[1]['message'], 'reddit is down')
+        self.assertEqual([record['id'] for record in analyzer.requests], ['t0', 't1', 't1', 't2', 't3'])
+
+if __name__ == '__main__':
+    unittest.main()
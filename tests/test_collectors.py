@@ -0,0 +1,111 @@
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+from config.settings import settings
+from services.event_loop import BackgroundEventLoop
+from services.platform_analyzers import DiscordAnalyzer, RedditAnalyzer, TelegramAnalyzer
+from services.fake_clients import (
+    FakeDiscordClient, FakeGuild, FakeRedditClient, FakeTextChannel,
+    FakeTelegramClient, FakeTelegramChannel, make_messages, make_subreddit
+)
+
+class CountingChannel(FakeTextChannel):
+    active = 0
+    peak = 0
+
+    async def history(self, limit=100, after=None):
+        CountingChannel.active += 1
+        CountingChannel.peak = max(CountingChannel.peak, CountingChannel.active)
+        try:
+            async for message in super().history(limit=limit, after=after):
+                yield message
+        finally:
+            CountingChannel.active -= 1
+
+class TestAsyncCollectors(unittest.TestCase):
+    def setUp(self):
+        self.loop = BackgroundEventLoop(name='test-collector-loop')
+
+    def tearDown(self):
+        self.loop.stop()
+
+    def test_discord_collects_recent_messages_with_bounded_reads(self):
+        now = datetime.now(timezone.utc)
+        channels = [
+            CountingChannel(f'channel-{i}', make_messages(['gm', 'wagmi', 'old news'], start=now, spacing=timedelta(days=4)), latency=0.01)
+            for i in range(settings.COLLECTOR_MAX_CONCURRENT_READS * 2)
+        ]
+        client = FakeDiscordClient({42: FakeGuild(42, member_count=5000, channels=channels)})
+        analyzer = DiscordAnalyzer(client_factory=lambda: client)
+
+        first = self.loop.run(analyzer.collect_data('42'), timeout=5)
+        second = self.loop.run(analyzer.collect_data('42'), timeout=5)
+
+        self.assertEqual(first['server_info']['member_count'], 5000)
+        # 'old news' is eight days old and falls outside the window
+        self.assertEqual(len(first['recent_activity']), 2 * len(channels))
+        self.assertEqual(len(second['recent_activity']), 2 * len(channels))
+        self.assertEqual(client.login_count, 1)
+        self.assertLessEqual(CountingChannel.peak, settings.COLLECTOR_MAX_CONCURRENT_READS)
+
+    def test_telegram_reuses_session_and_reads_count_from_metadata(self):
+        now = datetime.now(timezone.utc)
+        channel = FakeTelegramChannel('solana_token', 12000, make_messages(['a', 'b', 'c', 'd'], start=now, spacing=timedelta(days=3)))
+        client = FakeTelegramClient({'solana_token': channel})
+        analyzer = TelegramAnalyzer(client_factory=lambda: client)
+
+        for _ in range(3):
+            data = self.loop.run(analyzer.collect_data('solana_token'), timeout=5)
+
+        self.assertEqual(data['channel_info']['participants_count'], 12000)
+        self.assertEqual(len(data['recent_activity']), 3)
+        self.assertEqual(client.start_count, 1)
+        self.assertEqual(client.participant_fetches, 0)
+
+class TestRedditCollector(unittest.TestCase):
+    def setUp(self):
+        self.analyzer = RedditAnalyzer()
+
+    def collect(self, subreddit, deadline=None):
+        client = FakeRedditClient({'solana': subreddit})
+        self.analyzer.reddit = client
+        return client, self.analyzer.collect_data('solana', deadline=deadline)
+
+    @mock.patch.object(settings, 'REDDIT_PAGE_SIZE', 10)
+    def test_pages_until_the_weekly_window_boundary(self):
+        # Twelve hours apart, so 14 of the 30 posts fall inside the week
+        client, data = self.collect(make_subreddit([f'post {i}' for i in range(30)], 900, spacing=timedelta(hours=12)))
+
+        self.assertEqual(len(data['recent_activity']), 14)
+        self.assertEqual(data['community_info']['subscribers'], 900)
+        # about.json plus two pages of /new; the third page is never read
+        self.assertEqual(data['requests_used'], 3)
+        self.assertEqual(client.requests, 3)
+        self.assertFalse(data['deadline_reached'])
+
+    @mock.patch.object(settings, 'REDDIT_PAGE_SIZE', 5)
+    @mock.patch.object(settings, 'REDDIT_REQUEST_BUDGET', 3)
+    def test_stops_when_the_request_budget_is_spent(self):
+        client, data = self.collect(make_subreddit([f'post {i}' for i in range(40)], 900, spacing=timedelta(hours=1)))
+
+        self.assertEqual(client.requests, 3)
+        self.assertEqual(len(data['recent_activity']), 10)
+
+    def test_past_deadline_only_fetches_about(self):
+        client, data = self.collect(make_subreddit(['gm', 'wagmi'], 900), deadline=time.time() - 1)
+
+        self.assertEqual(client.requests, 1)
+        self.assertEqual(data['recent_activity'], [])
+        self.assertTrue(data['deadline_reached'])
+
+    @mock.patch.object(settings, 'REDDIT_COMMENT_MODE', 'recent')
+    def test_recent_comments_are_attached_from_the_subreddit_listing(self):
+        client, data = self.collect(make_subreddit(['gm', 'wagmi', 'lfg'], 900, comments_per_post=2))
+
+        self.assertEqual([len(post['comments']) for post in data['recent_activity']], [2, 2, 2])
+        # about.json, one page of /new and one page of /comments
+        self.assertEqual(client.requests, 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import time
+import unittest
+from unittest import mock
+from config.settings import settings
+from services.latency_budget import AnalysisBudget, seconds_left
+
+def message(content, created_utc):
+    return {'content': content, 'created_utc': created_utc}
+
+@mock.patch.object(settings, 'LATENCY_FAST_TIER_MS', 1000)
+@mock.patch.object(settings, 'LATENCY_BALANCED_TIER_MS', 5000)
+class TestAnalysisBudget(unittest.TestCase):
+    def test_tier_follows_the_latency_budget(self):
+        self.assertEqual(AnalysisBudget.from_request({'latency_budget_ms': 300}).tier, 'fast')
+        self.assertEqual(AnalysisBudget.from_request({'latency_budget_ms': 2000}).tier, 'balanced')
+        self.assertEqual(AnalysisBudget.from_request({'latency_budget_ms': 9000}).tier, 'full')
+        # An explicit tier wins over the budget
+        self.assertEqual(AnalysisBudget.from_request({'latency_budget_ms': 300, 'quality_tier': 'full'}).tier, 'full')
+
+    def test_requested_only_when_asked(self):
+        budget = AnalysisBudget.from_request({'contract_address': 'So1'})
+        self.assertEqual((budget.tier, budget.requested, budget.deadline), ('full', False, None))
+        self.assertTrue(AnalysisBudget.from_request({'quality_tier': 'balanced'}).requested)
+
+    @mock.patch.object(settings, 'LATENCY_COLLECTION_SHARE', 0.5)
+    def test_deadlines(self):
+        budget = AnalysisBudget(latency_budget_ms=2000, started=100.0)
+        self.assertEqual(budget.deadline, 102.0)
+        self.assertEqual(budget.collection_deadline, 101.0)
+        self.assertEqual(seconds_left(None, 5), 5)
+        self.assertIsNone(seconds_left(None))
+        self.assertEqual(seconds_left(time.time() - 1, 5), 0.0)
+
+    def test_fast_tier_skips_optional_stages(self):
+        budget = AnalysisBudget(tier='fast')
+        self.assertTrue(budget.skips('spam_detection'))
+        self.assertTrue(budget.skips('spam_detection'))
+        self.assertEqual(budget.degradations, ['spam_detection:skipped_for_fast_tier'])
+        self.assertFalse(AnalysisBudget(tier='balanced').skips('spam_detection'))
+
+    def test_optional_stages_are_skipped_after_the_deadline(self):
+        budget = AnalysisBudget(tier='full', latency_budget_ms=10, started=time.time() - 1)
+        self.assertTrue(budget.skips('keyword_extraction'))
+        self.assertFalse(budget.skips('sentiment_score'))
+        self.assertEqual(budget.report()['degradations'], ['keyword_extraction:skipped_after_deadline'])
+
+    @mock.patch.object(settings, 'FAST_TIER_MAX_ACTIVITIES', 3)
+    def test_cap_keeps_the_newest_activities_across_channels(self):
+        # Two channels concatenated, each newest first
+        activity = [message('a1', 500), message('a2', 100), message('b1', 400), message('b2', 300), message('b3', 50)]
+        platform_data = {'discord': {'recent_activity': activity}, 'twitter': {'recent_activity': activity[:2]}}
+        budget = AnalysisBudget(tier='fast')
+
+        capped = budget.cap_activities(platform_data)
+
+        self.assertEqual([entry['content'] for entry in capped['discord']['recent_activity']], ['a1', 'b1', 'b2'])
+        self.assertIs(capped['twitter'], platform_data['twitter'])
+        self.assertEqual(len(platform_data['discord']['recent_activity']), 5)
+        self.assertEqual(budget.degradations, ['discord:activities_capped_at_3'])
+
+    @mock.patch.object(settings, 'FAST_TIER_MAX_ACTIVITIES', 1)
+    def test_activities_without_a_time_are_dropped_first(self):
+        capped = AnalysisBudget(tier='fast').cap_activities({'discord': {'recent_activity': [{'content': 'x'}, message('y', 1)]}})
+        self.assertEqual(capped['discord']['recent_activity'], [message('y', 1)])
+
+    def test_full_tier_is_not_capped(self):
+        platform_data = {'discord': {'recent_activity': [message('a', 1)] * 1000}}
+        self.assertIs(AnalysisBudget().cap_activities(platform_data), platform_data)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import math
+import os
+import random
+import tempfile
+import time
+import unittest
+from unittest import mock
+import numpy as np
+from config.settings import settings
+from services.leaderboard import METRIC_NAMES, LeaderboardIndex, LeaderboardQuery
+
+SENTIMENT = METRIC_NAMES.index('sentiment')
+
+def response(sentiment=None, health=None, risk_level='Low Risk', platforms=('twitter',)):
+    return {
+        'overview': {'sentiment_score': {'value': sentiment}, 'community_health_score': health},
+        'engagement_metrics': {'platform_breakdown': {platform: {} for platform in platforms}},
+        'risk_assessment': {'risk_level': risk_level, 'identified_risks': []},
+    }
+
+def ranked(index, metric='sentiment', **query):
+    return [token['token'] for token in index.query(LeaderboardQuery(metric=metric, limit=500, **query))['tokens']]
+
+class TestLeaderboardIndex(unittest.TestCase):
+    def assert_sorted(self, index):
+        """Every metric's sorted arrays hold exactly the live rows with the metric, in value order."""
+        for metric in range(len(METRIC_NAMES)):
+            values, rows = index._sorted_values[metric], index._sorted_rows[metric]
+            self.assertTrue(np.all(np.diff(values) >= 0))
+            np.testing.assert_array_equal(values, index._values[rows, metric])
+            expected = [row for row in index._row_of.values() if not math.isnan(index._values[row, metric])]
+            self.assertEqual(sorted(rows.tolist()), sorted(expected))
+
+    def test_updates_shift_a_token_to_its_new_position(self):
+        index = LeaderboardIndex(path='')
+        for i, sentiment in enumerate([0.1, 0.5, 0.3, 0.9, 0.7]):
+            index.update(f'So{i}', response(sentiment))
+        self.assertEqual(ranked(index), ['So3', 'So4', 'So1', 'So2', 'So0'])
+
+        index.update('So0', response(0.8))
+        self.assertEqual(ranked(index), ['So3', 'So0', 'So4', 'So1', 'So2'])
+        index.update('So3', response(0.2))
+        self.assertEqual(ranked(index), ['So0', 'So4', 'So1', 'So2', 'So3'])
+        # Losing the metric takes the token out of that ranking only
+        index.update('So1', response(None, health=40))
+        self.assertEqual(ranked(index), ['So0', 'So4', 'So2', 'So3'])
+        self.assertEqual(ranked(index, 'health'), ['So1'])
+        self.assert_sorted(index)
+
+    def test_random_updates_keep_every_metric_sorted(self):
+        rng = random.Random(7)
+        index = LeaderboardIndex(path='')
+        for _ in range(500):
+            sentiment = rng.choice([None, 0.0, 0.5, rng.uniform(-1, 1)])
+            index.update(f'So{rng.randrange(40)}', response(sentiment, health=rng.choice([None, rng.uniform(0, 100)])))
+            if rng.random() < 0.05:
+                index.remove(f'So{rng.randrange(40)}')
+        self.assert_sorted(index)
+
+    def test_filters(self):
+        index = LeaderboardIndex(path='')
+        index.update('So1', response(0.5, risk_level='High Risk: rug'), time.time() - 7200)
+        index.update('So2', response(0.4, platforms=('reddit',)))
+        index.update('So3', response(0.3, risk_level='Medium Risk'))
+
+        self.assertEqual(ranked(index, risk_levels=[0, 1]), ['So2', 'So3'])
+        self.assertEqual(ranked(index, platform='reddit'), ['So2'])
+        self.assertEqual(ranked(index, max_age=3600), ['So2', 'So3'])
+        self.assertEqual(ranked(index, ranges={'sentiment': (0.35, None)}), ['So1', 'So2'])
+        self.assertEqual(ranked(index, 'risk', ascending=True), ['So2', 'So3', 'So1'])
+
+    @mock.patch.object(settings, 'LEADERBOARD_MAX_TOKENS', 3)
+    def test_least_recently_analyzed_token_is_evicted(self):
+        index = LeaderboardIndex(path='')
+        now = time.time()
+        index.update('So1', response(0.1), now - 30)
+        index.update('So2', response(0.2), now - 10)
+        index.update('So3', response(0.3), now - 20)
+        index.update('So4', response(0.4), now)
+
+        self.assertEqual(ranked(index), ['So4', 'So3', 'So2'])
+        # The freed row is reused
+        self.assertEqual(len(index._keys), 3)
+        self.assert_sorted(index)
+
+    def test_save_merges_with_other_processes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'leaderboard.npz')
+            now = time.time()
+            first, second = LeaderboardIndex(path=path), LeaderboardIndex(path=path)
+            first.update('So1', response(0.1), now - 10)
+            first.update('So2', response(0.2), now - 10)
+            first.update('So3', response(0.3), now - 10)
+            second.update('So2', response(0.9), now)
+            second.update('So3', response(0.0), now - 20)
+            second.update('So4', response(0.4), now)
+            first.save()
+            second.save()
+            first.remove('So1')
+            first.save()
+
+            # Keys and metric names are stored as plain strings, so the file loads without pickle
+            with np.load(path) as saved:
+                self.assertEqual((saved['keys'].dtype.kind, saved['metrics'].dtype.kind), ('U', 'U'))
+            reloaded = LeaderboardIndex(path=path)
+            self.assertEqual(ranked(reloaded), ['So2', 'So4', 'So3'])
+            self.assertEqual(reloaded.query(LeaderboardQuery(limit=1))['tokens'][0]['metrics']['sentiment'], 0.9)
+            self.assert_sorted(reloaded)
+
+            with mock.patch.object(settings, 'LEADERBOARD_MAX_TOKENS', 2):
+                self.assertEqual(ranked(LeaderboardIndex(path=path)), ['So2', 'So4'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import numpy as np
+from textblob import TextBlob
+from services.lexicon_scorer import LexiconSentimentScorer, agreement_report
+
+CORPUS = [
+    'great project',
+    'not good',
+    'very good',
+    'this is great!',
+    'not a good idea',
+    '',
+    'gm',
+    'the team is very bad and the chart is not great!!',
+    "I don't like it, terrible rug",
+    'Amazing community, really happy to be early',
+    'worst launch ever. sad',
+]
+
+class TestLexiconSentimentScorer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.scorer = LexiconSentimentScorer()
+
+    def test_matches_textblob(self):
+        reference = [TextBlob(text).sentiment.polarity for text in CORPUS]
+        np.testing.assert_allclose(self.scorer.score(CORPUS), reference, atol=1e-9)
+
+    def test_modifiers(self):
+        good, not_good, very_good, not_a_good, exclaimed = self.scorer.score(
+            ['good', 'not good', 'very good', 'not a good', 'good!']
+        )
+        self.assertAlmostEqual(not_good, -0.5 * good)
+        self.assertAlmostEqual(not_a_good, not_good)
+        self.assertAlmostEqual(very_good, min(1.0, good * 1.3))
+        self.assertAlmostEqual(exclaimed, min(1.0, good * 1.25))
+
+    def test_texts_do_not_leak_into_each_other(self):
+        # A negation or "!" at a text boundary only affects its own text
+        together = self.scorer.score(['not', 'good', 'bad', '!'])
+        apart = [self.scorer.score([text])[0] for text in ['not', 'good', 'bad', '!']]
+        np.testing.assert_allclose(together, apart)
+
+    def test_empty_batches(self):
+        self.assertEqual(self.scorer.score([]).shape, (0,))
+        np.testing.assert_array_equal(self.scorer.score(['', 'gm']), [0.0, 0.0])
+
+    def test_score_tokens_reuses_tokens(self):
+        tokens = self.scorer.tokenize(CORPUS)
+        np.testing.assert_array_equal(self.scorer.score_tokens(tokens), self.scorer.score(CORPUS))
+
+    def test_agreement_report(self):
+        report = agreement_report(CORPUS, self.scorer)
+        self.assertEqual(report['texts'], len(CORPUS))
+        self.assertAlmostEqual(report['mean_absolute_error'], 0.0)
+        self.assertEqual(report['label_agreement'], 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import math
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+import numpy as np
+import torch
+from config.settings import settings
+from services.nlp_processor import NLPProcessor, chunk_starts, special_token_ids
+
+CLS, SEP, PAD, GOOD, BAD, OTHER = 1, 2, 0, 10, 11, 12
+
+class WordTokenizer:
+    """One id per word, [CLS] ... [SEP] around a sequence, like a BERT tokenizer."""
+
+    model_max_length = 8
+
+    def __call__(self, texts, add_special_tokens=True, truncation=False, verbose=True):
+        def encode(text):
+            ids = [{'good': GOOD, 'bad': BAD}.get(word, OTHER) for word in text.split()]
+            return [CLS] + ids + [SEP] if add_special_tokens else ids
+        if isinstance(texts, str):
+            return {'input_ids': encode(texts)}
+        return {'input_ids': [encode(text) for text in texts]}
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+    def pad(self, encoded, return_tensors='pt'):
+        rows = encoded['input_ids']
+        width = max(map(len, rows))
+        return {
+            'input_ids': torch.tensor([row + [PAD] * (width - len(row)) for row in rows]),
+            'attention_mask': torch.tensor([[1] * len(row) + [0] * (width - len(row)) for row in rows]),
+        }
+
+class VotingModel:
+    """Positive when a chunk has more 'good' than 'bad' tokens, with a fixed confidence."""
+
+    config = SimpleNamespace(id2label={0: 'NEGATIVE', 1: 'POSITIVE'}, max_position_embeddings=512)
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, input_ids, attention_mask):
+        self.batches.append(input_ids.shape[0])
+        votes = (input_ids == GOOD).sum(dim=1) - (input_ids == BAD).sum(dim=1)
+        logits = torch.stack([-votes.sign() * 5.0, votes.sign() * 5.0], dim=1)
+        return SimpleNamespace(logits=logits)
+
+CONFIDENCE = math.exp(5) / (math.exp(5) + math.exp(-5))
+
+class TestChunkStarts(unittest.TestCase):
+    def test_short_and_empty_texts(self):
+        self.assertEqual(chunk_starts(0, 6, 2, 4), [])
+        self.assertEqual(chunk_starts(6, 6, 2, 4), [0])
+
+    def test_windows_overlap_and_reach_the_end(self):
+        self.assertEqual(chunk_starts(10, 6, 2, 4), [0, 4])
+        starts = chunk_starts(100, 6, 2, 4)
+        self.assertEqual(len(starts), 4)
+        self.assertEqual((starts[0], starts[-1]), (0, 94))
+
+    def test_special_token_ids(self):
+        self.assertEqual(special_token_ids(WordTokenizer()), ([CLS], [SEP]))
+
+@mock.patch.object(settings, 'SENTIMENT_CHUNK_TOKENS', 0)
+@mock.patch.object(settings, 'SENTIMENT_CHUNK_OVERLAP', 0)
+@mock.patch.object(settings, 'SENTIMENT_MAX_CHUNKS', 4)
+@mock.patch.object(settings, 'SENTIMENT_BATCH_SIZE', 2)
+class TestTransformerChunking(unittest.TestCase):
+    def setUp(self):
+        self.model = VotingModel()
+        self.processor = NLPProcessor(sentiment_analyzer=SimpleNamespace(tokenizer=WordTokenizer(), model=self.model))
+
+    def test_long_texts_are_scored_as_the_mean_of_their_chunks(self):
+        # Windows of 6 content tokens: good, good, good, bad
+        scores = self.processor.transformer_scores(['good ' * 18 + 'bad ' * 6, 'good', 'bad'])
+
+        np.testing.assert_allclose(scores, [CONFIDENCE / 2, CONFIDENCE, -CONFIDENCE])
+        self.assertEqual(self.model.batches, [2, 2, 2])
+
+    def test_chunks_past_the_deadline_are_not_scored(self):
+        scores = self.processor.transformer_scores(['good', 'bad'], deadline=time.time() - 1)
+        self.assertTrue(np.isnan(scores).all())
+        self.assertEqual(self.model.batches, [])
+
+    def test_full_mode_blends_transformer_and_lexicon_scores(self):
+        lexicon = self.processor.polarity_scores(['good'], 'fast')[0]
+        score = self.processor.analyze_texts_sentiment(['good', ''], 'fast', 'full')
+        # The empty text is left out of the mean
+        self.assertAlmostEqual(score, CONFIDENCE * 0.7 + lexicon * 0.3)
+
+    def test_lexicon_mode_skips_the_model(self):
+        score = self.processor.analyze_texts_sentiment(['good'], 'fast', 'lexicon')
+        self.assertAlmostEqual(score, self.processor.polarity_scores(['good'], 'fast')[0])
+        self.assertEqual(self.model.batches, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from config.settings import settings
+from services import preload
+
+class TestClaimWatchlist(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.lock_file = os.path.join(directory.name, 'watchlist.lock')
+        patcher = mock.patch.object(preload, '_watchlist_lock', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_only_the_first_claim_holds_the_lock(self):
+        with mock.patch.object(settings, 'WATCHLIST_LOCK_FILE', self.lock_file):
+            self.assertTrue(preload._claim_watchlist())
+            first = preload._watchlist_lock
+            # A sibling worker opens the file itself, like a second claim here
+            self.assertFalse(preload._claim_watchlist())
+            self.assertIs(preload._watchlist_lock, first)
+
+            # Once the holder exits, its replacement takes the lock over
+            first.close()
+            self.assertTrue(preload._claim_watchlist())
+            preload._watchlist_lock.close()
+
+    def test_every_worker_claims_without_a_lock_file(self):
+        with mock.patch.object(settings, 'WATCHLIST_LOCK_FILE', ''):
+            self.assertTrue(preload._claim_watchlist())
+            self.assertTrue(preload._claim_watchlist())
+        self.assertIsNone(preload._watchlist_lock)
+
+if __name__ == '__main__':
+    unittest.main()
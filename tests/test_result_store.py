@@ -0,0 +1,78 @@
+import time
+import unittest
+from services.result_store import ResultStore, token_key
+
+class TestTokenKey(unittest.TestCase):
+    def test_contract_address_wins_over_handles(self):
+        self.assertEqual(token_key({'contract_address': 'So1', 'social_handles': {'reddit': 'x'}}), 'So1')
+
+    def test_handles_are_sorted_and_lowercased(self):
+        first = token_key({'social_handles': {'twitter': 'Token', 'reddit': 'TokenSub'}})
+        second = token_key({'social_handles': {'reddit': 'tokensub', 'twitter': 'TOKEN'}})
+        self.assertEqual(first, second)
+        self.assertEqual(first, 'reddit:tokensub,twitter:token')
+
+class TestResultStore(unittest.TestCase):
+    def test_listeners_see_the_previous_result(self):
+        store = ResultStore(max_size=10, ttl=60)
+        calls = []
+        store.add_listener(lambda key, stored, previous: calls.append((key, stored.response, previous and previous.response)))
+
+        store.put('a', {'n': 1})
+        store.put('a', {'n': 2})
+
+        self.assertEqual(calls, [('a', {'n': 1}, None), ('a', {'n': 2}, {'n': 1})])
+
+    def test_a_failing_listener_does_not_stop_the_others(self):
+        store = ResultStore(max_size=10, ttl=60)
+        seen = []
+        store.add_listener(lambda key, stored, previous: 1 / 0)
+        store.add_listener(lambda key, stored, previous: seen.append(key))
+
+        store.put('a', {})
+
+        self.assertEqual(seen, ['a'])
+
+    def test_get_honours_max_age(self):
+        store = ResultStore(max_size=10, ttl=60)
+        store.put('a', {})
+        store._results['a'].computed_at -= 30
+
+        self.assertIsNotNone(store.get('a'))
+        self.assertIsNone(store.get('a', max_age=10))
+
+    def test_least_recently_stored_results_are_evicted_past_max_size(self):
+        store = ResultStore(max_size=3, ttl=60)
+        for key in 'abcd':
+            store.put(key, {})
+        store.put('b', {})
+        store.put('e', {})
+
+        self.assertEqual(store.keys(), ['d', 'b', 'e'])
+
+    def test_expired_results_are_dropped_on_put(self):
+        store = ResultStore(max_size=10, ttl=60)
+        store.put('old', {})
+        store.put('fresh', {})
+        store._results['old'].computed_at = time.time() - 120
+
+        store.put('new', {})
+
+        self.assertEqual(store.keys(), ['fresh', 'new'])
+
+    def test_pinned_results_are_kept(self):
+        store = ResultStore(max_size=1, ttl=60)
+        store.pin('watched')
+        store.put('watched', {})
+        store._results['watched'].computed_at = time.time() - 120
+        store.put('a', {})
+        store.put('b', {})
+
+        self.assertEqual(store.keys(), ['watched', 'b'])
+
+        store.unpin('watched')
+        store.put('c', {})
+        self.assertEqual(store.keys(), ['c'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+from unittest import mock
+from flask import Flask, g, jsonify
+from config.settings import settings
+from api import routes
+from api.routes import profiled, social_pulse
+from services.result_store import ResultStore
+from services.subscriptions import SubscriptionManager
+from services.watchlist import WatchlistRefresher
+
+TOKEN = 'profile-secret'
+
+@mock.patch.object(settings, 'PROFILE_TOKEN', TOKEN)
+@mock.patch.object(settings, 'PROFILE_DIR', '')
+class TestProfiled(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+
+        def probe():
+            self.calls.append(g.get('profiling', False))
+            g.stage_timings = {'sentiment_score': 0.012}
+            return jsonify({'status': 'success'})
+
+        app = Flask(__name__)
+        app.add_url_rule('/probe', view_func=profiled(probe), methods=['POST'])
+        self.client = app.test_client()
+
+    def test_requests_without_profile_pass_through(self):
+        response = self.client.post('/probe', headers={'X-Profile-Token': 'wrong'})
+        self.assertEqual(response.get_json(), {'status': 'success'})
+        self.assertEqual(self.calls, [False])
+
+    def test_profile_off_passes_through(self):
+        for url, headers in (('/probe?profile=0', {}), ('/probe?profile=false', {}), ('/probe', {'X-Profile': '0'})):
+            response = self.client.post(url, headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('profile', response.get_json())
+        self.assertEqual(self.calls, [False, False, False])
+
+    def test_unknown_mode_is_rejected(self):
+        response = self.client.post('/probe?profile=trace', headers={'X-Profile-Token': TOKEN})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.calls, [])
+
+    def test_missing_or_wrong_token_is_forbidden(self):
+        for headers in ({}, {'X-Profile-Token': 'wrong'}, {'X-Profile-Token': TOKEN[:-1]}):
+            response = self.client.post('/probe?profile=1', headers=headers)
+            self.assertEqual(response.status_code, 403)
+            self.assertEqual(response.get_json()['status'], 'error')
+        self.assertEqual(self.calls, [])
+
+    def test_profiling_is_off_without_a_configured_token(self):
+        with mock.patch.object(settings, 'PROFILE_TOKEN', ''):
+            response = self.client.post('/probe', headers={'X-Profile': 'sample', 'X-Profile-Token': ''})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.calls, [])
+
+    def test_authorized_request_gets_a_profile(self):
+        for mode, expected in (('1', 'sample'), ('cprofile', 'cprofile')):
+            response = self.client.post(f'/probe?profile={mode}', headers={'X-Profile-Token': TOKEN})
+            self.assertEqual(response.status_code, 200)
+            payload = response.get_json()
+            self.assertEqual(payload['status'], 'success')
+            self.assertEqual(payload['profile']['mode'], expected)
+            self.assertIn('stage_ms', payload['profile'])
+            self.assertIn('collapsed_stacks', payload['profile'])
+        self.assertEqual(self.calls, [True, True])
+
+class TestCreateSubscription(unittest.TestCase):
+    BODY = {'tokens': [{'contract_address': 'So11111111111111111111111111111111111111112'}]}
+
+    def setUp(self):
+        store = ResultStore()
+        self.watchlist = WatchlistRefresher(store=store)
+        patcher = mock.patch.object(routes, 'subscriptions', SubscriptionManager(store=store, watchlist=self.watchlist))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        app = Flask(__name__)
+        app.register_blueprint(social_pulse, url_prefix='/api')
+        self.client = app.test_client()
+
+    def test_warns_when_the_watchlist_is_disabled(self):
+        with mock.patch.object(settings, 'WATCHLIST_ENABLED', False):
+            response = self.client.post('/api/subscriptions', json=self.BODY)
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('WATCHLIST_ENABLED', response.get_json()['data']['warning'])
+
+        with mock.patch.object(settings, 'WATCHLIST_ENABLED', True):
+            response = self.client.post('/api/subscriptions', json=self.BODY)
+        self.assertNotIn('warning', response.get_json()['data'])
+
+    @mock.patch.object(settings, 'WATCHLIST_MAX_SIZE', 0)
+    def test_full_watchlist_refuses_the_subscription(self):
+        response = self.client.post('/api/subscriptions', json=self.BODY)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('watchlist is full', response.get_json()['message'])
+        self.assertEqual(self.watchlist.entries, {})
+
+if __name__ == '__main__':
+    unittest.main()
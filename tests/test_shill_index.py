@@ -0,0 +1,122 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+import numpy as np
+from config.settings import settings
+from services.shill_index import MinHasher, ShillIndex, shingle_hashes
+from services.text_normalizer import tokenize
+
+SHILL = tokenize('huge airdrop for early holders connect your wallet at the link before the snapshot ends tonight')
+OTHER_SHILL = tokenize('stealth launch just went live with locked liquidity and renounced contract so ape in now fam')
+
+def organic(i):
+    return tokenize(f'day {i} of building the community dashboard and the staking docs {i} are finally done for review')
+
+@mock.patch.object(settings, 'SHILL_MIN_TEXT_TOKENS', 8)
+@mock.patch.object(settings, 'SHILL_MIN_OTHER_TOKENS', 3)
+@mock.patch.object(settings, 'SHILL_SIMILARITY', 0.7)
+class TestShillIndex(unittest.TestCase):
+    def index(self, path=''):
+        return ShillIndex(path=path)
+
+    def test_minhash_estimates_jaccard(self):
+        hasher = MinHasher(256)
+        first, second = shingle_hashes(SHILL), shingle_hashes(SHILL[:-2] + ['tomorrow', 'morning'])
+        jaccard = len(np.intersect1d(first, second)) / len(np.union1d(first, second))
+        signatures = hasher.signatures([first, second])
+        self.assertAlmostEqual((signatures[0] == signatures[1]).mean(), jaccard, delta=0.1)
+
+    def test_copy_posted_for_other_tokens_is_flagged(self):
+        index = self.index()
+        for key in ('So1', 'So2', 'So3'):
+            index.observe(key, [SHILL, organic(key)])
+
+        # Small edits still match
+        report = index.observe('So4', [SHILL[:-1] + ['today'], OTHER_SHILL, organic('So4')])
+
+        self.assertEqual((report.texts_checked, report.cross_token_texts, report.other_tokens), (3, 1, 3))
+
+    def test_copies_within_one_token_do_not_count(self):
+        index = self.index()
+        for _ in range(3):
+            index.observe('So1', [SHILL])
+        self.assertEqual(index.observe('So1', [SHILL]).cross_token_texts, 0)
+        # Re-collected texts are indexed once per token
+        self.assertEqual(len(index), 1)
+
+    def test_short_texts_are_not_indexed(self):
+        index = self.index()
+        report = index.observe('So1', [['gm'], tokenize('wen moon ser'), SHILL])
+        self.assertEqual(report.texts_checked, 1)
+
+    @mock.patch.object(settings, 'SHILL_MAX_ENTRIES', 2)
+    def test_oldest_entries_are_evicted_past_max_entries(self):
+        index = self.index()
+        index.observe('So1', [SHILL])
+        index.observe('So2', [SHILL])
+        index.observe('So3', [OTHER_SHILL])
+
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index._matching_pairs(*self.lookup(index, SHILL))[1].tolist(), [index._token_ids['So2']])
+
+    @mock.patch.object(settings, 'SHILL_MAX_AGE', 60)
+    def test_expired_entries_are_evicted(self):
+        index = self.index()
+        index.observe('So1', [SHILL])
+        index._observed[:] = time.time() - 120
+        index.observe('So2', [OTHER_SHILL])
+        self.assertEqual(len(index), 1)
+
+    @mock.patch('services.shill_index.MERGE_PENDING_KEYS', 32)
+    def test_matches_survive_merging_pending_keys(self):
+        index = self.index()
+        for key in ('So1', 'So2', 'So3'):
+            index.observe(key, [SHILL] + [organic(f'{key}-{i}') for i in range(3)])
+
+        self.assertLess(len(index._pending_keys), 32)
+        self.assertGreater(len(index._keys), 0)
+        self.assertEqual(index.observe('So4', [SHILL]).other_tokens, 3)
+
+    def test_save_and_reload(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'shill.npz')
+            index = self.index(path)
+            for key in ('So1', 'So2', 'So3'):
+                index.observe(key, [SHILL])
+            index.save()
+
+            reloaded = self.index(path)
+            report = reloaded.observe('So4', [SHILL])
+
+        self.assertEqual((report.cross_token_texts, report.other_tokens), (1, 3))
+        self.assertEqual(len(reloaded), 4)
+
+    def test_saves_of_processes_sharing_the_file_are_merged(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'shill.npz')
+            first, second = self.index(path), self.index(path)
+            first.observe('So1', [SHILL])
+            first.observe('So2', [SHILL, organic(2)])
+            second.observe('So2', [SHILL])
+            second.observe('So3', [SHILL, OTHER_SHILL])
+            first.save()
+            second.save()
+
+            # Token keys are stored as plain strings, so the file loads without pickle
+            with np.load(path) as saved:
+                self.assertEqual(saved['tokens'].dtype.kind, 'U')
+            reloaded = self.index(path)
+            report = reloaded.observe('So4', [SHILL])
+
+        self.assertEqual(report.other_tokens, 3)
+        # So2's copy of SHILL is kept once
+        self.assertEqual(len(reloaded), 6)
+
+    def lookup(self, index, tokens):
+        signatures = index.hasher.signatures([shingle_hashes(tokens)])
+        return signatures, index._band_keys(signatures)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import math
+import os
+import tempfile
+import unittest
+import numpy as np
+from services.snapshot import Snapshot, SnapshotError, encode_snapshot, read_snapshot, write_snapshot
+
+PLATFORM_DATA = {
+    'twitter': {
+        'profile': {'followers_count': 12000, 'following_count': 300, 'verified': True, 'name': 'Token ☀'},
+        'recent_activity': [
+            {'text': 'gm $SOL', 'created_at': 'Mon Oct 19 10:00:00 +0000 2026',
+             'public_metrics': {'favorite_count': 10, 'retweet_count': 2}},
+            {'text': 'gm $SOL', 'created_at': 'not a date',
+             'public_metrics': {'favorite_count': 0, 'retweet_count': 0}, 'lang': None},
+        ],
+    },
+    'reddit': {
+        'community_info': {'subscribers': 5000, 'active_users': 40, 'created_utc': 1704067200.0},
+        'recent_activity': [
+            {'title': 'Launch', 'text': '', 'score': 5, 'num_comments': 2, 'created_utc': 1760868000.0,
+             'comments': [{'text': 'nice', 'score': 1}, {'text': 'wen', 'score': 2 ** 62}]},
+            {'title': 'Docs', 'text': 'live', 'score': -1, 'num_comments': 0, 'created_utc': 1760860000.5,
+             'comments': []},
+        ],
+        'requests_used': 3,
+    },
+    'discord': {
+        'server_info': {'member_count': 800},
+        # Mixed ints and floats fall back to JSON
+        'recent_activity': [{'content': 'hi', 'created_utc': 1760868000, 'reactions': 1.5},
+                            {'content': 'yo', 'created_utc': 1760868001, 'reactions': 2}],
+    },
+}
+
+class TestSnapshot(unittest.TestCase):
+    def test_round_trip(self):
+        snapshot = Snapshot(encode_snapshot(PLATFORM_DATA, {'token_key': 'So1'}))
+        self.assertEqual(snapshot.to_platform_data(), PLATFORM_DATA)
+        self.assertEqual(snapshot.meta, {'token_key': 'So1'})
+        self.assertEqual(snapshot.platforms, ['twitter', 'reddit', 'discord'])
+
+    def test_columns_are_views_into_the_buffer(self):
+        snapshot = Snapshot(encode_snapshot(PLATFORM_DATA))
+
+        favorites = snapshot.column('twitter', 'recent_activity', 'public_metrics', 'favorite_count')
+        self.assertEqual(favorites.tolist(), [10, 0])
+        self.assertFalse(favorites.flags.owndata)
+        self.assertEqual(snapshot.offsets('reddit', 'recent_activity', 'comments').tolist(), [0, 2, 2])
+        self.assertEqual(snapshot.texts('discord', 'content'), ['hi', 'yo'])
+
+        twitter_times = snapshot.timestamps('twitter')
+        self.assertFalse(math.isnan(twitter_times[0]))
+        self.assertTrue(math.isnan(twitter_times[1]))
+        np.testing.assert_array_equal(snapshot.timestamps('reddit'), [1760868000.0, 1760860000.5])
+
+    def test_strings_are_stored_once(self):
+        repeated = {'discord': {'recent_activity': [{'content': 'same shill text ' * 20}] * 100}}
+        single = {'discord': {'recent_activity': [{'content': 'same shill text ' * 20}]}}
+        self.assertLess(len(encode_snapshot(repeated)) - len(encode_snapshot(single)), 100 * 16)
+
+    def test_column_errors(self):
+        snapshot = Snapshot(encode_snapshot(PLATFORM_DATA))
+        with self.assertRaises(SnapshotError):
+            snapshot.column('twitter', 'missing')
+        with self.assertRaises(SnapshotError):
+            snapshot.column('twitter', 'profile')
+        with self.assertRaises(SnapshotError):
+            snapshot.offsets('twitter', 'profile', 'followers_count')
+
+    def test_rejects_other_files(self):
+        data = encode_snapshot(PLATFORM_DATA)
+        with self.assertRaises(SnapshotError):
+            Snapshot(b'{"json": true}')
+        with self.assertRaises(SnapshotError):
+            Snapshot(data[:8] + (99).to_bytes(4, 'little') + data[12:])
+        with self.assertRaises(SnapshotError):
+            Snapshot(b'ATSNAP')
+
+    def test_file_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'So1.snap')
+            size = write_snapshot(PLATFORM_DATA, path, {'token_key': 'So1'})
+            self.assertEqual(os.path.getsize(path), size)
+            self.assertEqual(read_snapshot(path), PLATFORM_DATA)
+            with Snapshot.open(path) as snapshot:
+                self.assertEqual(snapshot.column('reddit', 'recent_activity', 'score').tolist(), [5, -1])
+
+if __name__ == '__main__':
+    unittest.main()
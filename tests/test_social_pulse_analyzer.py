@@ -0,0 +1,122 @@
+import time
+import unittest
+from unittest import mock
+from config.settings import settings
+from services.latency_budget import AnalysisBudget
+from services.nlp_processor import NLPProcessor
+from services.social_pulse_analyzer import AnalysisResult, SocialPulseAnalyzer
+from services.stage_executor import Stage
+from services.text_normalizer import normalize_texts
+from services.trending import TrendingEngine
+
+class CountingStages:
+    """A small stage graph that records how often each stage runs."""
+
+    def __init__(self):
+        self.calls = {}
+        self.stages = {stage.name: stage for stage in [
+            Stage('texts', self.counted('texts', lambda platform_data: platform_data['texts']), ('platform_data',)),
+            Stage('engagement_metrics', self.counted('engagement_metrics', lambda platform_data: {'likes': platform_data['likes']}), ('platform_data',)),
+            Stage('sentiment_score', self.counted('sentiment_score', lambda texts: len(texts) / 10), ('texts',)),
+            Stage('trending_topics', self.counted('trending_topics', lambda texts: sorted(texts)), ('texts',)),
+        ]}
+
+    def counted(self, name, func):
+        def stage(**kwargs):
+            self.calls[name] = self.calls.get(name, 0) + 1
+            return func(**kwargs)
+        return stage
+
+    def result(self):
+        return AnalysisResult(stages=self.stages, initial={'platform_data': {'texts': ['gm', 'lfg'], 'likes': 3}})
+
+class TestAnalysisResult(unittest.TestCase):
+    def test_fields_are_computed_when_first_read(self):
+        graph = CountingStages()
+        result = graph.result()
+        self.assertEqual(graph.calls, {})
+        self.assertFalse(result.is_computed('sentiment_score'))
+
+        self.assertEqual(result.sentiment_score, 0.2)
+        self.assertEqual(result.sentiment_score, 0.2)
+
+        self.assertEqual(graph.calls, {'texts': 1, 'sentiment_score': 1})
+        self.assertFalse(result.is_computed('engagement_metrics'))
+
+    def test_shared_intermediates_run_once(self):
+        graph = CountingStages()
+        result = graph.result().compute(['sentiment_score', 'trending_topics'])
+
+        self.assertEqual(result.trending_topics, ['gm', 'lfg'])
+        self.assertEqual(graph.calls, {'texts': 1, 'sentiment_score': 1, 'trending_topics': 1})
+        self.assertEqual(set(result.stage_timings), {'texts', 'sentiment_score', 'trending_topics'})
+
+    def test_iter_compute_yields_only_the_requested_fields(self):
+        graph = CountingStages()
+        result = graph.result()
+        result.get('engagement_metrics')
+
+        yielded = list(result.iter_compute(['engagement_metrics', 'trending_topics', 'risk_factors']))
+
+        # Already computed fields come first; fields without a stage are None
+        self.assertEqual(yielded, ['engagement_metrics', 'trending_topics', 'risk_factors'])
+        self.assertIsNone(result.risk_factors)
+        self.assertNotIn('sentiment_score', graph.calls)
+
+    def test_values_passed_as_keywords_are_used_as_they_are(self):
+        graph = CountingStages()
+        result = AnalysisResult(stages=graph.stages, initial={'platform_data': {}}, sentiment_score=0.9)
+
+        self.assertEqual(result.sentiment_score, 0.9)
+        self.assertEqual(graph.calls, {})
+        self.assertIsNone(AnalysisResult().community_stats)
+
+    def test_unknown_fields_are_rejected(self):
+        with self.assertRaises(TypeError):
+            AnalysisResult(sentiment=0.5)
+
+class TestAnalyzerStages(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # The stages exercised here never reach the transformer
+        cls.analyzer = SocialPulseAnalyzer(nlp_processor=NLPProcessor(sentiment_analyzer=object()))
+
+    def setUp(self):
+        patcher = mock.patch('services.social_pulse_analyzer.trending_engine', TrendingEngine())
+        self.trending_engine = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def analysis(self):
+        platform_data = {'reddit': {
+            'community_info': {'subscribers': 5000, 'active_users': 100},
+            'recent_activity': [{
+                'title': 'Solana staking rewards', 'text': 'staking rewards are live', 'score': 3,
+                'num_comments': 0, 'created_utc': time.time(), 'comments': []
+            }]
+        }}
+        return self.analyzer.analyze_platform_data(platform_data, 'So1')
+
+    def test_trending_is_only_updated_when_trending_topics_are_wanted(self):
+        analysis = self.analysis()
+        self.assertEqual(self.trending_engine.status()['tracked_tokens'], 0)
+
+        analysis.compute(['community_stats'])
+        self.assertFalse(analysis.is_computed('trending_update'))
+        self.assertEqual(self.trending_engine.status()['tracked_tokens'], 0)
+
+        self.assertIn('staking rewards', analysis.trending_topics)
+        self.assertTrue(analysis.is_computed('trending_update'))
+    @mock.patch.object(settings, 'FAST_SENTIMENT_MIN_BATCH', 200)
+    def test_vectorized_lexicon_only_scores_budgeted_requests(self):
+        # TextBlob reads "don't love" as love (0.5), the vectorized lexicon negates it (-0.25)
+        normalized = normalize_texts(["I don't love it"])
+        unbudgeted = self.analyzer.score_sentiment(normalized, AnalysisBudget(tier='fast'))
+        budgeted = self.analyzer.score_sentiment(normalized, AnalysisBudget(tier='fast', requested=True))
+        self.assertAlmostEqual(unbudgeted, 0.5)
+        self.assertAlmostEqual(budgeted, -0.25)
+
+        with mock.patch.object(settings, 'FAST_SENTIMENT_MIN_BATCH', 1):
+            self.assertAlmostEqual(self.analyzer.score_sentiment(normalized, AnalysisBudget(tier='fast')), -0.25)
+
+if __name__ == '__main__':
+    unittest.main()
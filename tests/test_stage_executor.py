@@ -0,0 +1,85 @@
+import threading
+import time
+import unittest
+from services.stage_executor import Stage, StageExecutor, inline_stages
+
+class TestStageExecutor(unittest.TestCase):
+    def setUp(self):
+        self.executor = StageExecutor(max_workers=4)
+
+    def test_dependencies_run_first_and_only_needed_stages_run(self):
+        calls = []
+
+        def stage(name, func):
+            def run(**kwargs):
+                calls.append(name)
+                return func(**kwargs)
+            return Stage(name, run, tuple(func.__code__.co_varnames[:func.__code__.co_argcount]))
+
+        stages = {s.name: s for s in [
+            stage('texts', lambda platform_data: platform_data.split()),
+            stage('count', lambda texts: len(texts)),
+            stage('upper', lambda texts: [text.upper() for text in texts]),
+        ]}
+        values = {'platform_data': 'gm wagmi'}
+        timings = {}
+
+        self.executor.run(stages, ['count'], values, timings)
+
+        self.assertEqual(calls, ['texts', 'count'])
+        self.assertEqual(values['count'], 2)
+        self.assertNotIn('upper', values)
+        self.assertEqual(set(timings), {'texts', 'count'})
+
+        # Values already present are reused
+        self.executor.run(stages, ['upper'], values)
+        self.assertEqual(calls, ['texts', 'count', 'upper'])
+
+    def test_independent_stages_overlap(self):
+        barrier = threading.Barrier(2, timeout=2)
+
+        def wait_for_the_other(**kwargs):
+            # Deadlocks (and times out) unless both stages run at once
+            barrier.wait()
+            return True
+
+        stages = {
+            'a': Stage('a', wait_for_the_other, ('platform_data',)),
+            'b': Stage('b', wait_for_the_other, ('platform_data',)),
+        }
+        values = self.executor.run(stages, ['a', 'b'], {'platform_data': None})
+        self.assertTrue(values['a'] and values['b'])
+
+    def test_iter_run_yields_stages_as_they_finish(self):
+        def slow():
+            time.sleep(0.2)
+            return 'slow'
+
+        stages = {
+            'slow': Stage('slow', slow),
+            'fast': Stage('fast', lambda: 'fast'),
+        }
+        order = [name for name, _ in self.executor.iter_run(stages, ['slow', 'fast'], {})]
+        self.assertEqual(order, ['fast', 'slow'])
+
+    def test_inline_stages_run_on_the_calling_thread(self):
+        threads = []
+        stages = {'a': Stage('a', lambda: threads.append(threading.current_thread()))}
+        with inline_stages():
+            self.executor.run(stages, ['a'], {})
+        self.assertEqual(threads, [threading.current_thread()])
+
+    def test_errors(self):
+        def fail():
+            raise ValueError('stage failed')
+
+        with self.assertRaises(KeyError):
+            self.executor.run({}, ['missing'], {})
+        with self.assertRaises(ValueError):
+            self.executor.run({'a': Stage('a', fail)}, ['a'], {})
+        with self.assertRaises(KeyError):
+            # An input that is neither a stage nor an initial value
+            self.executor.run({'a': Stage('a', lambda platform_data: 1, ('platform_data',))}, ['a'], {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import json
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+import requests
+from config.settings import settings
+from services.result_store import ResultStore
+from services.subscriptions import SubscriptionManager, WebhookDispatcher, _Batch, pulse_change
+from services.watchlist import WatchlistRefresher
+
+ADDRESSES = [f'So{i}1111111111111111111111111111111111111112' for i in range(1, 5)]
+
+def response(sentiment, risk_level='Low Risk'):
+    return {'overview': {'sentiment_score': {'value': sentiment}}, 'risk_assessment': {'risk_level': risk_level}}
+
+def tokens(*addresses):
+    return [{'contract_address': address} for address in addresses]
+
+class TestSubscriptionManager(unittest.TestCase):
+    def setUp(self):
+        self.store = ResultStore(ttl=3600)
+        self.watchlist = WatchlistRefresher(store=self.store)
+        self.manager = SubscriptionManager(store=self.store, watchlist=self.watchlist)
+        self.store.add_listener(self.manager.on_result)
+
+    def test_pulse_change(self):
+        previous = self.store.put('So1', response(0.2))
+        stored = self.store.put('So1', response(-0.1, 'High Risk: rug'))
+        change = pulse_change('So1', stored, previous)
+
+        self.assertAlmostEqual(change.sentiment_delta, -0.3)
+        self.assertTrue(change.risk_level_changed)
+        event = json.loads(change.body)
+        self.assertEqual(event['risk_level'], {'previous': 'low', 'current': 'high', 'changed': True})
+        self.assertIsNone(pulse_change('So1', stored, None))
+
+    def test_changes_go_to_the_subscriptions_they_match(self):
+        risk = self.manager.create({'tokens': tokens(*ADDRESSES[:2])})
+        moves = self.manager.create({'tokens': tokens(ADDRESSES[0]), 'risk_level_change': False, 'sentiment_delta': 0.25})
+        self.assertEqual(set(self.watchlist.entries), set(ADDRESSES[:2]))
+
+        self.store.put(ADDRESSES[0], response(0.1))
+        self.store.put(ADDRESSES[0], response(0.2))
+        self.store.put(ADDRESSES[0], response(0.5))
+        self.store.put(ADDRESSES[0], response(0.5, 'Medium Risk'))
+        # Sentiment missing on one side never matches a delta
+        self.store.put(ADDRESSES[0], response(None, 'Medium Risk'))
+        self.store.put(ADDRESSES[2], response(0.9, 'High Risk'))
+
+        moved = self.manager.wait_for_events(moves, 0, 0)
+        self.assertEqual([sequence for sequence, _ in moved], [1])
+        self.assertEqual(json.loads(moved[0][1])['sentiment']['current'], 0.5)
+        self.assertEqual([json.loads(body)['risk_level']['current'] for _, body in self.manager.wait_for_events(risk, 0, 0)],
+                         ['medium'])
+
+        self.assertTrue(self.manager.remove(moves.id))
+        self.assertIsNone(self.manager.wait_for_events(moves, 0, 0))
+        # Still followed by the other subscription
+        self.assertIn(ADDRESSES[0], self.watchlist.entries)
+        self.manager.remove(risk.id)
+        self.assertEqual(self.watchlist.entries, {})
+
+    @mock.patch.object(settings, 'WATCHLIST_MAX_SIZE', 3)
+    def test_subscriptions_are_refused_once_the_watchlist_is_full(self):
+        self.watchlist.add({'contract_address': ADDRESSES[0]})
+        self.watchlist.add({'contract_address': ADDRESSES[1]}, source='learned')
+
+        # The learned entry makes room, and a token already watched takes none
+        self.manager.create({'tokens': tokens(ADDRESSES[0], ADDRESSES[2], ADDRESSES[3])})
+        self.assertEqual(set(self.watchlist.entries), {ADDRESSES[0], ADDRESSES[2], ADDRESSES[3]})
+
+        with self.assertRaises(ValueError):
+            self.manager.create({'tokens': tokens(ADDRESSES[1])})
+        self.assertEqual(self.manager.status()['subscriptions'], 1)
+        self.assertNotIn(ADDRESSES[1], self.watchlist.entries)
+        self.manager.create({'tokens': tokens(ADDRESSES[2])})
+
+@mock.patch.object(settings, 'SUBSCRIPTION_MAX_RETRIES', 2)
+@mock.patch.object(settings, 'SUBSCRIPTION_RETRY_BACKOFF', 0.01)
+@mock.patch.object(settings, 'SUBSCRIPTION_BATCH_WINDOW', 0.01)
+class TestWebhookDispatcher(unittest.TestCase):
+    URL = 'http://localhost:9000/hook'
+
+    def subscription(self):
+        manager = SubscriptionManager(store=ResultStore(), watchlist=WatchlistRefresher(store=ResultStore()))
+        return manager.create({'tokens': tokens(ADDRESSES[0]), 'webhook_url': self.URL})
+
+    def send(self, dispatcher, subscription, outcomes):
+        """Sends one batch with requests.post answering `outcomes` in turn, retries included."""
+        batch = _Batch(url=self.URL, items=[(subscription, '{"n": 1}'), (subscription, '{"n": 2}')])
+        with mock.patch('services.subscriptions.requests.post', side_effect=outcomes) as post:
+            dispatcher._send(batch)
+            while dispatcher._schedule:
+                _, _, scheduled = dispatcher._schedule.pop()
+                self.assertGreater(scheduled.due, time.time() - 1)
+                dispatcher._send(scheduled)
+        return post
+
+    def test_failed_batches_are_retried(self):
+        dispatcher, subscription = WebhookDispatcher(), self.subscription()
+        post = self.send(dispatcher, subscription, [requests.ConnectionError('refused'),
+                                                    SimpleNamespace(status_code=503), SimpleNamespace(status_code=204)])
+
+        self.assertEqual(post.call_count, 3)
+        self.assertEqual(json.loads(post.call_args.kwargs['data']), {'events': [{'n': 1}, {'n': 2}]})
+        self.assertEqual((dispatcher.retries, dispatcher.failures), (2, 0))
+        self.assertEqual((subscription.delivered, subscription.failed), (2, 0))
+
+    def test_batches_are_dropped_after_the_last_retry_or_a_client_error(self):
+        dispatcher, subscription = WebhookDispatcher(), self.subscription()
+        self.assertEqual(self.send(dispatcher, subscription, [SimpleNamespace(status_code=429)] * 3).call_count, 3)
+        self.assertEqual(self.send(dispatcher, subscription, [SimpleNamespace(status_code=404)]).call_count, 1)
+
+        self.assertEqual((dispatcher.retries, dispatcher.failures), (2, 2))
+        self.assertEqual((subscription.delivered, subscription.failed), (0, 4))
+
+    def test_events_are_batched_per_url(self):
+        dispatcher, subscription = WebhookDispatcher(), self.subscription()
+        with mock.patch('services.subscriptions.requests.post', return_value=SimpleNamespace(status_code=200)) as post:
+            for sequence in (1, 2, 3):
+                dispatcher.enqueue(subscription, sequence, '{}')
+            deadline = time.time() + 5
+            while subscription.delivered < 3 and time.time() < deadline:
+                time.sleep(0.01)
+
+        self.assertEqual(subscription.delivered, 3)
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual([event['sequence'] for event in json.loads(post.call_args.kwargs['data'])['events']], [1, 2, 3])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+from services.text_normalizer import normalize_text, normalize_texts, tokenize
+
+class TestNormalizeText(unittest.TestCase):
+    def test_drops_retweet_prefix_urls_handles_and_emoji(self):
+        self.assertEqual(
+            normalize_text('RT @whale: $SOL to the moon \U0001F680\U0001F680 https://t.co/abc via @news &amp; #solana'),
+            '$SOL to the moon via & #solana'
+        )
+
+    def test_keeps_emails_and_cashtags(self):
+        self.assertEqual(normalize_text('mail team@token.io about $bonk'), 'mail team@token.io about $bonk')
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("Don't sell $SOL, #Solana 2x!"), ['do', 'not', 'sell', '$sol', '#solana', '2x', '!'])
+
+class TestNormalizeTexts(unittest.TestCase):
+    def test_identical_texts_are_kept_once_with_counts(self):
+        normalized = normalize_texts([
+            'Solana pump',
+            'RT @bot: solana   PUMP https://x.co',
+            'https://x.co \U0001F680',
+            'solana dump',
+            'SOLANA pump!',
+        ])
+
+        self.assertEqual(normalized.texts, ['Solana pump', 'solana dump', 'SOLANA pump!'])
+        self.assertEqual(normalized.tokens, [['solana', 'pump'], ['solana', 'dump'], ['solana', 'pump', '!']])
+        self.assertEqual(normalized.counts, [2, 1, 1])
+        self.assertEqual(normalized.positions, [0, 0, -1, 1, 2])
+        self.assertEqual((len(normalized), normalized.total), (3, 4))
+
+    def test_empty(self):
+        normalized = normalize_texts(['', '   '])
+        self.assertEqual((len(normalized), normalized.total, normalized.positions), (0, 0, [-1, -1]))
+
+if __name__ == '__main__':
+    unittest.main()
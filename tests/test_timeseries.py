@@ -0,0 +1,146 @@
+import math
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+import numpy as np
+from config.settings import settings
+from services.leaderboard import METRIC_NAMES
+from services.timeseries import TimeseriesQuery, TimeseriesStore, _Rollup, _Window
+
+SENTIMENT = METRIC_NAMES.index('sentiment')
+HOUR = 3600
+
+def metrics(sentiment):
+    values = np.full(len(METRIC_NAMES), np.nan)
+    values[SENTIMENT] = sentiment
+    return values
+
+def window(capacity):
+    return _Window(capacity, {'time': ((), np.float64), 'value': ((), np.int64)})
+
+def insert(target, at):
+    row = target.insert(at)
+    if row is not None:
+        target.columns['value'][row] = int(at)
+    return row
+
+class TestWindow(unittest.TestCase):
+    def test_insert_keeps_rows_in_time_order(self):
+        target = window(8)
+        for at in (5, 1, 9, 3, 7):
+            insert(target, at)
+        self.assertEqual(target.view('time').tolist(), [1, 3, 5, 7, 9])
+        # Columns move with their row
+        self.assertEqual(target.view('value').tolist(), [1, 3, 5, 7, 9])
+        self.assertEqual(target.find(7), target.start + 3)
+        self.assertIsNone(target.find(4))
+
+    def test_insert_into_a_full_window_drops_the_oldest_row(self):
+        target = window(3)
+        for at in (10, 20, 30):
+            insert(target, at)
+
+        self.assertIsNone(insert(target, 5))
+        insert(target, 15)
+        self.assertEqual(target.view('time').tolist(), [15, 20, 30])
+        self.assertEqual(target.view('value').tolist(), [15, 20, 30])
+        self.assertTrue(target.dropped)
+        self.assertFalse(target.covers(12))
+        self.assertTrue(target.covers(15))
+
+    def test_many_rows_are_compacted_to_the_newest(self):
+        target = window(20)
+        for at in range(1000):
+            insert(target, at if at % 3 else at + 0.5)
+        times = target.view('time')
+        self.assertEqual(len(times), 20)
+        self.assertTrue(np.all(np.diff(times) > 0))
+        self.assertEqual(times[-1], 999.5)
+        self.assertLessEqual(len(target.columns['time']), 40)
+
+class TestRollup(unittest.TestCase):
+    def test_analyses_merge_into_their_bucket(self):
+        rollup = _Rollup(HOUR, 4)
+        self.assertEqual(rollup.add(2 * HOUR + 10, metrics(0.5)), 2 * HOUR)
+        rollup.add(2 * HOUR + 20, metrics(-0.5))
+        rollup.add(HOUR + 5, metrics(np.nan))
+
+        self.assertEqual(rollup.view('time').tolist(), [HOUR, 2 * HOUR])
+        self.assertEqual(rollup.view('count')[:, SENTIMENT].tolist(), [0, 2])
+        self.assertEqual(rollup.view('sum')[1, SENTIMENT], 0.0)
+        self.assertEqual((rollup.view('min')[1, SENTIMENT], rollup.view('max')[1, SENTIMENT]), (-0.5, 0.5))
+
+    def test_replace_sets_a_bucket(self):
+        rollup = _Rollup(HOUR, 4)
+        rollup.add(HOUR, metrics(0.5))
+        stats = {'count': np.ones(len(METRIC_NAMES)), 'sum': np.full(len(METRIC_NAMES), 0.25)}
+        rollup.replace(HOUR, stats)
+        rollup.replace(0, stats)
+        self.assertEqual(rollup.view('time').tolist(), [0, HOUR])
+        self.assertEqual(rollup.view('sum')[:, SENTIMENT].tolist(), [0.25, 0.25])
+
+@mock.patch.object(settings, 'TIMESERIES_RAW_POINTS', 16)
+class TestTimeseriesStore(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        # The most recent hour boundary, so the analyses below end whole buckets
+        self.now = math.floor(time.time() / HOUR) * HOUR
+
+    def query(self, store, resolution, hours=30):
+        result = store.query('So1', TimeseriesQuery(start=self.now - hours * HOUR, end=self.now + HOUR, resolution=resolution))
+        return result['times'], result['series']['sentiment']
+
+    def test_queries_pick_the_finest_level_that_covers_the_range(self):
+        store = TimeseriesStore(directory='')
+        for i in reversed(range(48)):
+            store.add('So1', self.now - i * HOUR / 2, metrics(i % 4 / 4))
+
+        self.assertEqual(store.query('So1', TimeseriesQuery(start=self.now - 4 * HOUR, end=self.now))['resolution'], 'raw')
+        self.assertEqual(store.query('So1', TimeseriesQuery(start=self.now - 30 * HOUR, end=self.now))['resolution'], 'hour')
+        times, sentiment = self.query(store, 'hour')
+        self.assertEqual(len(times), 25)
+        self.assertEqual(sum(sentiment['count']), 48)
+        self.assertIsNone(store.query('unknown', TimeseriesQuery(start=0, end=1)))
+
+    def test_segments_reload_to_the_same_series(self):
+        store = TimeseriesStore(directory=self.directory)
+        # Spread over a day, out of order, the newest ones in the bucket still open
+        for i in range(60):
+            at = self.now - (i * 7919 % 86400) + 60
+            store.add('So1', at, metrics((i % 5 - 2) / 2))
+            store.add('So2', at, metrics(0.1))
+        store.flush()
+        # A late analysis changes a bucket already written; its newer record wins on reload
+        store.add('So1', self.now - 2 * HOUR + 1, metrics(1.0))
+        store.flush()
+
+        segments = sorted(os.listdir(self.directory))
+        self.assertTrue(any(name.startswith('raw-') for name in segments))
+        self.assertTrue(any(name.startswith('hour-') for name in segments))
+
+        reloaded = TimeseriesStore(directory=self.directory)
+        self.assertEqual(len(reloaded), 2)
+        for resolution in ('raw', 'hour', 'day'):
+            self.assertEqual(self.query(reloaded, resolution), self.query(store, resolution))
+        _, hourly = self.query(reloaded, 'hour')
+        self.assertIn(1.0, hourly['max'])
+
+    def test_truncated_frame_is_skipped(self):
+        store = TimeseriesStore(directory=self.directory)
+        store.add('So1', self.now - HOUR, metrics(0.5))
+        store.flush()
+        store.add('So1', self.now - HOUR + 1, metrics(0.7))
+        store.flush()
+        raw = os.path.join(self.directory, next(name for name in os.listdir(self.directory) if name.startswith('raw-')))
+        with open(raw, 'r+b') as f:
+            f.truncate(os.path.getsize(raw) - 10)
+
+        times, sentiment = self.query(TimeseriesStore(directory=self.directory), 'raw')
+        self.assertEqual((times, sentiment['mean']), ([self.now - HOUR], [0.5]))
+
+if __name__ == '__main__':
+    unittest.main()
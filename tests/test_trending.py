@@ -0,0 +1,120 @@
+import time
+import unittest
+from unittest import mock
+import numpy as np
+from config.settings import settings
+from services.text_normalizer import normalize_texts, tokenize
+from services.trending import DecayedHeavyHitters, TrendingEngine, extract_phrases
+
+HALF_LIFE = 3600.0
+
+def collection(*texts, created_utc=None):
+    """NormalizedTexts and the times of its collected texts, all posted at `created_utc` (now by default)."""
+    created_utc = created_utc or time.time()
+    return normalize_texts(list(texts)), [created_utc] * len(texts)
+
+class TestExtractPhrases(unittest.TestCase):
+    def test_stop_words_and_numbers_do_not_bound_phrases(self):
+        self.assertEqual(
+            extract_phrases(tokenize('The Solana ecosystem is 100 percent bullish!'), 2),
+            ['solana', 'ecosystem', 'percent', 'bullish', 'solana ecosystem', 'percent bullish']
+        )
+
+class TestDecayedHeavyHitters(unittest.TestCase):
+    def sketch(self, capacity=5, width=256):
+        return DecayedHeavyHitters(capacity=capacity, width=width, depth=4, half_life=HALF_LIFE)
+
+    def test_heavy_hitters_are_found_among_noise(self):
+        sketch = self.sketch()
+        now = time.time()
+        phrases = ['rug'] * 50 + ['moon'] * 30 + [f'noise{i}' for i in range(500)]
+        sketch.update(phrases, np.full(len(phrases), now))
+
+        top = sketch.top(2)
+        self.assertEqual([phrase for phrase, _ in top], ['rug', 'moon'])
+        # Count-Min never underestimates, and collisions with 500 singletons stay small
+        self.assertGreaterEqual(top[0][1], 50 * 0.999)
+        self.assertLess(top[0][1], 60)
+        self.assertLessEqual(len(sketch.monitored), 5)
+
+    def test_counts_decay_with_age(self):
+        sketch = self.sketch()
+        now = time.time()
+        sketch.update(['old', 'new'], np.array([now - 2 * HALF_LIFE, now]))
+
+        counts = dict(sketch.top(2))
+        self.assertAlmostEqual(counts['new'], 1.0, places=2)
+        self.assertAlmostEqual(counts['old'], 0.25, places=2)
+
+    def test_future_timestamps_count_as_now(self):
+        sketch = self.sketch()
+        sketch.update(['early'], np.array([time.time() + 10 * HALF_LIFE]))
+        self.assertAlmostEqual(sketch.top(1)[0][1], 1.0, places=2)
+
+    def test_new_phrase_replaces_the_smallest_once_it_is_larger(self):
+        sketch = self.sketch(capacity=2)
+        now = time.time()
+        sketch.update(['a', 'a', 'a', 'b'], np.full(4, now))
+        sketch.update(['c'], np.full(1, now))
+        self.assertEqual(set(sketch.monitored), {'a', 'b'})
+
+        sketch.update(['c'], np.full(1, now))
+        self.assertEqual(set(sketch.monitored), {'a', 'c'})
+
+    def test_renormalizing_keeps_the_ranking(self):
+        sketch = self.sketch()
+        now = time.time()
+        sketch.update(['a', 'a', 'b'], np.full(3, now))
+        before = sketch.top(2)
+
+        sketch._renormalize(now + HALF_LIFE)
+
+        self.assertEqual([phrase for phrase, _ in sketch.top(2)], [phrase for phrase, _ in before])
+        self.assertAlmostEqual(sketch.monitored['a'], 1.0, places=2)
+
+@mock.patch.object(settings, 'TRENDING_HALF_LIFE', HALF_LIFE)
+@mock.patch.object(settings, 'TRENDING_MAX_NGRAM', 1)
+class TestTrendingEngine(unittest.TestCase):
+    def test_texts_are_counted_once(self):
+        engine = TrendingEngine()
+        normalized, times = collection('solana pump', 'solana dump')
+
+        self.assertEqual(engine.observe('So1', normalized, times), 2)
+        self.assertEqual(engine.observe('So1', normalized, times), 0)
+
+        counts = dict(engine.top('So1'))
+        self.assertAlmostEqual(counts['solana'], 2.0, places=2)
+        self.assertEqual(engine.top('unknown'), [])
+
+    def test_copies_count_once_at_the_newest_time(self):
+        engine = TrendingEngine()
+        now = time.time()
+        normalized = normalize_texts(['RT @bot: solana pump', 'solana pump', 'solana pump', 'https://x.co'])
+
+        self.assertEqual(engine.observe('So1', normalized, [now - 2 * HALF_LIFE, now - HALF_LIFE, now, None]), 1)
+        self.assertAlmostEqual(dict(engine.top('So1'))['solana'], 1.0, places=2)
+
+        # A later copy of a known text counts again
+        self.assertEqual(engine.observe('So1', normalize_texts(['solana pump']), [now]), 0)
+        self.assertEqual(engine.observe('So1', normalize_texts(['solana pump']), [now + 1]), 1)
+
+    def test_global_counts_span_tokens(self):
+        engine = TrendingEngine()
+        engine.observe('So1', *collection('airdrop today'))
+        engine.observe('So2', *collection('airdrop soon'))
+
+        self.assertEqual(engine.top(None, 1)[0][0], 'airdrop')
+        self.assertEqual(engine.status()['tracked_tokens'], 2)
+
+    @mock.patch.object(settings, 'TRENDING_MAX_TOKENS', 2)
+    def test_least_recently_updated_token_is_evicted(self):
+        engine = TrendingEngine()
+        for key in ('So1', 'So2', 'So3'):
+            engine.observe(key, *collection(f'phrase {key}'))
+
+        self.assertEqual(engine.top('So1'), [])
+        self.assertNotIn('So1', engine._seen)
+        self.assertNotEqual(engine.top('So3'), [])
+
+if __name__ == '__main__':
+    unittest.main()
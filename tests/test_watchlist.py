@@ -0,0 +1,130 @@
+import time
+import unittest
+from unittest import mock
+from config.settings import settings
+from services.result_store import ResultStore
+from services.watchlist import WatchlistRefresher, activity_change
+
+def pulse(sentiment, engagement):
+    return {
+        'overview': {'sentiment_score': {'value': sentiment}},
+        'engagement_metrics': {'total_engagement_rate': engagement},
+    }
+
+class ScriptedAnalyzer:
+    """Returns the queued responses in order, repeating the last one; exceptions are raised."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def analyze_request(self, request):
+        self.calls += 1
+        response = self.responses[min(self.calls, len(self.responses)) - 1]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+@mock.patch('services.watchlist.format_analysis_response', lambda response: response)
+@mock.patch.object(settings, 'WATCHLIST_MIN_INTERVAL', 60)
+@mock.patch.object(settings, 'WATCHLIST_MAX_INTERVAL', 600)
+@mock.patch.object(settings, 'WATCHLIST_CHANGE_THRESHOLD', 0.5)
+@mock.patch.object(settings, 'WATCHLIST_JITTER', 0.0)
+class TestWatchlistRescheduling(unittest.TestCase):
+    def refresh(self, refresher, entry):
+        # _refresh releases the concurrency slot the scheduler takes for it
+        refresher._slots.acquire()
+        refresher._refresh(entry, time.time())
+
+    def test_interval_grows_while_quiet_and_halves_on_change(self):
+        analyzer = ScriptedAnalyzer(pulse(0.5, 100), pulse(0.5, 100), pulse(0.5, 100), pulse(0.9, 100))
+        refresher = WatchlistRefresher(store=ResultStore(), analyzer=analyzer)
+        entry = refresher.add({'contract_address': 'So1'})
+        entry.interval = 120
+
+        intervals = []
+        for _ in range(4):
+            self.refresh(refresher, entry)
+            intervals.append(entry.interval)
+
+        # The first refresh has nothing to compare with and counts as a change
+        self.assertEqual(intervals, [60, 90, 135, 67.5])
+        self.assertEqual(entry.refresh_count, 4)
+        self.assertAlmostEqual(entry.next_due - time.time(), 67.5, delta=1)
+        self.assertIn((entry.next_due, 'So1'), refresher._schedule)
+
+    def test_interval_is_clamped(self):
+        refresher = WatchlistRefresher(store=ResultStore(), analyzer=ScriptedAnalyzer(pulse(0.5, 100)))
+        entry = refresher.add({'contract_address': 'So1'})
+        for _ in range(10):
+            self.refresh(refresher, entry)
+        self.assertEqual(entry.interval, 600)
+
+    def test_failed_refresh_keeps_the_interval_and_reschedules(self):
+        refresher = WatchlistRefresher(store=ResultStore(), analyzer=ScriptedAnalyzer(RuntimeError('upstream down')))
+        entry = refresher.add({'contract_address': 'So1'})
+        entry.interval = 120
+
+        with mock.patch('builtins.print'):
+            self.refresh(refresher, entry)
+
+        self.assertEqual((entry.failures, entry.interval, entry.in_flight), (1, 120, False))
+        self.assertAlmostEqual(entry.next_due - time.time(), 120, delta=1)
+
+    def test_removed_entry_is_not_rescheduled(self):
+        refresher = WatchlistRefresher(store=ResultStore(), analyzer=ScriptedAnalyzer(pulse(0.5, 100)))
+        entry = refresher.add({'contract_address': 'So1'})
+        refresher.remove('So1')
+        scheduled = len(refresher._schedule)
+
+        self.refresh(refresher, entry)
+
+        self.assertEqual(len(refresher._schedule), scheduled)
+
+    def test_watched_tokens_are_pinned_in_the_store(self):
+        store = ResultStore(max_size=0, ttl=0)
+        refresher = WatchlistRefresher(store=store, analyzer=ScriptedAnalyzer(pulse(0.5, 100)))
+        entry = refresher.add({'contract_address': 'So1'})
+        self.refresh(refresher, entry)
+        self.assertIsNotNone(store.get('So1'))
+
+        refresher.remove('So1')
+        store.put('other', {})
+        self.assertIsNone(store.get('So1'))
+
+    @mock.patch.object(settings, 'WATCHLIST_LEARN_THRESHOLD', 2)
+    @mock.patch.object(settings, 'WATCHLIST_MAX_SIZE', 1)
+    def test_learned_entries_make_room_for_each_other(self):
+        refresher = WatchlistRefresher(store=ResultStore(), analyzer=ScriptedAnalyzer())
+        for address in ('So1', 'So1', 'So2', 'So2'):
+            refresher.record_request({'contract_address': address})
+
+        self.assertEqual(list(refresher.entries), ['So2'])
+        self.assertEqual(refresher.entries['So2'].source, 'learned')
+
+    def test_scheduler_refreshes_due_entries(self):
+        refresher = WatchlistRefresher(store=ResultStore(), analyzer=ScriptedAnalyzer(pulse(0.5, 100)))
+        self.assertIsNone(refresher._executor)
+        entry = refresher.add({'contract_address': 'So1'})
+        with refresher._condition:
+            entry.next_due = time.time()
+            refresher._schedule = [(entry.next_due, 'So1')]
+
+        refresher.start()
+        try:
+            deadline = time.time() + 5
+            while entry.refresh_count == 0 and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            refresher.stop()
+
+        self.assertEqual(entry.refresh_count, 1)
+        self.assertIsNone(refresher._executor)
+
+class TestActivityChange(unittest.TestCase):
+    def test_sentiment_and_engagement_moves_add_up(self):
+        self.assertEqual(activity_change(None, pulse(0.5, 100)), float('inf'))
+        self.assertAlmostEqual(activity_change(pulse(0.5, 100), pulse(0.6, 150)), 1.5)
+
+if __name__ == '__main__':
+    unittest.main()